@@ -4,15 +4,21 @@
 # -----------------------------------------------------------------------------
 from __future__ import annotations
 
+import bisect
+import itertools
+import math
+import os
+import random
+import re
 import typing as t
 from collections import deque
-from dataclasses import dataclass, field
-from threading import Event, Lock
+from dataclasses import dataclass, field, replace
+from threading import Event, Lock, local
 
 import click
-import psutil
-import pytermor as pt
-from requests.structures import CaseInsensitiveDict
+
+if t.TYPE_CHECKING:
+    from requests.structures import CaseInsensitiveDict
 
 _state: State | None = None
 
@@ -25,7 +31,12 @@ def get_state() -> State:
 
 def init_state(options: Options):
     global _state
-    _state = State(options)
+    fields = dict()
+    if options.watch or options.stages or options.replay:
+        fields.update(requests_latency=LatencyReservoir())
+    if options.metrics_listen:
+        fields.update(latency_by_endpoint=ShardedHistogram())
+    _state = State(options, **fields)
     return _state
 
 
@@ -34,8 +45,27 @@ def destroy_state():
     _state = None
 
 
+def parse_address(address: str, default_host: str = "127.0.0.1") -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    try:
+        return host.strip("[]") or default_host, int(port)
+    except ValueError:
+        raise ValueError(f"Invalid address, expected '[HOST:]PORT', got: {address!r}")
+
+
+def parse_duration(value: str) -> float:
+    """Convert '250ms', '30s', '5m', '1h' or '30' (seconds) to seconds."""
+    if m := re.fullmatch(r"\s*(\d+(?:\.\d*)?|\.\d+)\s*(ms|s|m|h)?\s*", value):
+        number, unit = m.groups()
+        return float(number) * DURATION_UNITS[unit or "s"]
+    raise ValueError(f"Invalid duration, expected e.g. '500ms', '30s', '5m', got: {value!r}")
+
+
+DURATION_UNITS = {"ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+
+
 def get_default_thread_num() -> int:
-    cores = psutil.cpu_count()
+    cores = os.cpu_count()  # same as psutil.cpu_count(), but without importing it
     if not cores:
         return 1
     if cores <= 4:
@@ -43,48 +73,438 @@ def get_default_thread_num() -> int:
     return min(16, cores // 2)
 
 
-class ThreadSafeCounter:
+class ShardedCells:
+    """
+    Base of the sharded structures: each thread writes into a separate cell
+    of its own, so that the writes do not contend for a lock. The cells are
+    merged on read; the result is a snapshot, which can be slightly behind
+    the writes happening at the same moment.
+    """
+
     def __init__(self):
-        self._value = 0
-        self._lock = Lock()
+        self._local = local()
+        self._cells: list = []
+        self._lock = Lock()  # for cell registration only
 
-    def next(self) -> int:
+    def _get_cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            return self._register_cell()
+
+    def _register_cell(self):
+        cell = self._local.cell = self._new_cell()
         with self._lock:
-            self._value += 1
-            return self._value
+            self._cells = [*self._cells, cell]  # readers iterate without a lock
+        return cell
+
+    def _new_cell(self):
+        return dict()
+
+    def _merge_cells(self) -> dict:
+        """Combine the values of the dict cells with `_combine()` by key."""
+        merged = dict()
+        for cell in self._cells:
+            for key, value in cell.copy().items():  # dict copy is atomic
+                merged[key] = self._combine(merged.get(key), value)
+        return merged
+
+    def _combine(self, total, value):
+        """Add `value` to `total`, which is None for the first one; do not modify `value`."""
+        raise NotImplementedError
+
+
+class ShardedCounter(ShardedCells):
+    """
+    Counter with a separate cell for each thread, which is incremented by
+    that thread only. The cells are summed up on read.
+    """
+
+    def next(self):
+        try:
+            self._local.cell[0] += 1
+        except AttributeError:
+            self._register_cell()[0] += 1
+
+    def add(self, amount: int):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._register_cell()[0] += amount
 
     @property
     def value(self) -> int:
-        return self._value
+        return sum(cell[0] for cell in self._cells)
+
+    def _new_cell(self) -> list[int]:
+        return [0]
+
+
+class SequenceCounter:
+    """
+    Source of unique increasing numbers. `itertools.count` is implemented in
+    C and advances atomically under the GIL, so no lock is required. Its
+    current value cannot be read without advancing it, therefore the numbers
+    issued are counted separately, the same way as by `ShardedCounter`.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self._issued = ShardedCounter()
+
+    def next(self) -> int:
+        self._issued.next()
+        return next(self._counter)
+
+    @property
+    def value(self) -> int:
+        return self._issued.value
+
+
+class ShardedCounterMap(ShardedCells):
+    """
+    Set of counters identified by labels, sharded by thread the same way as
+    `ShardedCounter`. Labels appear on first increment.
+    """
+
+    def next(self, label: str):
+        cell = self._get_cell()
+        cell[label] = cell.get(label, 0) + 1
+
+    def values(self) -> dict[str, int]:
+        return self._merge_cells()
+
+    def _combine(self, total: int | None, value: int) -> int:
+        return (total or 0) + value
+
+
+class ShardedHistogram(ShardedCells):
+    """
+    Latency distribution for each label (endpoint), with fixed bucket upper
+    bounds in seconds. Observations are written into the per-thread cells
+    without locking; `snapshot()` merges them.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: t.Sequence[float] = BUCKETS):
+        super().__init__()
+        self.buckets: tuple[float, ...] = tuple(buckets)
+
+    def observe(self, label: t.Hashable, value: float):
+        cell = self._get_cell()
+        if (counts := cell.get(label)) is None:
+            # per bucket, plus the overflow bucket, plus the sum of values
+            counts = cell[label] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def snapshot(self) -> dict[t.Hashable, HistogramSnapshot]:
+        return {
+            label: HistogramSnapshot(self.buckets, [*itertools.accumulate(counts[:-1])], counts[-1])
+            for label, counts in self._merge_cells().items()
+        }
+
+    def _combine(self, total: list | None, counts: list) -> list:
+        if total is None:
+            return counts.copy()
+        for idx, value in enumerate(counts):
+            total[idx] += value
+        return total
+
+
+@dataclass(frozen=True)
+class HistogramSnapshot:
+    buckets: tuple[float, ...]
+    cumulative_counts: list[int]  # last one is for +Inf
+    sum: float
+
+    @property
+    def count(self) -> int:
+        return self.cumulative_counts[-1]
+
+
+class LatencyReservoir(list):
+    """
+    Bounded replacement for the list of latencies in the endless runs: once
+    full, keeps a uniform random sample of all the values appended so far
+    (reservoir sampling), so that the median remains representative.
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        super().__init__()
+        self._capacity = capacity
+        self._counter = itertools.count()
+
+    def append(self, value: float):
+        seen = next(self._counter)
+        if seen < self._capacity:
+            super().append(value)
+        elif (idx := random.randrange(seen + 1)) < self._capacity:
+            self[idx] = value
+
+
+class ShardedEndpointStats(ShardedCells):
+    """
+    Request count, failures, received bytes and latency distribution for
+    each endpoint, recorded in O(1) into per-thread cells. Latencies are
+    counted in logarithmic buckets (each one is `RESOLUTION` times wider than
+    the previous), so that the percentiles are accurate within a few percent
+    regardless of the number of requests.
+    """
+
+    RESOLUTION = 1.04
+    MIN_LATENCY = 1e-6
+
+    def __init__(self):
+        super().__init__()
+        self._log_resolution = math.log(self.RESOLUTION)
+
+    def record(self, key: t.Hashable, ok: bool, size: int, latency: float | None):
+        """`latency` is None for the requests without response."""
+        cell = self._get_cell()
+        if (stats := cell.get(key)) is None:
+            stats = cell[key] = [0, 0, 0, dict()]  # requests, failed, bytes, latencies
+        stats[0] += 1
+        stats[1] += not ok
+        stats[2] += size
+        if latency is not None:
+            bucket = math.floor(math.log(max(latency, self.MIN_LATENCY)) / self._log_resolution)
+            latencies = stats[3]
+            latencies[bucket] = latencies.get(bucket, 0) + 1
+
+    def add(self, key: t.Hashable, snapshot: EndpointSnapshot):
+        """Add the stats recorded elsewhere, e.g. by a distributed mode agent."""
+        cell = self._get_cell()
+        if (stats := cell.get(key)) is None:
+            stats = cell[key] = [0, 0, 0, dict()]
+        stats[0] += snapshot.requests
+        stats[1] += snapshot.failed
+        stats[2] += snapshot.bytes
+        latencies = stats[3]
+        for bucket, count in snapshot.latency_buckets.items():
+            latencies[bucket] = latencies.get(bucket, 0) + count
+
+    def snapshot(self) -> dict[t.Hashable, EndpointSnapshot]:
+        return {
+            key: EndpointSnapshot(*stats, self.RESOLUTION)
+            for key, stats in self._merge_cells().items()
+        }
+
+    def _combine(self, total: list | None, stats: list) -> list:
+        requests, failed, size, latencies = stats
+        latencies = latencies.copy()  # can be extended by the owner thread meanwhile
+        if total is None:
+            return [requests, failed, size, latencies]
+        total[0] += requests
+        total[1] += failed
+        total[2] += size
+        for bucket, count in latencies.items():
+            total[3][bucket] = total[3].get(bucket, 0) + count
+        return total
+
+
+@dataclass(frozen=True)
+class EndpointSnapshot:
+    requests: int
+    failed: int
+    bytes: int
+    latency_buckets: dict[int, int]
+    resolution: float
+
+    @classmethod
+    def merge(cls, snapshots: t.Iterable[EndpointSnapshot]) -> EndpointSnapshot | None:
+        """Combine the stats of several endpoints, or return None if there are none."""
+        result = None
+        for snapshot in snapshots:
+            if result is None:
+                result = replace(snapshot, latency_buckets={})
+            else:
+                result = replace(
+                    result,
+                    requests=result.requests + snapshot.requests,
+                    failed=result.failed + snapshot.failed,
+                    bytes=result.bytes + snapshot.bytes,
+                )
+            for bucket, count in snapshot.latency_buckets.items():
+                result.latency_buckets[bucket] = result.latency_buckets.get(bucket, 0) + count
+        return result
+
+    @property
+    def error_rate(self) -> float:
+        return self.failed / self.requests if self.requests else 0.0
+
+    def percentile(self, percent: float) -> float | None:
+        """Latency in seconds, or None if there were no responses."""
+        return LogHistogramSnapshot(self.latency_buckets, self.resolution).percentile(percent)
+
+
+class ShardedLogHistogram(ShardedCells):
+    """
+    Distribution of a single value, e.g. a delay, counted in the same
+    logarithmic buckets as the latencies in `ShardedEndpointStats`.
+    """
+
+    RESOLUTION = ShardedEndpointStats.RESOLUTION
+    MIN_VALUE = ShardedEndpointStats.MIN_LATENCY
+
+    def __init__(self):
+        super().__init__()
+        self._log_resolution = math.log(self.RESOLUTION)
+
+    def observe(self, value: float):
+        cell = self._get_cell()
+        bucket = math.floor(math.log(max(value, self.MIN_VALUE)) / self._log_resolution)
+        cell[bucket] = cell.get(bucket, 0) + 1
+
+    def snapshot(self) -> LogHistogramSnapshot | None:
+        """None if nothing was observed."""
+        if not (buckets := self._merge_cells()):
+            return None
+        return LogHistogramSnapshot(buckets, self.RESOLUTION)
+
+    def _combine(self, total: int | None, count: int) -> int:
+        return (total or 0) + count
+
+
+@dataclass(frozen=True)
+class LogHistogramSnapshot:
+    buckets: dict[int, int]
+    resolution: float
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    def percentile(self, percent: float) -> float | None:
+        """None if the histogram is empty."""
+        if not (total := self.count):
+            return None
+        rank = max(1, math.ceil(total * percent / 100))
+        for bucket in sorted(self.buckets):
+            rank -= self.buckets[bucket]
+            if rank <= 0:
+                return self.resolution ** (bucket + 0.5)  # geometric middle of the bucket
+
+
+ENDPOINT_SORT_KEYS: dict[str, t.Callable[[tuple, EndpointSnapshot], t.Any]] = {
+    "p50": lambda key, s: -(s.percentile(50) or 0),
+    "p95": lambda key, s: -(s.percentile(95) or 0),
+    "p99": lambda key, s: -(s.percentile(99) or 0),
+    "errors": lambda key, s: (-s.error_rate, -s.failed),
+    "count": lambda key, s: -s.requests,
+    "bytes": lambda key, s: -s.bytes,
+    "url": lambda key, s: (key[1], key[0]),
+}
+
+
+def sort_endpoints(
+    stats: dict[tuple[str, str], EndpointSnapshot],
+    key: str,
+) -> list[tuple[tuple[str, str], EndpointSnapshot]]:
+    """Sort (method, url) -> stats items; worst endpoints first, except for 'url'."""
+    sort_key = ENDPOINT_SORT_KEYS[key]
+    return sorted(stats.items(), key=lambda kv: (sort_key(*kv), kv[0]))
+
+
+@dataclass(frozen=True)
+class StateSnapshot:
+    requests_total: int
+    requests_printed: int
+    requests_success: int
+    requests_failed: int
+    requests_cancelled: int
 
 
 @dataclass(frozen=True)
 class State:
     options: Options
-    last_request_id: ThreadSafeCounter = field(default_factory=ThreadSafeCounter)
-    requests_total: ThreadSafeCounter = field(default_factory=ThreadSafeCounter)
-    requests_printed: ThreadSafeCounter = field(default_factory=ThreadSafeCounter)
-    requests_success: ThreadSafeCounter = field(default_factory=ThreadSafeCounter)
-    requests_failed: ThreadSafeCounter = field(default_factory=ThreadSafeCounter)
+    last_request_id: SequenceCounter = field(default_factory=SequenceCounter)
+    requests_total: ShardedCounter = field(default_factory=ShardedCounter)
+    requests_printed: ShardedCounter = field(default_factory=ShardedCounter)
+    requests_success: ShardedCounter = field(default_factory=ShardedCounter)
+    requests_failed: ShardedCounter = field(default_factory=ShardedCounter)
+    requests_cancelled: ShardedCounter = field(default_factory=ShardedCounter)
+    cache_hits: ShardedCounter = field(default_factory=ShardedCounter)  # 304 responses
+    # response bodies as received, before decompression
+    bytes_wire: ShardedCounter = field(default_factory=ShardedCounter)
+    bytes_decoded: ShardedCounter = field(default_factory=ShardedCounter)
+    decode_time_ns: ShardedCounter = field(default_factory=ShardedCounter)
     requests_latency: list[float] = field(default_factory=list)
+    # how late the replayed requests were sent, in seconds
+    replay_drift: ShardedLogHistogram = field(default_factory=ShardedLogHistogram)
+    responses_by_status: ShardedCounterMap = field(default_factory=ShardedCounterMap)
+    errors_by_type: ShardedCounterMap = field(default_factory=ShardedCounterMap)
+    latency_by_endpoint: ShardedHistogram | None = None  # for the metrics endpoint only
+    endpoint_stats: ShardedEndpointStats = field(default_factory=ShardedEndpointStats)
+    warmup_stats: ShardedEndpointStats = field(default_factory=ShardedEndpointStats)
+    redirect_stats: ShardedEndpointStats = field(default_factory=ShardedEndpointStats)
     used_methods: set[str] = field(default_factory=set[str])
     worker_states: deque[str] = field(default_factory=deque[str])
     shutdown_flag: Event = field(default_factory=Event)
 
+    def snapshot(self) -> StateSnapshot:
+        return StateSnapshot(
+            self.requests_total.value,
+            self.requests_printed.value,
+            self.requests_success.value,
+            self.requests_failed.value,
+            self.requests_cancelled.value,
+        )
+
 
 @dataclass(frozen=True)
 class Options:
     endpoint_url: tuple[str]
     file: tuple[t.TextIO]
+    agent: tuple[str] = ()
+    accept_encoding: str = None
     amount: int = 1
+    cache: bool = True
+    cache_redirects: bool = False
+    circuit_breaker: int = None
+    circuit_cooldown: float = 5
     color: bool = None
+    connect_timeout: float = None
+    deadline: float = None
     delay: float = 0
+    preconnect: bool = False
     insecure: bool = False
+    interval: float = 60
+    listen: str = None
+    metrics_listen: str = None
+    no_decompress: bool = False
+    profile: str = None
+    profile_mem: bool = False
+    profile_sampling: bool = False
+    read_timeout: float = None
+    replay: t.TextIO = None
+    replay_format: str = "auto"
+    replay_speed: float = 1.0
+    replay_target: str = None
+    report: str = None
+    revalidate: bool = False
+    scenario: bool = False
+    self_monitor: bool = True
     exit_code: bool = False
     show_error: bool = False
     show_id: bool = False
+    slo: str = None
+    sort: str = "p95"
+    stages: str = None
+    streams: int = 100
     threads: int = get_default_thread_num()
     timeout: float = 10
+    top: int = 20
+    trace_failures: bool = False
+    trace_file: str = None
+    trace_sample: int = None
+    trace_slow: float = None
+    transport: str = "http1"
+    warmup: int = 0
+    warmup_seconds: float = None
+    watch: bool = False
+    weighted: bool = False
     verbose: int = 0
 
 
@@ -94,15 +514,31 @@ class Task:
     method: str = "GET"
     headers: CaseInsensitiveDict = None
     body: str = None
+    interval: float = None  # for watch mode
+    extract: tuple[tuple[str, str, str], ...] = None  # (variable, source, expression)
+    weight: float = None  # relative frequency for the weighted sampling, 1 if not set
 
 
-class FixedWidthStringWrapper(pt.StringReplacerChain):
-    def __init__(self, width: int = 80):
-        super().__init__(
-            "(?s).+",
-            pt.StringReplacer(R"\s+", " "),
-            pt.StringReplacer(fR"(.{{{width}}})", r"\1\n"),
-        )
+@dataclass(frozen=True)
+class Scenario:
+    """Sequence of the tasks performed in order by one virtual user."""
+
+    name: str
+    tasks: tuple[Task, ...]
+
+
+class DurationParamType(click.ParamType):
+    name = "duration"
+
+    def convert(self, value, param, ctx) -> float:
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            if (result := parse_duration(value)) <= 0:
+                raise ValueError(f"Duration should be positive, got: {value!r}")
+            return result
+        except ValueError as e:
+            self.fail(str(e), param, ctx)
 
 
 class HiddenIntRange(click.IntRange):
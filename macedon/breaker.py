@@ -0,0 +1,101 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Per-host circuit breakers. When a host goes down, every request to it would
+wait out the timeout and hold a worker; instead, after a number of failures
+in a row the circuit opens, and the requests to the host fail at once. After
+the cooldown one request is let through as a probe (half-open state): if it
+succeeds, the circuit closes, otherwise it opens for another cooldown.
+"""
+from __future__ import annotations
+
+import threading as th
+import time
+
+from .logger import get_logger
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, host: str, threshold: int, cooldown: float):
+        self.host = host
+        self.state = self.CLOSED
+        self.opened = 0  # times
+        self.rejected = 0  # requests
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._failures = 0  # in a row
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = th.Lock()
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True  # the lock is not needed as long as everything works
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() >= self._opened_at + self._cooldown:
+                get_logger().info(f"Circuit half-open, probing: {self.host}")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            if self.state == self.CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool):
+        if ok and self.state == self.CLOSED and not self._failures:
+            return
+        with self._lock:
+            if ok:
+                if self.state != self.CLOSED:
+                    get_logger().info(f"Circuit closed: {self.host}")
+                self.state = self.CLOSED
+                self._failures = 0
+                self._probing = False
+                return
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self._threshold:
+                if self.state != self.OPEN:
+                    get_logger().warning(
+                        f"Circuit open after {self._failures} failure(s): {self.host}"
+                    )
+                    self.opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def add(self, state: str, opened: int, rejected: int):
+        """Add the stats of another breaker for the host, e.g. of a distributed mode agent."""
+        with self._lock:
+            self.opened += opened
+            self.rejected += rejected
+            if self.state == self.CLOSED:
+                self.state = state  # open or half-open if so for any of the agents
+
+
+class CircuitBreakers:
+    """Registry of the breakers, one per host (created on first use)."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = th.Lock()
+
+    def get(self, host: str) -> CircuitBreaker:
+        if (breaker := self._breakers.get(host)) is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    host, CircuitBreaker(host, self._threshold, self._cooldown)
+                )
+        return breaker
+
+    def values(self) -> list[CircuitBreaker]:
+        return [*self._breakers.values()]
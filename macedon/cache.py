@@ -0,0 +1,98 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import typing as t
+from pathlib import Path
+
+from requests.structures import CaseInsensitiveDict
+
+from ._common import Task
+
+
+def get_cache_dir() -> Path:
+    if base := os.environ.get("XDG_CACHE_HOME"):
+        return Path(base) / "macedon"
+    return Path.home() / ".cache" / "macedon"
+
+
+class TaskCache:
+    """
+    Persistent storage of the parsed request files. Entries are keyed by
+    absolute file path and considered valid as long as both file modification
+    time and content digest match the recorded ones. Tasks are stored as plain
+    tuples serialized with `marshal`, which is faster to load than `pickle`
+    and cannot execute arbitrary code upon loading.
+    """
+
+    FORMAT_VERSION = 4
+    SUFFIX = ".tasks"
+
+    def __init__(self, path: Path = None):
+        self._path = path or get_cache_dir()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @staticmethod
+    def digest(data: str) -> bytes:
+        return hashlib.blake2b(data.encode(errors="surrogateescape"), digest_size=16).digest()
+
+    def load(self, file_path: str, mtime_ns: int, digest: bytes) -> list[Task] | None:
+        try:
+            with open(self._get_entry_path(file_path), "rb") as f:
+                version, entry_mtime_ns, entry_digest, records = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (version, entry_mtime_ns, entry_digest) != (self._version, mtime_ns, digest):
+            return None
+        return [*map(self._unpack, records)]
+
+    def store(self, file_path: str, mtime_ns: int, digest: bytes, tasks: t.Iterable[Task]):
+        entry_path = self._get_entry_path(file_path)
+        tmp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}")
+        data = (self._version, mtime_ns, digest, [*map(self._pack, tasks)])
+
+        self._path.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            marshal.dump(data, f)
+        os.replace(tmp_path, entry_path)
+
+    def clear(self) -> int:
+        removed = 0
+        if not self._path.is_dir():
+            return removed
+        for entry_path in self._path.glob(f"*{self.SUFFIX}"):
+            entry_path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    @property
+    def _version(self) -> str:
+        from . import APP_VERSION
+
+        return f"{self.FORMAT_VERSION}:{APP_VERSION}"
+
+    def _get_entry_path(self, file_path: str) -> Path:
+        key = hashlib.blake2b(os.path.abspath(file_path).encode(), digest_size=16).hexdigest()
+        return self._path / f"{key}{self.SUFFIX}"
+
+    @staticmethod
+    def _pack(task: Task) -> tuple:
+        headers = None
+        if task.headers is not None:
+            headers = [*task.headers.items()]
+        return task.url, task.method, headers, task.body, task.interval, task.extract, task.weight
+
+    @staticmethod
+    def _unpack(record: tuple) -> Task:
+        url, method, headers, body, interval, extract, weight = record
+        if headers is not None:
+            headers = CaseInsensitiveDict(headers)
+        return Task(url, method, headers, body, interval, extract, weight)
@@ -0,0 +1,436 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Distributed mode: a coordinator splits the tasks between several agents,
+which perform the requests using regular `Synchronizer` and `Worker` and
+stream the results back. Messages are JSON objects separated by newlines:
+
+    coordinator -> agent:  {"type": "job", "options": {...}, "tasks": [...]}
+                           {"type": "stop"}
+    agent -> coordinator:  {"type": "results", "items": [...]}
+                           {"type": "stats", "cancelled": N, "warmup": [...]}
+                           {"type": "done"}
+                           {"type": "error", "message": "..."}
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import signal
+import socket
+import threading as th
+import time
+import typing as t
+from datetime import timedelta
+
+import click
+from requests.structures import CaseInsensitiveDict
+
+from ._common import (
+    EndpointSnapshot,
+    Options,
+    ShardedEndpointStats,
+    Task,
+    destroy_state,
+    get_state,
+    init_state,
+    parse_address,
+)
+from .logger import get_logger
+from .printer import Printer, destroy_printer, get_printer, init_printer
+from .slo import get_slo_guard
+from .synchronizer import Synchronizer
+from .transport import destroy_transport, get_transport, init_transport
+
+# options of the coordinator which are applied to the agent jobs
+JOB_OPTIONS = (
+    "accept_encoding",
+    "amount",
+    "cache_redirects",
+    "circuit_breaker",
+    "circuit_cooldown",
+    "connect_timeout",
+    "delay",
+    "insecure",
+    "no_decompress",
+    "preconnect",
+    "read_timeout",
+    "revalidate",
+    "streams",
+    "threads",
+    "timeout",
+    "transport",
+    "warmup",
+    "warmup_seconds",
+    "weighted",
+)
+
+
+def pack_task(task: Task) -> list:
+    return [task.url, task.method, dict(task.headers or {}) or None, task.body, task.weight]
+
+
+def unpack_task(record: list) -> Task:
+    url, method, headers, body, weight = record
+    headers = CaseInsensitiveDict(headers) if headers else None
+    return Task(url, method, headers, body, weight=weight)
+
+
+class Connection:
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._rfile = sock.makefile("rb")
+        self._send_lock = th.Lock()
+
+    def send(self, message_type: str, **payload):
+        data = json.dumps(dict(type=message_type, **payload), separators=(",", ":"))
+        with self._send_lock:
+            self._sock.sendall(data.encode() + b"\n")
+
+    def receive(self) -> dict | None:
+        if not (line := self._rfile.readline()):
+            return None
+        return json.loads(line)
+
+    def close(self):
+        self._rfile.close()
+        self._sock.close()
+
+
+class AgentPrinter(Printer):
+    """
+    Collects request results instead of printing them; the results are
+    sent to the coordinator in batches.
+
+    Result item: [task index, status code or null, size, elapsed seconds,
+    error class name or null, error message or null, extra or null], where
+    extra can have "wire" (body size as received), "decode_ns" (time spent
+    on decompression) and "hops" (redirects, as [status code, method, url,
+    elapsed seconds] each).
+    """
+
+    FLUSH_INTERVAL_SEC = 0.2
+
+    connection: Connection
+    task_indexes: dict[int, int]
+
+    def __init__(self):
+        super().__init__()
+        self._results: list[list] = []
+
+    def print_prolog(self):
+        pass
+
+    def print_epilog(self, time_delta_ns: int):
+        self.flush()
+
+    def print_shutdown(self, message: str = "Shutting threads down"):
+        pass
+
+    def print_completed_request(self, task: Task, response, request_id: int):
+        size = 0
+        try:
+            size = len(response.content)
+        except Exception:
+            pass
+        idx = self.task_indexes[id(task)]
+        elapsed = response.elapsed.total_seconds()
+        extra = {}
+        if (wire_size := getattr(response, "wire_size", size)) != size:
+            extra["wire"] = wire_size
+        if decode_time_ns := getattr(response, "decode_time_ns", 0):
+            extra["decode_ns"] = decode_time_ns
+        if response.history:
+            extra["hops"] = [
+                [hop.status_code, hop.request.method, hop.url, hop.elapsed.total_seconds()]
+                for hop in response.history
+            ]
+        self._results.append([idx, response.status_code, size, elapsed, None, None, extra or None])
+
+    def print_failed_request(self, task: Task, time_ns: int, request_id: int, exception):
+        idx = self.task_indexes[id(task)]
+        error_type = self._get_error_type(exception)
+        error_msg = str(exception)
+        self._results.append([idx, None, 0, time_ns / 1e9, error_type, error_msg, None])
+
+    def flush(self):
+        results, self._results = self._results, []
+        if results:
+            self.connection.send("results", items=results)
+
+    def run_flusher(self, stop: th.Event):
+        while not stop.wait(self.FLUSH_INTERVAL_SEC):
+            self.flush()
+
+
+class Agent:
+    def __init__(self, options: Options):
+        self._options = options
+        self._stop = th.Event()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+
+        host, port = parse_address(self._options.listen, default_host="0.0.0.0")
+        with socket.create_server((host, port)) as server:
+            server.settimeout(0.5)
+            click.echo("Listening on %s:%d" % server.getsockname()[:2])
+            while not self._stop.is_set():
+                try:
+                    sock, address = server.accept()
+                except socket.timeout:
+                    continue
+                get_logger().info(f"Coordinator connected: {address[0]}:{address[1]}")
+                sock.settimeout(None)
+                connection = Connection(sock)
+                try:
+                    self._serve(connection)
+                except (OSError, ValueError) as e:
+                    get_logger().exception(e)
+                finally:
+                    connection.close()
+
+    def _serve(self, connection: Connection):
+        if not (message := connection.receive()) or message.get("type") != "job":
+            raise ValueError(f"Expected job from the coordinator, got: {message!r}")
+
+        tasks = [*map(unpack_task, message["tasks"])]
+        job_options = {k: v for k, v in message["options"].items() if k in JOB_OPTIONS}
+        options = dataclasses.replace(self._options, endpoint_url=(), file=(), **job_options)
+        get_logger().info(f"Job received: {len(tasks)} task(s), {options.amount} time(s) each")
+
+        state = init_state(options)
+        init_transport(options)
+        printer = t.cast(AgentPrinter, init_printer(AgentPrinter))
+        printer.connection = connection
+        printer.task_indexes = {id(task): idx for idx, task in enumerate(tasks)}
+
+        flusher_stop = th.Event()
+        th.Thread(target=printer.run_flusher, args=(flusher_stop,), daemon=True).start()
+        th.Thread(target=self._watch_coordinator, args=(connection,), daemon=True).start()
+        try:
+            Synchronizer(options, tasks).run()
+            flusher_stop.set()
+            self._send_stats(connection, state)
+            connection.send("done")
+        except Exception as e:
+            flusher_stop.set()
+            connection.send("error", message=str(e))
+            raise
+        finally:
+            state.shutdown_flag.set()
+            destroy_printer()
+            destroy_transport()
+            destroy_state()
+
+    def _send_stats(self, connection: Connection, state):
+        """The counters which are not a part of the request results."""
+        warmup = [
+            [*key, s.requests, s.failed, s.bytes, [*s.latency_buckets.items()]]
+            for key, s in state.warmup_stats.snapshot().items()
+        ]
+        breakers = get_transport().breakers
+        circuits = [
+            [b.host, b.state, b.opened, b.rejected] for b in (breakers.values() if breakers else ())
+        ]
+        connection.send(
+            "stats", cancelled=state.requests_cancelled.value, warmup=warmup, circuits=circuits
+        )
+
+    def _watch_coordinator(self, connection: Connection):
+        state = get_state()
+        try:
+            message = connection.receive()
+        except (OSError, ValueError):
+            message = None
+        if not state.shutdown_flag.is_set():
+            get_logger().info(f"Stopping the job: {message or 'coordinator disconnected'}")
+            state.shutdown_flag.set()
+
+    def _on_signal(self, signal_code: int, *args):
+        get_logger().info(f"{signal.Signals(signal_code).name} ({signal_code}) received")
+        self._stop.set()
+        try:
+            get_state().shutdown_flag.set()
+        except Exception:
+            pass  # no job in progress
+
+
+class Coordinator(Synchronizer):
+    """
+    If the number of repetitions is not less than the number of agents,
+    every agent receives all the tasks and a share of repetitions; otherwise
+    the tasks themselves are divided between the agents.
+    """
+
+    def __init__(self, options: Options):
+        self._agents: list[tuple[str, int]] = [*map(parse_address, options.agent)]
+        self._connections: list[Connection] = []
+        super().__init__(options)
+
+    def run(self):
+        printer = get_printer()
+        printer.print_prolog()
+        deadline_timer = self._start_deadline_timer(get_state().options)
+        time_before = time.time_ns()
+        if slo_guard := get_slo_guard():
+            slo_guard.start()
+
+        options = dataclasses.asdict(get_state().options)
+        options = {k: v for k, v in options.items() if k in JOB_OPTIONS}
+        receivers = []
+        for address, (tasks, amount) in zip(self._agents, self._split()):
+            if not tasks or not amount:
+                continue
+            connection = Connection(socket.create_connection(address))
+            self._connections.append(connection)
+            packed = [*map(pack_task, tasks)]
+            connection.send("job", options=dict(options, amount=amount), tasks=packed)
+            receiver = th.Thread(target=self._receive, args=(connection, address, tasks))
+            receiver.start()
+            receivers.append(receiver)
+
+        done = th.Event()
+        th.Thread(target=self._watch_shutdown, args=(done,), daemon=True).start()
+        for receiver in receivers:
+            receiver.join()
+        done.set()
+        if deadline_timer:
+            deadline_timer.cancel()
+        if slo_guard:
+            slo_guard.stop()
+        for connection in self._connections:
+            connection.close()
+
+        self.time_delta_ns = time.time_ns() - time_before
+        get_state().requests_latency.sort()
+        printer.print_epilog(self.time_delta_ns)
+
+    def _watch_shutdown(self, done: th.Event):
+        shutdown_flag = get_state().shutdown_flag
+        while not done.wait(0.2):
+            if shutdown_flag.is_set():
+                break
+        else:
+            return
+        for connection in self._connections:
+            try:
+                connection.send("stop")
+            except OSError:
+                pass
+
+    def _append_task(self, task: Task):
+        state = get_state()
+        state.used_methods.add(task.method)
+        self._tasks.append(task)
+        for _ in range(state.options.amount):
+            state.requests_total.next()
+
+    def _get_tasks_num(self) -> int:
+        return len(self._tasks)
+
+    def _init_workers(self):
+        if not self._agents:
+            raise ValueError("No agents specified")
+
+    def _split(self) -> t.Iterable[tuple[list[Task], int]]:
+        agents_num = len(self._agents)
+        options = get_state().options
+        amount = options.amount
+        # the weighted sampling needs all the tasks, agents left without requests are skipped
+        if amount >= agents_num or options.weighted:
+            for idx in range(agents_num):
+                yield self._tasks, amount // agents_num + (idx < amount % agents_num)
+        else:
+            for idx in range(agents_num):
+                yield self._tasks[idx::agents_num], amount
+
+    def _receive(self, connection: Connection, address: tuple[str, int], tasks: list[Task]):
+        state = get_state()
+        printer = get_printer()
+
+        while message := connection.receive():
+            if message["type"] == "results":
+                for item in message["items"]:
+                    self._handle_result(state, printer, tasks, *item)
+            elif message["type"] == "stats":
+                self._handle_stats(state, message)
+            elif message["type"] == "done":
+                return
+            elif message["type"] == "error":
+                get_logger().error(f"Agent {address[0]}:{address[1]}: {message['message']}")
+                return
+        get_logger().error(f"Agent {address[0]}:{address[1]} disconnected")
+
+    def _handle_result(
+        self,
+        state,
+        printer: Printer,
+        tasks: list[Task],
+        idx: int,
+        status_code: int | None,
+        size: int,
+        elapsed: float,
+        error_type: str | None,
+        error_msg: str | None,
+        extra: dict | None = None,
+    ):
+        task = tasks[idx]
+        request_id = state.last_request_id.next()
+        if status_code is None:
+            state.requests_failed.next()
+            state.errors_by_type.next(error_type)
+            state.endpoint_stats.record((task.method, task.url), False, 0, None)
+            exception = _get_remote_exception_cls(error_type)(error_msg)
+            printer.print_failed_request(task, elapsed * 1e9, request_id, exception)
+            return
+
+        ok = status_code < 400
+        if ok:
+            state.requests_success.next()
+        else:
+            state.requests_failed.next()
+        state.requests_latency.append(elapsed)
+        state.responses_by_status.next(str(status_code))
+        if status_code == 304:
+            state.cache_hits.next()
+        extra = extra or {}
+        state.bytes_wire.add(extra.get("wire", size))
+        state.bytes_decoded.add(size)
+        state.decode_time_ns.add(extra.get("decode_ns", 0))
+        for hop_status_code, method, url, hop_elapsed in extra.get("hops", ()):
+            state.redirect_stats.record((hop_status_code, method, url), True, 0, hop_elapsed)
+        if state.latency_by_endpoint:
+            state.latency_by_endpoint.observe((task.method, task.url), elapsed)
+        state.endpoint_stats.record((task.method, task.url), ok, size, elapsed)
+        printer.print_response_info(
+            task, request_id, status_code, ok, size, timedelta(seconds=elapsed)
+        )
+
+    def _handle_stats(self, state, message: dict):
+        state.requests_cancelled.add(message["cancelled"])
+        for method, url, requests, failed, size, buckets in message["warmup"]:
+            snapshot = EndpointSnapshot(
+                requests, failed, size, dict(buckets), ShardedEndpointStats.RESOLUTION
+            )
+            state.warmup_stats.add((method, url), snapshot)
+        if breakers := get_transport().breakers:  # the same options as the agents have
+            for host, circuit_state, opened, rejected in message["circuits"]:
+                breakers.get(host).add(circuit_state, opened, rejected)
+
+
+class RemoteError(Exception):
+    pass
+
+
+_remote_exception_classes: dict[str, t.Type[RemoteError]] = {}
+
+
+def _get_remote_exception_cls(name: str) -> t.Type[RemoteError]:
+    # printer displays class name of the exception, so keep the original one
+    if (cls := _remote_exception_classes.get(name)) is None:
+        cls = _remote_exception_classes.setdefault(name, type(name, (RemoteError,), {}))
+    return cls
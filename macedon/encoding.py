@@ -0,0 +1,107 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Content codings negotiation and decompression. The transports deliver the
+response body as received, and it is decoded here, so that the size on the
+wire and the time spent on decompression can be measured separately from
+the request itself.
+"""
+from __future__ import annotations
+
+import gzip
+import importlib
+import typing as t
+import zlib
+
+CODINGS = ("identity", "gzip", "deflate", "br", "zstd")
+
+# codings requiring third-party packages, any of which would do
+OPTIONAL_MODULES = {
+    "br": ("brotli", "brotlicffi"),
+    "zstd": ("zstandard",),
+}
+
+_modules: dict[str, t.Any] = {}
+
+
+class DecodeError(ValueError):
+    pass
+
+
+def parse_accept_encoding(value: str, decompress: bool = True) -> str:
+    """
+    'gzip,br' -> 'gzip, br'; 'none' is an alias of 'identity'. Unless the
+    body is left compressed, each coding must be supported by the client.
+    """
+    codings = []
+    for coding in filter(None, (c.strip().lower() for c in value.split(","))):
+        coding = "identity" if coding == "none" else coding
+        if coding not in CODINGS:
+            raise ValueError(f"Unknown content coding {coding!r}, expected one of {CODINGS}")
+        if decompress and not _get_module(coding):
+            packages = " or ".join(map(repr, OPTIONAL_MODULES[coding]))
+            raise ValueError(
+                f"Decompressing {coding!r} requires {packages} package to be installed"
+            )
+        codings.append(coding)
+    if not codings:
+        raise ValueError(f"Expected a comma-separated list of {CODINGS}, got: {value!r}")
+    return ", ".join(dict.fromkeys(codings))
+
+
+def decode_content(body: bytes, content_encoding: str) -> bytes:
+    """
+    Undo the codings in the reverse order of their application; the ones not
+    supported (or unknown) are left as is, as well as everything applied before.
+    """
+    for coding in reversed(content_encoding.lower().split(",")):
+        coding = coding.strip()
+        if coding in ("", "identity"):
+            continue
+        if not (decoder := _DECODERS.get(coding)) or not _get_module(coding):
+            break
+        try:
+            body = decoder(body)
+        except Exception as e:
+            raise DecodeError(f"Failed to decode {coding!r} content: {e}") from e
+    return body
+
+
+def _get_module(coding: str) -> t.Any | None:
+    """Import the package required for the coding; `True` if none is required."""
+    if coding not in OPTIONAL_MODULES:
+        return True
+    if coding not in _modules:
+        module = None
+        for name in OPTIONAL_MODULES[coding]:
+            try:
+                module = importlib.import_module(name)
+                break
+            except ImportError:
+                continue
+        _modules[coding] = module
+    return _modules[coding]
+
+
+def _decode_deflate(body: bytes) -> bytes:
+    try:
+        return zlib.decompress(body)
+    except zlib.error:
+        # some servers send raw deflate stream without zlib header
+        return zlib.decompress(body, -zlib.MAX_WBITS)
+
+
+def _decode_zstd(body: bytes) -> bytes:
+    # frames without the content size in the header are not handled by decompress()
+    return _get_module("zstd").ZstdDecompressor().decompressobj().decompress(body)
+
+
+_DECODERS: dict[str, t.Callable[[bytes], bytes]] = {
+    "gzip": gzip.decompress,
+    "x-gzip": gzip.decompress,
+    "deflate": _decode_deflate,
+    "br": lambda body: _get_module("br").decompress(body),
+    "zstd": _decode_zstd,
+}
@@ -8,20 +8,21 @@ import signal
 import sys
 
 import click
-import es7s_commons
-import pytermor as pt
-import urllib3
 from click import pass_context
-from es7s_commons import format_path, format_attrs, to_subscript
-from urllib3.exceptions import InsecureRequestWarning
 
 from . import APP_NAME, APP_VERSION, APP_UPDATED
-from ._common import Options, destroy_state, init_state, get_state, HiddenIntRange
-from .fileparser import destroy_parser, init_parser
-from .io import destroy_io, init_io
-from .logger import destroy_logger, init_logger, get_logger
-from .printer import destroy_printer, init_printer, get_printer
-from .synchronizer import Synchronizer
+from ._common import (
+    DurationParamType,
+    HiddenIntRange,
+    Options,
+    destroy_state,
+    get_state,
+    init_state,
+)
+
+# Heavy dependencies (requests, urllib3, pytermor, es7s_commons) are imported
+# at the point of use, so that `--help` and `--version` do not pay for them.
+# See `scripts/benchmark-startup.py` for the measurements.
 
 _shutdown_started = False
 
@@ -36,13 +37,17 @@ def invoke():
 
 
 def shutdown():
+    from .printer import get_printer
+
     global _shutdown_started
     _shutdown_started = True
-    get_state().shutdown_flag.set()
     get_printer().print_shutdown()
+    get_state().shutdown_flag.set()
 
 
 def exit_gracefully(signal_code: int, *args):
+    from .logger import get_logger
+
     get_logger().info(f"{signal.Signals(signal_code).name} ({signal_code}) received")
     if not _shutdown_started:
         shutdown()
@@ -51,13 +56,16 @@ def exit_gracefully(signal_code: int, *args):
 
 
 class ClickCommand(click.Command):
-    pass
+    def get_help(self, ctx: click.Context) -> str:
+        import pytermor as pt
+
+        ctx.max_content_width = pt.get_preferable_wrap_width()
+        return super().get_help(ctx)
 
 
 @click.command(
     cls=ClickCommand,
     no_args_is_help=True,
-    context_settings=dict(max_content_width=pt.get_preferable_wrap_width()),
     epilog="JetBrains HTTP Client file format: https://jetbrains.com/help/idea/exploring-http-syntax.html",
 )
 @click.argument("ENDPOINT_URL", type=str, nargs=-1)
@@ -92,7 +100,147 @@ class ClickCommand(click.Command):
     type=float,
     default=Options.timeout,
     show_default=True,
-    help="Seconds to wait for the response.",
+    help="Seconds to wait for the whole response, including the redirects and the body "
+    "download.",
+)
+@click.option(
+    "--connect-timeout",
+    type=DurationParamType(),
+    default=Options.connect_timeout,
+    help="Limit for establishing a connection, in seconds or with a unit suffix (e.g. "
+    "'500ms'). Defaults to half of '--timeout'.",
+)
+@click.option(
+    "--read-timeout",
+    type=DurationParamType(),
+    default=Options.read_timeout,
+    help="Limit for waiting on each read from the connection (the first byte of the "
+    "response, the next part of the body), in seconds or with a unit suffix. Defaults to "
+    "'--timeout'.",
+)
+@click.option(
+    "--deadline",
+    type=DurationParamType(),
+    default=Options.deadline,
+    help="Stop the whole run (including the warm-up) after this time, in seconds or with "
+    "a unit suffix (e.g. '90s', '5m'), as if interrupted with Ctrl+C: the requests in "
+    "progress are aborted, and the results collected so far are printed.",
+)
+@click.option(
+    "-w",
+    "--watch",
+    is_flag=True,
+    default=Options.watch,
+    help="Keep running until interrupted, performing each request repeatedly once "
+    "per its interval (see '--interval'), and printing the results as they come. "
+    "Connections are kept alive between the probes; first probes are spread evenly "
+    "over the interval, so that the load stays steady. '--amount' and '--delay' are "
+    "ignored in this mode.",
+)
+@click.option(
+    "--interval",
+    type=DurationParamType(),
+    default=Options.interval,
+    show_default=True,
+    help="Default interval between the probes of each request in '--watch' mode, "
+    "in seconds or with a unit suffix (e.g. '500ms', '30s', '5m'). Can be overridden "
+    "for a particular request with '# @interval' directive inside request block in "
+    "JetBrains HTTP Client format.",
+)
+@click.option(
+    "--stages",
+    metavar="SPEC",
+    help="Run a load profile instead of performing each request '--amount' times: "
+    "the requests are performed repeatedly, with the number of threads or the request "
+    "rate changing from stage to stage, and the throughput and latency percentiles "
+    "are reported for each stage. SPEC is a comma-separated list of stages in the format "
+    "'[+|-]VALUE[rps]:DURATION[..LIMIT]', e.g. '10:30s,+10:30s..200' for 10 threads "
+    "during 30 seconds, then 10 more every 30 seconds up to 200; or '50rps:1m,+50rps:1m..500' "
+    "for a request rate growing from 50 to 500 per second (performed by '--threads' "
+    "threads). '--amount' is ignored in this mode.",
+)
+@click.option(
+    "--replay",
+    type=click.File("rt"),
+    default=Options.replay,
+    metavar="FILENAME",
+    help="Replay the captured traffic (access log in Common/Combined Log Format or HAR "
+    "archive; '-' for stdin) keeping the original intervals between the requests. The "
+    "file is read as the replay goes, so it can be of any size. The delays behind the "
+    "schedule are reported as drift.",
+)
+@click.option(
+    "--replay-format",
+    type=click.Choice(["auto", "clf", "har"]),
+    default=Options.replay_format,
+    show_default=True,
+    help="Format of the '--replay' file: detected by the content if 'auto'.",
+)
+@click.option(
+    "--replay-target",
+    metavar="URL",
+    default=Options.replay_target,
+    help="Origin ('scheme://host[:port]') to send the replayed requests to instead of the "
+    "captured one. Required for the access logs, as they contain only the paths.",
+)
+@click.option(
+    "--replay-speed",
+    type=click.FloatRange(min=0, min_open=True),
+    default=Options.replay_speed,
+    show_default=True,
+    help="Speed-up factor of the replay, e.g. '2' halves the intervals between the requests.",
+)
+@click.option(
+    "--weighted",
+    is_flag=True,
+    default=Options.weighted,
+    help="Draw the requests at random in proportion to their weights instead of performing "
+    "each one '--amount' times in order (the total number of requests stays the same). "
+    "The weight (1 by default) is set with '# @weight' directive inside request block in "
+    "JetBrains HTTP Client format, or with 'weight=N' after the URL in plain lists. "
+    "Also applies to '--stages'.",
+)
+@click.option(
+    "--warmup",
+    type=click.IntRange(min=0),
+    default=Options.warmup,
+    metavar="N",
+    help="Perform N requests (cycling through the request list) before the main run, "
+    "so that DNS lookups, connection setup and a cold server do not distort the results. "
+    "Warm-up requests are neither printed nor included in the results, and their "
+    "statistics are reported separately.",
+)
+@click.option(
+    "--warmup-seconds",
+    type=DurationParamType(),
+    default=Options.warmup_seconds,
+    help="Same as '--warmup', but limits the warm-up phase by time, in seconds or with "
+    "a unit suffix (e.g. '500ms', '30s'). If both options are specified, the phase ends "
+    "when either of the limits is reached.",
+)
+@click.option(
+    "--preconnect",
+    is_flag=True,
+    default=Options.preconnect,
+    help="Open the connections to every origin (one per thread) before the timer starts, "
+    "so that the first requests do not pay for TCP and TLS handshakes. Not supported by "
+    "'http2' transport and for the requests going through a proxy.",
+)
+@click.option(
+    "--cache-redirects",
+    is_flag=True,
+    default=Options.cache_redirects,
+    help="Remember where the permanent redirects (301, 308) of each request lead to, and "
+    "send the next repetitions of the request there directly. Each redirect hop is "
+    "listed in the results with its status and latency regardless of this option.",
+)
+@click.option(
+    "--revalidate",
+    is_flag=True,
+    default=Options.revalidate,
+    help="Remember 'ETag' and 'Last-Modified' of the GET and HEAD responses, and make the "
+    "next repetitions of the request conditional ('If-None-Match', 'If-Modified-Since'). "
+    "'304 Not Modified' responses count as successful and are listed as cache hits.",
 )
 @click.option(
     "-i",
@@ -101,6 +249,40 @@ class ClickCommand(click.Command):
     default=Options.insecure,
     help="Ignore invalid/expired certificates when performing HTTPS requests.",
 )
+@click.option(
+    "--transport",
+    type=click.Choice(["http1", "http2", "raw"]),
+    default=Options.transport,
+    show_default=True,
+    help="Protocol implementation to use. 'http1' reuses keep-alive connections "
+    "(up to one per thread for each origin); 'http2' multiplexes concurrent requests "
+    "to the same origin as streams of one shared connection (HTTPS only, requires "
+    "'httpx[http2]' package); 'raw' "
+    "is a minimal HTTP/1.1 client with keep-alive connections for GET/HEAD requests "
+    "without body, which does not follow redirects and asks for uncompressed responses "
+    "unless '--accept-encoding' is specified (other requests are performed as with 'http1').",
+)
+@click.option(
+    "--accept-encoding",
+    metavar="CODINGS",
+    default=Options.accept_encoding,
+    help="Comma-separated content codings to accept: 'none', 'gzip', 'deflate', 'br' "
+    "(requires 'brotli' package) or 'zstd' (requires 'zstandard' package). The transfer "
+    "and decompression costs are listed in the results. [default: gzip, deflate]",
+)
+@click.option(
+    "--no-decompress",
+    is_flag=True,
+    default=Options.no_decompress,
+    help="Leave the response bodies compressed, as only the transfer matters.",
+)
+@click.option(
+    "--streams",
+    type=click.IntRange(min=1),
+    default=Options.streams,
+    show_default=True,
+    help="Maximum number of concurrent streams per connection for 'http2' transport.",
+)
 @click.option(
     "-f",
     "--file",
@@ -113,6 +295,171 @@ class ClickCommand(click.Command):
     "specify request headers and/or body. The option can be specified multiple times. "
     "Note that ENDPOINT_URL argument(s) are ignored if this option is present.",
 )
+@click.option(
+    "-s",
+    "--scenario",
+    is_flag=True,
+    default=Options.scenario,
+    help="Treat the requests from each FILENAME (or all ENDPOINT_URL arguments) as a "
+    "scenario: the requests are performed one after another by the same thread acting as "
+    "a virtual user, with its own cookies and connections. Values extracted from the "
+    "responses with '# @extract NAME = SOURCE:EXPR' directive (SOURCE being 'json', "
+    "'header' or 'regex') can be referenced in the subsequent requests as '{{NAME}}'. "
+    "'--amount' sets the number of runs of each scenario.",
+)
+@click.option(
+    "--cache/--no-cache",
+    is_flag=True,
+    default=Options.cache,
+    show_default=True,
+    help="Store parsed request files in the user cache directory and load them from "
+    "there on subsequent runs, as long as the file modification time and contents "
+    "stay the same. Standard input is never cached.",
+)
+@click.option(
+    "--clear-cache",
+    "mode_clear_cache",
+    is_flag=True,
+    help="Remove all cached request files before proceeding. If no ENDPOINT_URL "
+    "or FILENAME is specified, exit right after that.",
+)
+@click.option(
+    "--agent",
+    metavar="HOST:PORT",
+    multiple=True,
+    help="Do not perform the requests locally, but split them between the agents "
+    "listening on specified addresses (see '--listen'), and display the merged "
+    "results. If the number of repetitions ('-n') is not less than the number of "
+    "agents, each agent performs all the requests, with the repetitions divided "
+    "between agents; otherwise the requests themselves are divided. '--threads', "
+    "'--delay', the timeouts, '--insecure', '--transport' and '--streams' are "
+    "applied to the agents. The option can be specified multiple times.",
+)
+@click.option(
+    "--listen",
+    metavar="[HOST:]PORT",
+    help="Run as an agent: wait for the jobs from a coordinator (see '--agent') "
+    "on specified address, perform the requests and send the results back. "
+    "HOST defaults to all interfaces; PORT 0 selects a free port. ENDPOINT_URL "
+    "argument(s) and FILENAME(s) are ignored in this mode.",
+)
+@click.option(
+    "--metrics-listen",
+    metavar="[HOST:]PORT",
+    help="Serve live run metrics in Prometheus text format at 'http://HOST:PORT/metrics': "
+    "requests by result, responses by status code, errors by class, latency histograms "
+    "per endpoint and worker thread states. HOST defaults to 127.0.0.1.",
+)
+@click.option(
+    "--self-monitor/--no-self-monitor",
+    is_flag=True,
+    default=Options.self_monitor,
+    show_default=True,
+    help="Sample CPU and memory usage, open file descriptors, threads and scheduling "
+    "lag of the application itself during the run, and warn after the results if the "
+    "client was saturated (in which case latency figures describe the client rather "
+    "than the server), or was close to the limit of open files or ephemeral ports.",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Profile the worker threads of the application itself and write the merged "
+    "results to PATH in pstats format (view with 'python -m pstats PATH', 'snakeviz', "
+    "etc.); the functions taking the most time are listed after the results.",
+)
+@click.option(
+    "--profile-sampling",
+    is_flag=True,
+    default=Options.profile_sampling,
+    help="Instead of tracing every call, sample the worker thread stacks every 5ms "
+    "and write them to PATH in collapsed stack format suitable for flame graph tools. "
+    "Much lower overhead, but less precise than the default mode.",
+)
+@click.option(
+    "--profile-mem",
+    is_flag=True,
+    default=Options.profile_mem,
+    help="Trace memory allocations and list the sites with the biggest memory growth "
+    "per request after the results. Can be used with or without '--profile'.",
+)
+@click.option(
+    "--sort",
+    type=click.Choice(["p50", "p95", "p99", "errors", "count", "bytes", "url"]),
+    default=Options.sort,
+    show_default=True,
+    help="Sort key of the per-endpoint breakdown, which is printed after the results "
+    "if there was more than one endpoint. Endpoints with the highest values are "
+    "listed first, except for 'url' key.",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=0),
+    default=Options.top,
+    show_default=True,
+    help="Number of endpoints to list in the per-endpoint breakdown; 0 to list all.",
+)
+@click.option(
+    "--report",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the summary of the run to PATH in JSON format: request counts by result, "
+    "status code and error class, latency percentiles and per-endpoint breakdown "
+    "(sorted according to '--sort', but not limited by '--top').",
+)
+@click.option(
+    "--trace-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write request/response dumps to PATH instead of stderr, regardless of the "
+    "verbosity. The dumps are written by a separate thread through a bounded buffer; if "
+    "the file cannot keep up, excess dumps are dropped rather than slowing the requests down.",
+)
+@click.option(
+    "--trace-sample",
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Dump only each N-th request/response (see '-vv' and '--trace-file'). "
+    "Can be combined with '--trace-failures' and '--trace-slow', in which case "
+    "the request is dumped if it satisfies any of the conditions.",
+)
+@click.option(
+    "--trace-failures",
+    is_flag=True,
+    default=Options.trace_failures,
+    help="Dump only failed requests (see '--trace-sample').",
+)
+@click.option(
+    "--trace-slow",
+    type=DurationParamType(),
+    help="Dump only requests which took at least DURATION, in seconds or with "
+    "a unit suffix (e.g. '500ms'); see '--trace-sample'.",
+)
+@click.option(
+    "--circuit-breaker",
+    type=click.IntRange(min=1),
+    default=Options.circuit_breaker,
+    metavar="N",
+    help="Open the circuit of a host after N failures in a row (connection errors, timeouts "
+    "and 5xx responses): the requests to the host fail at once instead of waiting out the "
+    "timeouts. After '--circuit-cooldown' one request is let through as a probe, and the "
+    "circuit closes if it succeeds.",
+)
+@click.option(
+    "--circuit-cooldown",
+    type=DurationParamType(),
+    default=Options.circuit_cooldown,
+    show_default=True,
+    help="How long the circuit of a failing host stays open before the probe, in seconds "
+    "or with a unit suffix (e.g. '500ms', '1m').",
+)
+@click.option(
+    "--slo",
+    metavar="SPEC",
+    default=Options.slo,
+    help="Abort the run early when any of the conditions holds: comma-separated list in the "
+    "format 'METRIC>THRESHOLD[:DURATION]', where METRIC is 'errors' (error rate, THRESHOLD "
+    "in percents), 'p50', 'p95' or 'p99' (latency), e.g. 'errors>5%:30s,p99>2s:1m'. The "
+    "conditions are checked every second on the requests completed during that second, and "
+    "must hold for DURATION in a row (a single check if omitted). See also '--exit-code'.",
+)
 @click.option(
     "-x",
     "--exit-code",
@@ -124,7 +471,8 @@ class ClickCommand(click.Command):
     "timed out, etc) will result in a non-zero exit code. (Normally the exit code "
     "0 is returned as long as the application terminated under normal conditions,"
     " regardless of an actual HTTP codes; but it can still die with a non-zero "
-    "code upon invalid option syntax, etc).",
+    "code upon invalid option syntax, etc). If the run was aborted due to '--slo' "
+    "violation, the exit code is 2.",
 )
 @click.option(
     "-c/-C",
@@ -168,17 +516,90 @@ class ClickCommand(click.Command):
     help="Show the version and exit. Specify twice (-VV) to see interpreter and entrypoint paths. "
     "If stdout is not a terminal, print only app version number without labels or timestamps.",
 )
-def callback(mode_version: bool, **kwargs):
+def callback(mode_version: bool, mode_clear_cache: bool, **kwargs):
     if mode_version:
         invoke_version(value=mode_version, **kwargs)
         return
+    if mode_clear_cache:
+        invoke_clear_cache()
+        if not kwargs.get("file") and not kwargs.get("endpoint_url"):
+            return
 
     options = Options(**kwargs)
+    if options.watch and options.agent:
+        raise click.UsageError("'--watch' cannot be combined with '--agent'")
+    if options.scenario and options.agent:
+        raise click.UsageError("'--scenario' cannot be combined with '--agent'")
+    if options.replay and any(
+        (options.watch, options.stages, options.scenario, options.weighted, options.agent)
+    ):
+        raise click.UsageError(
+            "'--replay' cannot be combined with '--watch', '--stages', '--scenario', "
+            "'--weighted' or '--agent'"
+        )
+    if options.replay and (options.warmup or options.warmup_seconds):
+        # the capture is read as it is replayed, there is no request list to warm up with
+        raise click.UsageError(
+            "'--replay' cannot be combined with '--warmup' or '--warmup-seconds'"
+        )
+    if options.replay and (options.file or options.endpoint_url):
+        raise click.UsageError("'--replay' cannot be combined with other requests")
+    if options.weighted and (options.watch or options.scenario):
+        raise click.UsageError("'--weighted' cannot be combined with '--watch' or '--scenario'")
+    if options.profile_sampling and not options.profile:
+        raise click.UsageError("'--profile-sampling' requires '--profile'")
+    if (options.trace_sample or options.trace_failures or options.trace_slow) and not (
+        options.trace_file or options.verbose >= 2
+    ):
+        raise click.UsageError(
+            "'--trace-sample', '--trace-failures' and '--trace-slow' require "
+            "'--trace-file' or '-vv'"
+        )
+    if options.stages:
+        from .stages import parse_stages
+
+        if options.watch or options.agent:
+            raise click.UsageError("'--stages' cannot be combined with '--watch' or '--agent'")
+        try:
+            parse_stages(options.stages, options.threads)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="'--stages'")
+    if options.accept_encoding:
+        from .encoding import parse_accept_encoding
+
+        try:
+            parse_accept_encoding(options.accept_encoding, not options.no_decompress)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="'--accept-encoding'")
+    if options.slo:
+        from .slo import parse_slo
+
+        try:
+            parse_slo(options.slo)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="'--slo'")
+    if options.listen:
+        invoke_agent(options)
+        return
     _init(options)
 
+    if options.agent:
+        from .distributed import Coordinator as Synchronizer
+    else:
+        from .synchronizer import Synchronizer
+
     sync = Synchronizer(options)
     sync.run()
 
+    from .profiler import get_profiler
+
+    if profiler := get_profiler():
+        profiler.report()
+    if options.report:
+        from .report import write_report
+
+        write_report(options.report, sync.time_delta_ns)
+
     _destroy(options)
 
 
@@ -196,6 +617,14 @@ def invoke_version(ctx: click.Context, value: int, **kwargs):
     # fmt: on
     if not value or ctx.resilient_parsing:
         return
+    if not sys.stdout.isatty():
+        click.echo(APP_VERSION)
+        return
+
+    import es7s_commons
+    import pytermor as pt
+    from es7s_commons import format_path, to_subscript
+
     CHAR_MAP = {
         ".": "▄",
         ":": "▄",
@@ -206,7 +635,6 @@ def invoke_version(ctx: click.Context, value: int, **kwargs):
 
     vfmt = lambda s: pt.Fragment(s, "green")
     ufmt = lambda s: pt.Fragment(s, "gray")
-    tty = sys.stdout.isatty()
 
     regex = re.compile(R"(?m)([:Y]+)|([.&]+)|(\^+)|([▔▏]+)|([▁▕]+)|( *v)")
     prim_st = pt.Style(fg=pt.cvr.ICATHIAN_YELLOW)
@@ -233,17 +661,13 @@ def invoke_version(ctx: click.Context, value: int, **kwargs):
             result = result.replace(f, t)
         return result
 
-    if tty:
-        pt.echo(regex.sub(replace, invoke_version.__doc__))
+    pt.echo(regex.sub(replace, invoke_version.__doc__))
 
     pkgs = (
         [APP_NAME, APP_VERSION, APP_UPDATED],
         ["pytermor", pt.__version__, pt.__updated__],
         ["es7s-commons", es7s_commons.PKG_VERSION, es7s_commons.PKG_UPDATED],
     )
-    if not tty:
-        pt.echo(pkgs[0][1])
-        return
 
     for pkgname, pkgver, pkgupd in pkgs:
         frags = [pkgname.rjust(12), pt.pad(2), vfmt(pkgver.ljust(14))]
@@ -265,24 +689,90 @@ def invoke_version(ctx: click.Context, value: int, **kwargs):
     ctx.exit()
 
 
+def invoke_clear_cache():
+    from .cache import TaskCache
+
+    cache = TaskCache()
+    removed = cache.clear()
+    click.echo(f"Removed {removed} cache entr{'y' if removed == 1 else 'ies'} from {cache.path}")
+
+
+def invoke_agent(options: Options):
+    from .distributed import Agent
+    from .io import destroy_io, init_io
+    from .logger import destroy_logger, init_logger
+
+    init_io(options)
+    init_logger(options)
+    _log_init_info(options)
+
+    Agent(options).run()
+
+    destroy_logger()
+    destroy_io()
+
+
 def _init(options: Options):
+    import urllib3
+    from urllib3.exceptions import InsecureRequestWarning
+
+    from .fileparser import init_parser
+    from .io import init_io
+    from .logger import init_logger
+    from .metrics import init_metrics_server
+    from .monitor import init_monitor
+    from .printer import init_printer
+    from .profiler import init_profiler
+    from .slo import init_slo_guard
+    from .stages import init_load_profile
+    from .tracer import init_tracer
+    from .transport import init_transport
+
     urllib3.disable_warnings(InsecureRequestWarning)
 
     init_state(options)
     init_io(options)
     init_logger(options)
     _log_init_info(options)
+    init_tracer(options)
 
-    init_parser()
+    init_parser(options)
+    init_load_profile(options)
     init_printer()
+    init_transport(options)
+    init_metrics_server(options)
+    init_profiler(options)
+    init_monitor(options)
+    init_slo_guard(options)
 
 
 def _destroy(options: Options):
+    from .fileparser import destroy_parser
+    from .io import destroy_io
+    from .logger import destroy_logger
+    from .metrics import destroy_metrics_server
+    from .monitor import destroy_monitor
+    from .printer import destroy_printer
+    from .profiler import destroy_profiler
+    from .slo import destroy_slo_guard, get_slo_guard
+    from .stages import destroy_load_profile
+    from .tracer import destroy_tracer
+    from .transport import destroy_transport
+
     exit_code = 0
     if options.exit_code:
-        if get_state().requests_failed.value > 0:
+        if (slo_guard := get_slo_guard()) and slo_guard.violation:
+            exit_code = 2
+        elif get_state().requests_failed.value > 0:
             exit_code = 1
 
+    destroy_slo_guard()
+    destroy_monitor()
+    destroy_tracer()
+    destroy_profiler()
+    destroy_load_profile()
+    destroy_metrics_server()
+    destroy_transport()
     destroy_state()
     destroy_printer()
     destroy_parser()
@@ -294,7 +784,15 @@ def _destroy(options: Options):
 
 
 def _log_init_info(options: Options):
+    import logging
+
+    from es7s_commons import format_attrs
+
+    from .logger import get_logger
+
     logger = get_logger()
+    if not logger.isEnabledFor(logging.INFO):
+        return
     logger.info(
         f"{APP_NAME} {APP_VERSION} "
         + format_attrs(dict(PID=os.getpid(), PPID=os.getppid(), UID=os.getuid(), CWD=os.getcwd()))
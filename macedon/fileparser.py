@@ -2,6 +2,7 @@
 #  macedon [CLI web service availability verifier]
 #  (c) 2022-2024 A. Shavykin <0.delameter@gmail.com>
 # -----------------------------------------------------------------------------
+import os
 import re
 import typing as t
 from functools import partial
@@ -9,23 +10,56 @@ from functools import partial
 import pytermor as pt
 from requests.structures import CaseInsensitiveDict
 
-from ._common import Task
+from ._common import Options, Task, parse_duration
+from .cache import TaskCache
 from .logger import get_logger
+from .scenario import parse_extract_rule
 
 
 class FileParser:
     # language=regexp
-    METHOD_URL_REGEX = R"\s*([A-Z]+)?\s*(https?://\S+)\s*"
+    METHOD_URL_REGEX = R"\s*([A-Z]+)?\s*(https?://\S+)\s*(?:weight=(\S+)\s*)?"
     # language=regexp
     HEADER_REGEX = R"\s*([a-zA-Z0-9_-]+):(.+)\s*"
+    # language=regexp
+    DIRECTIVE_REGEX = R"\s*#\s*@([a-zA-Z0-9_-]+)\s*(.*?)\s*"
+
+    def __init__(self, cache: TaskCache = None):
+        self._cache = cache
 
     def parse(self, file: t.TextIO):
         data = file.read()
         try:
-            yield from self._parse(data, file.name)
+            yield from self._parse_cached(data, file)
         except Exception as e:
             raise RuntimeError(f"Failed to parse file '{file}'") from e
 
+    def _parse_cached(self, data: str, file: t.TextIO) -> t.Iterable[Task]:
+        if not self._cache or not (mtime_ns := self._get_mtime_ns(file)):
+            yield from self._parse(data, file.name)
+            return
+
+        digest = self._cache.digest(data)
+        if (tasks := self._cache.load(file.name, mtime_ns, digest)) is not None:
+            get_logger().debug(f"Loaded {len(tasks)} task(s) from cache: {file.name!r}")
+            yield from tasks
+            return
+
+        tasks = [*self._parse(data, file.name)]
+        try:
+            self._cache.store(file.name, mtime_ns, digest, tasks)
+        except OSError as e:
+            get_logger().warning(f"Failed to write parsed tasks to cache: {e}")
+        yield from tasks
+
+    def _get_mtime_ns(self, file: t.TextIO) -> int | None:
+        try:
+            if file.isatty() or not os.path.isfile(file.name):
+                return None  # stdin or pipe
+            return os.stat(file.name).st_mtime_ns
+        except (OSError, TypeError, ValueError):
+            return None
+
     def _parse(self, data: str, file_name: str) -> t.Iterable[Task]:
         get_logger().trace(f"Parsing {file_name!r}" + "\n" + data)
 
@@ -40,7 +74,8 @@ class FileParser:
             if line.startswith("#"):
                 continue
             try:
-                yield Task(*self._extract_method_url(line))
+                url, method, weight = self._extract_method_url(line)
+                yield Task(url, method, weight=weight)
             except ValueError as e:
                 get_logger().exception(e)
                 continue
@@ -50,15 +85,25 @@ class FileParser:
         request_filtered_list = [*filter(None, (r.strip() for r in request_list))]
 
         for idx, request in enumerate(request_filtered_list):
+            directives = [*self._extract_directives(request.splitlines())]
             lines, last_empty_idx = self._filter_jb_http_file_lines(request.splitlines())
-            url, method = self._extract_method_url(lines[0])
+            url, method, weight = self._extract_method_url(lines[0])
             headers = CaseInsensitiveDict(self._extract_headers(lines[1:last_empty_idx]))
             body = None
             if last_empty_idx is not None:
                 body_lines = lines[last_empty_idx:]
                 body = "".join(body_lines)
 
-            yield Task(url, method, headers, body)
+            interval = None
+            extract = []
+            for name, value in directives:
+                if name == "interval":
+                    interval = parse_duration(value)
+                elif name == "extract":
+                    extract.append(parse_extract_rule(value))
+                elif name == "weight":
+                    weight = self._parse_weight(value)
+            yield Task(url, method, headers, body, interval, tuple(extract) or None, weight)
 
     def _filter_jb_http_file_lines(
         self,
@@ -76,12 +121,22 @@ class FileParser:
 
         return outp, last_empty_line_idx
 
-    def _extract_method_url(self, line: str) -> tuple[str, str]:
+    def _extract_method_url(self, line: str) -> tuple[str, str, float | None]:
         if m := re.match(self.METHOD_URL_REGEX, line):
-            method, url = m.groups()
-            return url, method or "GET"
+            method, url, weight = m.groups()
+            return url, method or "GET", self._parse_weight(weight) if weight else None
         raise ValueError(f"Invalid format, expected '{{method}} http(s)?://{{url}}', got: {line!r}")
 
+    def _parse_weight(self, value: str) -> float:
+        if not 0 < (weight := float(value)) < float("inf"):
+            raise ValueError(f"Weight should be a positive number, got: {value!r}")
+        return weight
+
+    def _extract_directives(self, lines: list[str]) -> t.Iterable[tuple[str, str]]:
+        for line in lines:
+            if m := re.fullmatch(self.DIRECTIVE_REGEX, line):
+                yield m.group(1).lower(), m.group(2)
+
     def _extract_headers(self, lines: list[str]) -> t.Iterable[tuple[str, str]]:
         for line in lines:
             if not (m := re.match(self.HEADER_REGEX, line)):
@@ -96,9 +151,9 @@ def get_parser():
     return _parser
 
 
-def init_parser():
+def init_parser(options: Options):
     global _parser
-    _parser = FileParser()
+    _parser = FileParser(TaskCache() if options.cache else None)
     return _parser
 
 
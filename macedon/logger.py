@@ -3,19 +3,22 @@
 #  (c) 2022-2023 A. Shavykin <0.delameter@gmail.com>
 # -----------------------------------------------------------------------------
 import logging
+import queue
 import sys
 from logging import (
     Formatter as BaseFormatter,
-    LogRecord as BaseLogRecord,
+    LogRecord,
     Logger as BaseLogger,
     StreamHandler,
     getLogger,
 )
+from logging.handlers import QueueHandler, QueueListener
 import pytermor as pt
-from ._common import Options
+from ._common import Options, ShardedCounter
 from .io import get_stderr
 
 TRACE = 15
+BUFFER_SIZE = 10000  # records
 
 VERBOSITY_LOG_LEVELS = {
     0: logging.CRITICAL,
@@ -42,7 +45,39 @@ class Logger(BaseLogger):
         super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel)  # noqa
 
 
+class BufferedHandler(QueueHandler):
+    """
+    Puts the records into a bounded queue, leaving the formatting and the
+    output to the listener thread, so that logging does not delay the
+    requests in progress. When the queue is full, the records below the
+    warning level are dropped (and counted) rather than blocking the caller.
+    """
+
+    def __init__(self, buffer: queue.Queue):
+        super().__init__(buffer)
+        self.dropped = ShardedCounter()
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        return record  # formatted by the listener
+
+    def enqueue(self, record: LogRecord):
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.next()
+
+
+class BufferedListener(QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # default one fails if the queue is full
+
+
 _logger: Logger | None = None
+_handler: BufferedHandler | None = None
+_listener: BufferedListener | None = None
 
 
 def get_logger() -> Logger:
@@ -54,7 +89,6 @@ def get_logger() -> Logger:
 def init_logger(options: Options) -> Logger:
     logging.addLevelName(TRACE, "TRACE")
     logging.setLoggerClass(Logger)
-    logging.setLogRecordFactory(LogRecord)
 
     log_level = VERBOSITY_LOG_LEVELS.get(options.verbose, logging.WARNING)
 
@@ -63,39 +97,38 @@ def init_logger(options: Options) -> Logger:
 
     from . import APP_NAME
 
-    global _logger
+    global _logger, _handler, _listener
     _logger = getLogger(APP_NAME)
-    _handler = StreamHandler(sys.stderr)
-    _handler.setFormatter(SgrFormatter(options))
-    _handler.setLevel(log_level)
+    stream_handler = StreamHandler(sys.stderr)
+    stream_handler.setFormatter(SgrFormatter(options))
+    stream_handler.setLevel(log_level)
+
+    _handler = BufferedHandler(queue.Queue(BUFFER_SIZE))
+    _listener = BufferedListener(_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
     _logger.addHandler(_handler)
     _logger.setLevel(log_level)
     return _logger
 
 
 def destroy_logger():
-    global _logger
-    _logger = None
-
-
-class LogRecord(BaseLogRecord):
-    def __init__(
-        self,
-        name: str,
-        level: int,
-        pathname: str,
-        lineno: int,
-        msg: object,
-        args,
-        exc_info,
-        func: str | None = ...,
-        sinfo: str | None = ...,
-    ) -> None:
-        super().__init__(name, level, pathname, lineno, msg, args, exc_info, func, sinfo)
-        self.rel_created_str = pt.format_time_delta(self.relativeCreated / 1000, 6)
+    global _logger, _handler, _listener
+    if _listener:
+        _listener.stop()  # flushes the queue
+        if dropped := _handler.dropped.value:
+            msg = f"Dropped {dropped} log record(s), as the output could not keep up"
+            record = _logger.makeRecord(_logger.name, logging.WARNING, __file__, 0, msg, (), None)
+            _listener.handlers[0].handle(record)
+        _logger.removeHandler(_handler)
+    _logger = _handler = _listener = None
 
 
 class Formatter(BaseFormatter):
+    def format(self, record: LogRecord) -> str:
+        # computed here rather than on record creation, i.e. in the listener thread
+        record.rel_created_str = pt.format_time_delta(record.relativeCreated / 1000, 6)
+        return super().format(record)
+
     def _get_rel_time_tpl(self, options: Options) -> str:
         if options.verbose >= 2:
             return "(+%(rel_created_str)s)"
@@ -0,0 +1,137 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Embedded HTTP endpoint exposing live run metrics in Prometheus text format.
+Scrapes read the sharded counters and histograms without taking any locks
+used by the workers.
+"""
+from __future__ import annotations
+
+import threading as th
+import typing as t
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ._common import Options, State, get_state, parse_address
+from .logger import get_logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+WORKER_STATES = ("initial", "waiting", "requesting", "dead")
+
+_metrics_server: MetricsServer | None = None
+
+
+def get_metrics_server() -> MetricsServer | None:
+    return _metrics_server
+
+
+def init_metrics_server(options: Options) -> MetricsServer | None:
+    global _metrics_server
+    if options.metrics_listen:
+        _metrics_server = MetricsServer(parse_address(options.metrics_listen))
+        _metrics_server.start()
+    return _metrics_server
+
+
+def destroy_metrics_server():
+    global _metrics_server
+    if _metrics_server:
+        _metrics_server.stop()
+    _metrics_server = None
+
+
+class MetricsServer:
+    def __init__(self, address: tuple[str, int]):
+        self._server = ThreadingHTTPServer(address, _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._thread = th.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self):
+        self._thread.start()
+        get_logger().info("Serving metrics at http://%s:%d/metrics" % self.address)
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics(get_state()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        get_logger().debug("Metrics request: " + format % args)
+
+
+def render_metrics(state: State) -> str:
+    return "".join(_render_metrics(state))
+
+
+def _render_metrics(state: State) -> t.Iterable[str]:
+    snapshot = state.snapshot()
+
+    yield from _header("macedon_requests_scheduled_total", "counter", "Requests scheduled so far.")
+    yield _sample("macedon_requests_scheduled_total", snapshot.requests_total)
+
+    yield from _header("macedon_requests_total", "counter", "Completed requests by result.")
+    yield _sample("macedon_requests_total", snapshot.requests_success, result="success")
+    yield _sample("macedon_requests_total", snapshot.requests_failed, result="failure")
+
+    yield from _header("macedon_responses_total", "counter", "Received responses by status code.")
+    for status, value in sorted(state.responses_by_status.values().items()):
+        yield _sample("macedon_responses_total", value, code=status)
+
+    yield from _header("macedon_errors_total", "counter", "Failed requests by error class.")
+    for error_type, value in sorted(state.errors_by_type.values().items()):
+        yield _sample("macedon_errors_total", value, error=error_type)
+
+    name = "macedon_request_duration_seconds"
+    yield from _header(name, "histogram", "Response latency by endpoint.")
+    latency_by_endpoint = state.latency_by_endpoint.snapshot() if state.latency_by_endpoint else {}
+    for (method, url), histogram in sorted(latency_by_endpoint.items()):
+        labels = dict(method=method, url=url)
+        for bound, value in zip(histogram.buckets, histogram.cumulative_counts):
+            yield _sample(f"{name}_bucket", value, **labels, le=_format_value(bound))
+        yield _sample(f"{name}_bucket", histogram.count, **labels, le="+Inf")
+        yield _sample(f"{name}_sum", histogram.sum, **labels)
+        yield _sample(f"{name}_count", histogram.count, **labels)
+
+    yield from _header("macedon_workers", "gauge", "Worker threads by state.")
+    worker_states = Counter(state.worker_states.copy())
+    for worker_state in sorted({*WORKER_STATES, *worker_states}):
+        yield _sample("macedon_workers", worker_states[worker_state], state=worker_state)
+
+
+def _header(name: str, metric_type: str, help: str) -> t.Iterable[str]:
+    yield f"# HELP {name} {help}\n"
+    yield f"# TYPE {name} {metric_type}\n"
+
+
+def _sample(name: str, value: int | float, **labels: str) -> str:
+    if labels:
+        name += "{%s}" % ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f"{name} {_format_value(value)}\n"
+
+
+def _format_value(value: int | float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return f"{value:.1f}"
+    return str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", R"\\").replace('"', R"\"").replace("\n", R"\n")
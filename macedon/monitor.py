@@ -0,0 +1,219 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Background sampler of the resources used by the application itself. When
+the client is saturated, the latency figures describe the client rather
+than the server, so the epilog warns about it.
+"""
+from __future__ import annotations
+
+import resource
+import threading as th
+import time
+import typing as t
+from dataclasses import dataclass, replace
+
+from ._common import Options
+from .logger import get_logger
+
+_monitor: SelfMonitor | None = None
+
+
+def get_monitor() -> SelfMonitor | None:
+    return _monitor
+
+
+def init_monitor(options: Options) -> SelfMonitor | None:
+    global _monitor
+    if options.self_monitor:
+        _monitor = SelfMonitor()
+        _monitor.start()
+    return _monitor
+
+
+def destroy_monitor():
+    global _monitor
+    if _monitor:
+        _monitor.stop()
+    _monitor = None
+
+
+@dataclass(frozen=True)
+class MonitorSample:
+    cpu_percent: float  # of this process, 100 = one core
+    system_cpu_percent: float
+    rss: int
+    fds: int
+    threads: int
+    lag: float  # how late the sampler woke up, seconds
+    ephemeral_ports: int | None  # in use by all processes
+
+
+@dataclass
+class MonitorSummary:
+    """Running aggregates of the samples, the samples themselves are not kept."""
+
+    count: int = 0
+    pegged: int = 0  # samples with the process or the system CPU saturated
+    peak_cpu_percent: float = 0.0
+    peak_system_cpu_percent: float = 0.0
+    peak_fds: int = 0
+    peak_ephemeral_ports: int | None = None
+    peak_lag: float = 0.0
+    last: MonitorSample | None = None
+
+
+class SelfMonitor:
+    INTERVAL_SEC = 0.5
+    PORTS_EVERY_NTH_SAMPLE = 4  # enumerating all sockets is relatively expensive
+
+    # Python code of all threads is serialized by GIL, so the process is
+    # saturated at 100% of one core, regardless of the number of cores.
+    CPU_PEGGED_PERCENT = 90
+    SYSTEM_CPU_PEGGED_PERCENT = 95
+    CPU_PEGGED_MIN_SHARE = 0.25
+    FDS_WARNING_SHARE = 0.8
+    PORTS_WARNING_SHARE = 0.8
+    LAG_WARNING_SEC = 0.1
+
+    def __init__(self):
+        import psutil
+
+        self._psutil = psutil
+        self._process = psutil.Process()
+        self._summary = MonitorSummary()
+        self._stop = th.Event()
+        self._thread = th.Thread(target=self._run, name="monitor", daemon=True)
+        self.fd_limit: int | None = _get_fd_limit()
+        self.port_range: tuple[int, int] | None = _get_ephemeral_port_range()
+
+    @property
+    def summary(self) -> MonitorSummary:
+        return replace(self._summary)
+
+    def start(self):
+        self._process.cpu_percent()  # first call always returns 0
+        self._psutil.cpu_percent()
+        self._thread.start()
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            try:
+                self._add_sample(self._take_sample(0.0, count_ports=False))  # the remainder
+            except self._psutil.Error:
+                pass
+
+    def get_warnings(self) -> list[str]:
+        self.stop()
+        return [*self._make_warnings(self.summary)]
+
+    def _run(self):
+        idx = 0
+        expected = time.monotonic() + self.INTERVAL_SEC
+        while not self._stop.wait(max(0.0, expected - time.monotonic())):
+            lag = max(0.0, time.monotonic() - expected)
+            count_ports = idx % self.PORTS_EVERY_NTH_SAMPLE == 0
+            try:
+                self._add_sample(self._take_sample(lag, count_ports))
+            except self._psutil.Error as e:
+                get_logger().warning(f"Self-monitoring failed: {e}")
+                return
+            idx += 1
+            expected = time.monotonic() + self.INTERVAL_SEC
+
+    def _take_sample(self, lag: float, count_ports: bool) -> MonitorSample:
+        process = self._process
+        with process.oneshot():
+            sample = MonitorSample(
+                cpu_percent=process.cpu_percent(),
+                system_cpu_percent=self._psutil.cpu_percent(),
+                rss=process.memory_info().rss,
+                fds=process.num_fds(),
+                threads=process.num_threads(),
+                lag=lag,
+                ephemeral_ports=self._count_ephemeral_ports() if count_ports else None,
+            )
+        get_logger().debug(f"Self-monitoring: {sample}")
+        return sample
+
+    def _count_ephemeral_ports(self) -> int | None:
+        if not self.port_range:
+            return None
+        low, high = self.port_range
+        try:
+            connections = self._psutil.net_connections("inet")
+        except self._psutil.AccessDenied:
+            self.port_range = None
+            return None
+        return len(
+            {
+                (c.family, c.laddr.port)
+                for c in connections
+                if c.laddr and c.raddr and low <= c.laddr.port <= high
+            }
+        )
+
+    def _add_sample(self, sample: MonitorSample):
+        summary = self._summary
+        summary.count += 1
+        if (
+            sample.cpu_percent >= self.CPU_PEGGED_PERCENT
+            or sample.system_cpu_percent >= self.SYSTEM_CPU_PEGGED_PERCENT
+        ):
+            summary.pegged += 1
+        summary.peak_cpu_percent = max(summary.peak_cpu_percent, sample.cpu_percent)
+        summary.peak_system_cpu_percent = max(
+            summary.peak_system_cpu_percent, sample.system_cpu_percent
+        )
+        summary.peak_fds = max(summary.peak_fds, sample.fds)
+        if sample.ephemeral_ports is not None:
+            summary.peak_ephemeral_ports = max(
+                summary.peak_ephemeral_ports or 0, sample.ephemeral_ports
+            )
+        summary.peak_lag = max(summary.peak_lag, sample.lag)
+        summary.last = sample
+
+    def _make_warnings(self, summary: MonitorSummary) -> t.Iterable[str]:
+        if not summary.count:
+            return
+
+        if summary.pegged >= max(2, summary.count * self.CPU_PEGGED_MIN_SHARE):
+            yield (
+                f"Client CPU was saturated {100 * summary.pegged / summary.count:.0f}% "
+                f"of the time (peak {summary.peak_cpu_percent:.0f}% of a core, "
+                f"system {summary.peak_system_cpu_percent:.0f}%); "
+                f"latency includes client-side delays"
+            )
+
+        peak_fds = summary.peak_fds
+        if self.fd_limit and peak_fds >= self.fd_limit * self.FDS_WARNING_SHARE:
+            yield f"Open file descriptors reached {peak_fds} of {self.fd_limit} (RLIMIT_NOFILE)"
+
+        peak_ports = summary.peak_ephemeral_ports
+        if peak_ports is not None and self.port_range:
+            ports_total = self.port_range[1] - self.port_range[0] + 1
+            if peak_ports >= ports_total * self.PORTS_WARNING_SHARE:
+                yield f"Ephemeral ports in use reached {peak_ports} of {ports_total}"
+
+        if summary.peak_lag >= self.LAG_WARNING_SEC:
+            yield f"Threads were starved for up to {summary.peak_lag * 1e3:.0f}ms (scheduling lag)"
+
+
+def _get_fd_limit() -> int | None:
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return None
+    return soft
+
+
+def _get_ephemeral_port_range() -> tuple[int, int] | None:
+    try:
+        with open("/proc/sys/net/ipv4/ip_local_port_range") as f:
+            low, high = map(int, f.read().split())
+        return low, high
+    except (OSError, ValueError):
+        return None
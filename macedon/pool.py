@@ -0,0 +1,372 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+from __future__ import annotations
+
+import heapq
+import itertools
+import random
+import threading as th
+import time
+import typing as t
+from collections import deque
+from queue import Empty
+
+from ._common import Scenario, Task, get_state
+from .logger import get_logger
+
+
+class PoolClosed(Exception):
+    """No more tasks will be available from the pool."""
+
+
+def _count_dispatched(task: Task | Scenario):
+    if isinstance(task, Scenario):
+        get_state().requests_total.add(len(task.tasks))
+    else:
+        get_state().requests_total.next()
+
+
+class AliasTable:
+    """
+    Weighted random sampling by Vose's alias method: O(n) to build, O(1) to
+    draw. Each of n equiprobable slots holds an item and (if the item's share
+    is less than 1/n) an alias, which takes the rest of the slot.
+    """
+
+    def __init__(self, items: list, weights: list[float], rng: random.Random = None):
+        self._items = items
+        self._rng = rng or random.Random()
+        n = len(items)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self._prob: list[float] = [1.0] * n
+        self._alias: list[int] = [*range(n)]
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._prob[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # the rest are 1 up to the rounding errors
+
+    def draw(self):
+        idx = self._rng.randrange(len(self._items))
+        if self._rng.random() >= self._prob[idx]:
+            idx = self._alias[idx]
+        return self._items[idx]
+
+
+def _get_weight(task: Task | Scenario) -> float:
+    return getattr(task, "weight", None) or 1.0
+
+
+class TaskPool:
+    """
+    Source of the tasks for the workers. `get()` either returns a task,
+    raises `Empty` if no task became available within `timeout` seconds
+    (so that the worker could check the shutdown flag), or raises
+    `PoolClosed` if the pool is exhausted.
+    """
+
+    unique_tasks = False  # each task is returned once, thus should not be cached
+
+    def put(self, task: Task):
+        raise NotImplementedError
+
+    def get(self, timeout: float) -> Task:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class FiniteTaskPool(TaskPool):
+    """All the tasks are put in advance; each is returned exactly once."""
+
+    def __init__(self):
+        self._tasks: deque[Task] = deque()
+
+    def put(self, task: Task):
+        self._tasks.append(task)
+
+    def get(self, timeout: float) -> Task:
+        try:
+            return self._tasks.popleft()
+        except IndexError:
+            raise PoolClosed
+
+    def close(self):
+        self._tasks.clear()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+class WeightedTaskPool(TaskPool):
+    """
+    Each task put makes the pool return `amount` more tasks, which are drawn
+    at random in proportion to the task weights, so that a run of any length
+    with a given traffic mix is produced without materializing the sequence.
+    """
+
+    def __init__(self, amount: int):
+        self._amount = amount
+        self._tasks: list[Task] = []
+        self._table: AliasTable | None = None
+        self._lock = th.Lock()
+        self._remaining = 0
+
+    def put(self, task: Task):
+        with self._lock:
+            self._tasks.append(task)
+            self._table = None
+            self._remaining += self._amount
+
+    def get(self, timeout: float) -> Task:
+        with self._lock:
+            if self._remaining <= 0:
+                raise PoolClosed
+            self._remaining -= 1
+            if not self._table:
+                self._table = AliasTable(self._tasks, [*map(_get_weight, self._tasks)])
+            return self._table.draw()
+
+    def close(self):
+        with self._lock:
+            self._remaining = 0
+
+    def __len__(self) -> int:
+        return self._remaining
+
+
+class ScheduledTaskPool(TaskPool):
+    """
+    Endless pool for the watch mode: every task is returned repeatedly, once
+    per its interval (or `default_interval`, if the task has none; scenarios
+    always use the latter). Due times are kept in a heap; first probes of the
+    tasks are spread evenly over their intervals, so that the load stays
+    steady instead of coming in bursts. If the workers fall behind, the
+    missed probes are skipped rather than performed in a rush.
+    """
+
+    SPREAD_FACTOR = 0.6180339887  # golden ratio: evenly spread for any number of tasks
+
+    def __init__(self, default_interval: float):
+        self._default_interval = default_interval
+        self._heap: list[tuple[float, int, Task]] = []
+        self._seq = itertools.count()
+        self._cond = th.Condition()
+        self._closed = False
+        self._start = time.monotonic()
+        self.skipped = 0
+
+    def put(self, task: Task):
+        seq = next(self._seq)
+        offset = self._get_interval(task) * (seq * self.SPREAD_FACTOR % 1)
+        with self._cond:
+            heapq.heappush(self._heap, (self._start + offset, seq, task))
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Task:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosed
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    return self._pop(now)
+                if now >= deadline:
+                    raise Empty
+                wait_until = min(deadline, self._heap[0][0]) if self._heap else deadline
+                self._cond.wait(wait_until - now)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _pop(self, now: float) -> Task:
+        due, seq, task = heapq.heappop(self._heap)
+        interval = self._get_interval(task)
+        next_due = due + interval
+        if next_due <= now:
+            missed = int((now - due) // interval)
+            self.skipped += missed
+            next_due += interval * missed
+            get_logger().debug(f"Falling behind the schedule, skipped {missed} probe(s): {task}")
+        heapq.heappush(self._heap, (next_due, seq, task))
+        if self._heap[0][0] <= now:
+            self._cond.notify()  # more tasks are due, wake up another worker
+
+        _count_dispatched(task)
+        return task
+
+    def _get_interval(self, task: Task | Scenario) -> float:
+        return getattr(task, "interval", None) or self._default_interval
+
+
+class ReplayTaskPool(TaskPool):
+    """
+    Pool for the replay mode: the tasks are returned at their offsets from
+    the start of the replay (divided by `speed`), as they are read from the
+    captured traffic. The tasks are read lazily, one ahead, so the pool takes
+    constant memory regardless of the capture size. A task is never skipped;
+    if the workers cannot keep up, it is returned late, and the delay from
+    the due time is recorded as the schedule drift.
+    """
+
+    unique_tasks = True
+
+    def __init__(self, items: t.Iterator[tuple[float, Task]], speed: float = 1.0):
+        self._items = items
+        self._speed = speed
+        self._cond = th.Condition()
+        self._closed = False
+        self._start: float | None = None
+        self._next: tuple[float, Task] | None = None
+
+    def put(self, task: Task):
+        raise NotImplementedError("Tasks are read from the capture")
+
+    def get(self, timeout: float) -> Task:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._start is None:
+                self._start = time.monotonic()
+            while True:
+                if self._closed or not self._peek():
+                    self._closed = True
+                    self._cond.notify_all()
+                    raise PoolClosed
+                now = time.monotonic()
+                due = self._start + self._next[0] / self._speed
+                if due <= now:
+                    return self._pop(now, due)
+                if now >= deadline:
+                    raise Empty
+                self._cond.wait(min(deadline, due) - now)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        """0 or 1, as the number of tasks is not known in advance."""
+        with self._cond:
+            # the errors of parsing the beginning of the capture are raised from here
+            return int(not self._closed and self._peek(strict=True))
+
+    def _peek(self, strict: bool = False) -> bool:
+        if self._next is None:
+            try:
+                self._next = next(self._items, None)
+            except ValueError as e:
+                if strict:
+                    raise
+                get_logger().error(f"Replay stopped: {e}")
+                self._items = iter(())
+        return self._next is not None
+
+    def _pop(self, now: float, due: float) -> Task:
+        task = self._next[1]
+        self._next = None
+        get_state().replay_drift.observe(now - due)
+        get_state().used_methods.add(task.method)
+        if self._peek() and self._start + self._next[0] / self._speed <= now:
+            self._cond.notify()  # more tasks are due, wake up another worker
+
+        _count_dispatched(task)
+        return task
+
+
+class CyclicTaskPool(TaskPool):
+    """
+    Endless pool for the load stages: the tasks are returned in a round-robin
+    manner (or drawn at random in proportion to their weights, if `weighted`)
+    until the pool is closed. If the rate is set, the tasks are handed
+    out no more often than `rate` times per second, no matter how many workers
+    are waiting for them; otherwise as fast as the workers can take them.
+    If `limit` is set, the pool is closed after returning that many tasks.
+    """
+
+    CATCH_UP_SEC = 0.05
+
+    def __init__(self, limit: int = None, count_total: bool = True, weighted: bool = False):
+        self._tasks: list[Task] = []
+        self._table: AliasTable | None = None
+        self._weighted = weighted
+        self._seq = itertools.count()
+        self._limit = limit
+        self._count_total = count_total
+        self._cond = th.Condition()
+        self._closed = False
+        self._rate: float | None = None
+        self._next_due = 0.0
+
+    def put(self, task: Task):
+        with self._cond:
+            self._tasks.append(task)
+            self._table = None
+            self._cond.notify()
+
+    def set_rate(self, rate: float | None):
+        with self._cond:
+            self._rate = rate
+            self._next_due = time.monotonic()
+            self._cond.notify_all()
+
+    def get(self, timeout: float) -> Task:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosed
+                now = time.monotonic()
+                if self._tasks and (not self._rate or self._next_due <= now):
+                    return self._pop(now)
+                if now >= deadline:
+                    raise Empty
+                wait_until = min(deadline, self._next_due) if self._tasks else deadline
+                self._cond.wait(max(0.0, wait_until - now))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def _pop(self, now: float) -> Task:
+        if self._rate:
+            # small delays in waking up are compensated, but if the workers could
+            # not keep up the pace, the missed slots are lost rather than spent
+            # on a burst of requests
+            self._next_due = max(self._next_due, now - self.CATCH_UP_SEC) + 1 / self._rate
+        seq = next(self._seq)
+        if self._limit is not None and seq + 1 >= self._limit:
+            self._closed = True
+            self._cond.notify_all()
+        if self._weighted:
+            if not self._table:
+                self._table = AliasTable(self._tasks, [*map(_get_weight, self._tasks)])
+            task = self._table.draw()
+        else:
+            task = self._tasks[seq % len(self._tasks)]
+
+        if self._count_total:
+            _count_dispatched(task)
+        return task
@@ -5,16 +5,16 @@
 from __future__ import annotations
 
 import re
+import textwrap
 import typing
 from datetime import timedelta
 import threading as th
 
-from es7s_commons import median
 import requests
 
 import pytermor as pt
 from pytermor import RT, Fragment
-from ._common import Task, get_state, State
+from ._common import Task, get_state, State, StateSnapshot
 from .io import get_stdout
 from .logger import get_logger
 
@@ -27,9 +27,9 @@ def get_printer() -> Printer:
     return _printer
 
 
-def init_printer() -> Printer:
+def init_printer(printer_cls: typing.Type[Printer] = None) -> Printer:
     global _printer
-    _printer = Printer()
+    _printer = (printer_cls or Printer)()
     return _printer
 
 
@@ -44,6 +44,13 @@ class Printer:
     CW_STATUS = 4
     CW_SIZE = 7
     CW_ELAPSED = 7
+    CW_WATCH_REQ_ID = 6
+    CW_BREAKDOWN_COUNT = 6
+    CW_BREAKDOWN_ERRORS = 5
+    CW_BREAKDOWN_VALUE = 5  # formatted size or elapsed time
+    CW_BREAKDOWN_STAGE = 8
+    CW_BREAKDOWN_RATE = 8
+    BREAKDOWN_PERCENTILES = (50, 95, 99)
 
     SUCCESS_ST = pt.Style(fg=pt.cv.GREEN, bold=True)
     FAILURE_ST = pt.Style(fg=pt.cv.RED, bold=True)
@@ -72,17 +79,34 @@ class Printer:
         self._progress_formatter: pt.StaticFormatter | None = None
 
     def print_prolog(self):
-        req_total = self._state.requests_total.value
+        from .stages import get_load_profile
+
+        req_total_str = str(self._state.requests_total.value)
+        if self._is_endless:
+            req_total_str = "∞"
         threads = self._state.options.threads
+        if load_profile := get_load_profile():
+            threads = load_profile.max_workers
+            self._print_row(
+                pt.Text(width=self.COLUMN_PAD),
+                pt.Text(f"Stages:", width=self.CW_RESULT_LABEL),
+                pt.Text(str(len(load_profile.stages)), pt.Style(bold=True), width=6, align="right"),
+            )
         self._print_row(
             pt.Text(width=self.COLUMN_PAD),
             pt.Text(f"Threads:", width=self.CW_RESULT_LABEL),
             pt.Text(str(threads), pt.Style(bold=True), width=6, align="right"),
         )
+        if agents := len(self._state.options.agent):
+            self._print_row(
+                pt.Text(width=self.COLUMN_PAD),
+                pt.Text(f"Agents:", width=self.CW_RESULT_LABEL),
+                pt.Text(str(agents), pt.Style(bold=True), width=6, align="right"),
+            )
         self._print_row(
             pt.Text(width=self.COLUMN_PAD),
             pt.Text(f"Requests:", width=self.CW_RESULT_LABEL),
-            pt.Text(str(req_total), pt.Style(bold=True), width=6, align="right"),
+            pt.Text(req_total_str, pt.Style(bold=True), width=6, align="right"),
         )
         self._print_separator()
         self._print_progress(True)
@@ -93,14 +117,26 @@ class Printer:
             size = len(response.content)
         except Exception:
             pass
+        self.print_response_info(
+            task, request_id, response.status_code, response.ok, size, response.elapsed
+        )
 
+    def print_response_info(
+        self,
+        task: Task,
+        request_id: int,
+        status_code: int,
+        ok: bool,
+        size: int,
+        elapsed: timedelta,
+    ):
         self._lock.acquire()
         self._print_request_result(
-            self._format_status_code(response),
+            self._format_status_code(status_code, ok),
             self._format_size(size),
-            self._format_elapsed(response.elapsed),
+            self._format_elapsed(elapsed),
             self._format_request_id(request_id),
-            self._format_url(task.url, task.method, response.ok),
+            self._format_url(task.url, task.method, ok),
         )
         self._print_progress()
         self._state.requests_printed.next()
@@ -124,20 +160,21 @@ class Printer:
         self._state.requests_printed.next()
         self._lock.release()
 
-    def print_shutdown(self):
-        msg = pt.Text("Shutting threads down (Ctrl+C again to force)", pt.Styles.WARNING)
+    def print_shutdown(self, message: str = "Shutting threads down"):
+        msg = pt.Text(f"{message} (Ctrl+C again to force)", pt.Styles.WARNING)
         self._lock.acquire()
         self._print_row(msg)
         self._lock.release()
 
     def print_epilog(self, time_delta_ns: int):
-        req_total = self._state.requests_total.value
-        req_success = self._state.requests_success.value
-        req_failed = self._state.requests_failed.value
+        snapshot = self._state.snapshot()
+        req_total = snapshot.requests_total
+        req_success = snapshot.requests_success
+        req_failed = snapshot.requests_failed
 
         success_st, result_st = pt.NOOP_STYLE, pt.NOOP_STYLE
         result_str = "N/A"
-        if req_success == req_total:
+        if req_total and req_success == req_total:
             success_st = self.SUCCESS_ST
             result_st = self.RESULTS_SUCCESS_ST
             result_str = "PASS"
@@ -150,6 +187,8 @@ class Printer:
 
         avg_latency_fmtd = pt.Text("---", self.NO_VAL_ST, width=5, align="right")
         if self._state.requests_latency:
+            from es7s_commons import median
+
             avg_latency = median(self._state.requests_latency)
             avg_latency_fmtd = self._format_elapsed(timedelta(seconds=avg_latency))
 
@@ -164,8 +203,11 @@ class Printer:
             pt.Text(width=self.COLUMN_PAD),
             pt.Text("Successful:", width=self.CW_RESULT_LABEL),
             pt.Text(f"{req_success}/{req_total}", success_st, width=6, align="right"),
-            pt.Fragment(f"  ({100*req_success/req_total:.1f}%)"),
+            pt.Fragment(f"  ({100*req_success/max(1, req_total):.1f}%)"),
         )
+        self._print_cancelled(snapshot)
+        self._print_slo_violation()
+        self._print_cache_hits(snapshot)
         self._print_row(
             pt.Text(width=self.COLUMN_PAD),
             pt.Text("Avg (p50):", width=self.CW_RESULT_LABEL),
@@ -178,6 +220,264 @@ class Printer:
             pt.Text(width=1),
             self._format_elapsed(time_delta_ns),
         )
+        self._print_transfer()
+        self._print_circuits()
+        self._print_replay_drift()
+        self._print_warmup()
+        self._print_stage_breakdown()
+        self._print_endpoint_breakdown()
+        self._print_redirect_breakdown()
+        self._print_client_warnings()
+
+    def _print_cancelled(self, snapshot: StateSnapshot):
+        if not self._state.shutdown_flag.is_set():
+            return
+        cancelled = snapshot.requests_cancelled
+        not_started = 0
+        if not self._is_endless:
+            completed = snapshot.requests_success + snapshot.requests_failed
+            not_started = max(0, snapshot.requests_total - completed - cancelled)
+        if not cancelled and not not_started:
+            return
+        details = ""
+        if not self._is_endless:
+            details = f"  ({cancelled} in progress, {not_started} not started)"
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Cancelled:", width=self.CW_RESULT_LABEL),
+            pt.Text(str(cancelled + not_started), pt.Styles.WARNING, width=6, align="right"),
+            pt.Fragment(details),
+        )
+
+    def _print_slo_violation(self):
+        from .slo import get_slo_guard
+
+        if not (slo_guard := get_slo_guard()) or not slo_guard.violation:
+            return
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Aborted:", width=self.CW_RESULT_LABEL),
+            pt.Text(f"SLO violated: {slo_guard.violation}", pt.Styles.WARNING),
+        )
+
+    def _print_circuits(self):
+        from .transport import get_transport
+
+        if not (breakers := get_transport().breakers):
+            return
+        for idx, breaker in enumerate(b for b in breakers.values() if b.opened):
+            self._print_row(
+                pt.Text(width=self.COLUMN_PAD),
+                pt.Text("Circuits:" if not idx else "", width=self.CW_RESULT_LABEL),
+                pt.Text(str(breaker.rejected), pt.Styles.WARNING, width=6, align="right"),
+                pt.Fragment(f"  fast-failed, opened {breaker.opened}x, now {breaker.state}: "),
+                pt.Fragment(breaker.host),
+            )
+
+    def _print_cache_hits(self, snapshot: StateSnapshot):
+        if not self._state.options.revalidate:
+            return
+        cache_hits = self._state.cache_hits.value
+        completed = snapshot.requests_success + snapshot.requests_failed
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Cache hits:", width=self.CW_RESULT_LABEL),
+            pt.Text(f"{cache_hits}/{completed}", width=6, align="right"),
+            pt.Fragment(f"  ({100*cache_hits/max(1, completed):.1f}%)"),
+        )
+
+    def _print_transfer(self):
+        options = self._state.options
+        wire, decoded = self._state.bytes_wire.value, self._state.bytes_decoded.value
+        if wire == decoded and not options.accept_encoding and not options.no_decompress:
+            return  # nothing was compressed
+        decode_time = timedelta(microseconds=self._state.decode_time_ns.value / 1e3)
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Transfer:", width=self.CW_RESULT_LABEL),
+            self._format_size(wire),
+            pt.Fragment(" wire, "),
+            self._format_size(decoded),
+            pt.Fragment(f" decoded  ({decoded / max(1, wire):.1f}x, decoding "),
+            self._format_elapsed(decode_time),
+            pt.Fragment(")"),
+        )
+
+    def _print_replay_drift(self):
+        if not (drift := self._state.replay_drift.snapshot()):
+            return
+        fragments = []
+        for label, value in [("p50", 50), ("p99", 99), ("max", 100)]:
+            elapsed = timedelta(seconds=drift.percentile(value))
+            fragments += [pt.Fragment(f" {label} "), self._format_elapsed(elapsed)]
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Drift:", width=self.CW_RESULT_LABEL),
+            *fragments,
+            pt.Fragment("  (behind the replay schedule)"),
+        )
+
+    def _print_warmup(self):
+        from ._common import EndpointSnapshot
+
+        if not (warmup := EndpointSnapshot.merge(self._state.warmup_stats.snapshot().values())):
+            return
+        if (p50 := warmup.percentile(50)) is None:
+            p50_fmtd = self._format_no_val(self.CW_BREAKDOWN_VALUE)
+        else:
+            p50_fmtd = self._format_elapsed(timedelta(seconds=p50))
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Warm-up:", width=self.CW_RESULT_LABEL),
+            pt.Text(str(warmup.requests), width=6, align="right"),
+            pt.Fragment("  (p50 "),
+            p50_fmtd,
+            pt.Fragment(f", {100 * warmup.error_rate:.0f}% failed, excluded)"),
+        )
+
+    def _print_stage_breakdown(self):
+        from .stages import get_load_profile
+
+        if not (load_profile := get_load_profile()):
+            return
+        self._print_separator()
+        self._print_row(pt.Text(width=self.COLUMN_PAD), pt.Text("Stages:"))
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Load", width=self.CW_BREAKDOWN_STAGE),
+            pt.Text("Time", width=1 + self.CW_BREAKDOWN_VALUE, align="right"),
+            pt.Text("Count", width=self.CW_BREAKDOWN_COUNT, align="right"),
+            pt.Text("Err", width=self.CW_BREAKDOWN_ERRORS, align="right"),
+            pt.Text("Req/s", width=self.CW_BREAKDOWN_RATE, align="right"),
+            *(
+                pt.Text(f"p{p}", width=1 + self.CW_BREAKDOWN_VALUE, align="right")
+                for p in self.BREAKDOWN_PERCENTILES
+            ),
+        )
+        for result in load_profile.get_results():
+            stats = result.stats
+            requests = stats.requests if stats else 0
+            error_st = self.FAILURE_ST if stats and stats.failed else pt.NOOP_STYLE
+            percentiles = []
+            for percentile in self.BREAKDOWN_PERCENTILES:
+                percentiles.append(pt.Text(width=1))
+                if not stats or (value := stats.percentile(percentile)) is None:
+                    percentiles.append(self._format_no_val(self.CW_BREAKDOWN_VALUE))
+                else:
+                    percentiles.append(self._format_elapsed(timedelta(seconds=value)))
+            self._print_row(
+                pt.Text(width=self.COLUMN_PAD),
+                pt.Text(str(result.stage), pt.Style(bold=True), width=self.CW_BREAKDOWN_STAGE),
+                pt.Text(width=1),
+                self._format_elapsed(timedelta(seconds=result.elapsed)),
+                pt.Text(str(requests), width=self.CW_BREAKDOWN_COUNT, align="right"),
+                pt.Text(
+                    f"{100 * stats.error_rate:.0f}%" if stats else "---",
+                    error_st,
+                    width=self.CW_BREAKDOWN_ERRORS,
+                    align="right",
+                ),
+                pt.Text(f"{result.throughput:.1f}", width=self.CW_BREAKDOWN_RATE, align="right"),
+                *percentiles,
+            )
+
+    def _print_endpoint_breakdown(self):
+        from ._common import sort_endpoints
+
+        stats = self._state.endpoint_stats.snapshot()
+        if len(stats) < 2:
+            return
+        options = self._state.options
+        entries = sort_endpoints(stats, options.sort)
+        if options.top:
+            entries = entries[: options.top]
+
+        label = f"Endpoints by {options.sort}"
+        if len(entries) < len(stats):
+            label = f"Top {len(entries)} of {len(stats)} endpoints by {options.sort}"
+        self._print_separator()
+        self._print_row(pt.Text(width=self.COLUMN_PAD), pt.Text(f"{label}:"))
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Count", width=self.CW_BREAKDOWN_COUNT, align="right"),
+            pt.Text("Err", width=self.CW_BREAKDOWN_ERRORS, align="right"),
+            *(
+                pt.Text(f"p{p}", width=1 + self.CW_BREAKDOWN_VALUE, align="right")
+                for p in self.BREAKDOWN_PERCENTILES
+            ),
+            pt.Text("Size", width=1 + self.CW_BREAKDOWN_VALUE, align="right"),
+        )
+        for (method, url), endpoint in entries:
+            error_st = self.FAILURE_ST if endpoint.failed else pt.NOOP_STYLE
+            percentiles = []
+            for percentile in self.BREAKDOWN_PERCENTILES:
+                percentiles.append(pt.Text(width=1))
+                if (value := endpoint.percentile(percentile)) is None:
+                    percentiles.append(self._format_no_val(self.CW_BREAKDOWN_VALUE))
+                else:
+                    percentiles.append(self._format_elapsed(timedelta(seconds=value)))
+            self._print_row(
+                pt.Text(width=self.COLUMN_PAD),
+                pt.Text(str(endpoint.requests), width=self.CW_BREAKDOWN_COUNT, align="right"),
+                pt.Text(
+                    f"{100 * endpoint.error_rate:.0f}%",
+                    error_st,
+                    width=self.CW_BREAKDOWN_ERRORS,
+                    align="right",
+                ),
+                *percentiles,
+                pt.Text(width=1),
+                self._format_size(endpoint.bytes),
+                pt.Text(width=self.COLUMN_PAD),
+                self._format_url(url, method, not endpoint.failed),
+            )
+
+    def _print_redirect_breakdown(self):
+        from ._common import sort_endpoints
+
+        if not (stats := self._state.redirect_stats.snapshot()):
+            return
+        entries = sort_endpoints(stats, "p95")
+        if top := self._state.options.top:
+            entries = entries[:top]
+
+        self._print_separator()
+        self._print_row(pt.Text(width=self.COLUMN_PAD), pt.Text("Redirects by p95:"))
+        self._print_row(
+            pt.Text(width=self.COLUMN_PAD),
+            pt.Text("Count", width=self.CW_BREAKDOWN_COUNT, align="right"),
+            *(
+                pt.Text(f"p{p}", width=1 + self.CW_BREAKDOWN_VALUE, align="right")
+                for p in self.BREAKDOWN_PERCENTILES
+            ),
+        )
+        for (status, method, url), hop in entries:
+            percentiles = []
+            for percentile in self.BREAKDOWN_PERCENTILES:
+                value = timedelta(seconds=hop.percentile(percentile))
+                percentiles += [pt.Text(width=1), self._format_elapsed(value)]
+            self._print_row(
+                pt.Text(width=self.COLUMN_PAD),
+                pt.Text(str(hop.requests), width=self.CW_BREAKDOWN_COUNT, align="right"),
+                *percentiles,
+                pt.Text(width=self.COLUMN_PAD),
+                pt.Text(str(status), width=self.CW_STATUS),
+                self._format_url(url, method, True),
+            )
+
+    def _print_client_warnings(self):
+        from .monitor import get_monitor
+
+        if not (monitor := get_monitor()):
+            return
+        width = max(32, pt.get_terminal_width()) - 2 * self.COLUMN_PAD - self.CW_RESULT_LABEL
+        for warning in monitor.get_warnings():
+            for idx, line in enumerate(textwrap.wrap(warning, width)):
+                self._print_row(
+                    pt.Text(width=self.COLUMN_PAD),
+                    pt.Text("Warning:" if not idx else "", width=self.CW_RESULT_LABEL),
+                    pt.Text(line, pt.Styles.WARNING),
+                )
 
     def _print_request_result(self, *vals: pt.IRenderable | None):
         self._reset_cursor_x()
@@ -186,7 +486,7 @@ class Printer:
         get_stdout().echo_rendered(result)
 
     def _print_progress(self, pre: bool = False):
-        if not self._is_format_allowed:
+        if not self._is_format_allowed or self._is_endless:
             return
         self._print_row(
             pt.Text("[", width=3, align="center"),
@@ -225,15 +525,22 @@ class Printer:
     def _is_format_allowed(self) -> bool:
         return get_stdout().renderer.is_format_allowed
 
+    @property
+    def _is_endless(self) -> bool:
+        options = self._state.options
+        return bool(options.watch or options.stages or options.replay)
+
     def _get_max_req_id_length(self) -> int:
+        if self._is_endless:
+            return self.CW_WATCH_REQ_ID
         return len(str(self._state.requests_total.value))
 
     def _format_no_val(self, width: int) -> pt.Text:
         return pt.Text("---", self.NO_VAL_ST, width=width, align="center")
 
-    def _format_status_code(self, response: requests.Response) -> pt.Text:
-        string = str(response.status_code)
-        fmt = self.SUCCESS_ST if response.ok else self.FAILURE_ST
+    def _format_status_code(self, status_code: int, ok: bool) -> pt.Text:
+        string = str(status_code)
+        fmt = self.SUCCESS_ST if ok else self.FAILURE_ST
         return pt.Text(string, fmt, width=self.CW_STATUS, align="right")
 
     def _format_error(self, exception: Exception) -> pt.Text:
@@ -0,0 +1,222 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Profiling of the application itself. Each worker thread is profiled with
+its own `cProfile.Profile` (or sampled by a separate thread), the results
+are merged when the thread finishes and reported after the epilog. Since
+Python 3.12 only one `cProfile.Profile` can be active in the process, but
+it covers all the threads, so a single one is used for the whole run.
+"""
+from __future__ import annotations
+
+import cProfile
+import os.path
+import pstats
+import sys
+import threading as th
+import tracemalloc
+import typing as t
+from collections import Counter
+
+from ._common import Options, get_state
+from .io import get_stdout
+from .logger import get_logger
+
+# cProfile is built on `sys.monitoring`, which is process-wide
+SHARED_PROFILE = sys.version_info >= (3, 12)
+
+_profiler: Profiler | None = None
+
+
+def get_profiler() -> Profiler | None:
+    return _profiler
+
+
+def init_profiler(options: Options) -> Profiler | None:
+    global _profiler
+    if options.profile or options.profile_mem:
+        _profiler = Profiler(options)
+        _profiler.start()
+    return _profiler
+
+
+def destroy_profiler():
+    global _profiler
+    if _profiler:
+        _profiler.stop()
+    _profiler = None
+
+
+class Profiler:
+    TOP = 20
+    SAMPLING_INTERVAL_SEC = 0.005
+    MEM_TRACE_FRAMES = 1
+
+    def __init__(self, options: Options):
+        self._path: str | None = options.profile
+        self._sampling: bool = options.profile_sampling
+        self._mem: bool = options.profile_mem
+
+        self._lock = th.Lock()
+        self._stats: pstats.Stats | None = None
+        self._profile: cProfile.Profile | None = None  # shared by all threads
+        self._stacks: Counter[str] = Counter()
+        self._thread_idents: set[int] = set()
+        self._sampler_stop = th.Event()
+        self._sampler: th.Thread | None = None
+        self._mem_snapshot: tracemalloc.Snapshot | None = None
+
+    def start(self):
+        if self._mem:
+            tracemalloc.start(self.MEM_TRACE_FRAMES)
+            self._mem_snapshot = tracemalloc.take_snapshot()
+        if self._path and self._sampling:
+            self._sampler = th.Thread(target=self._sample, name="sampler", daemon=True)
+            self._sampler.start()
+        elif self._path and SHARED_PROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self):
+        self._stop_shared_profile()
+        self._sampler_stop.set()
+        if self._sampler:
+            self._sampler.join()
+            self._sampler = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def run(self, fn: t.Callable[[], None]):
+        """Call `fn` in the current thread, profiling it."""
+        if not self._path or self._profile:
+            return fn()
+
+        if self._sampling:
+            ident = th.get_ident()
+            self._thread_idents.add(ident)
+            try:
+                return fn()
+            finally:
+                self._thread_idents.discard(ident)
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn)
+        finally:
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def report(self):
+        lines = []
+        if self._mem:
+            lines += self._report_memory()
+        if self._path:
+            self._stop_shared_profile()
+            self._sampler_stop.set()
+            if self._sampler:
+                self._sampler.join()
+            if self._sampling:
+                lines += self._report_samples()
+            elif self._stats:
+                lines += self._report_stats()
+            get_logger().info(f"Profile written to {self._path}")
+
+        stdout = get_stdout()
+        for line in lines:
+            stdout.echo(line)
+
+    def _stop_shared_profile(self):
+        if self._profile:
+            self._profile.disable()
+            self._stats = pstats.Stats(self._profile)
+            self._profile = None
+
+    def _report_stats(self) -> t.Iterable[str]:
+        self._stats.dump_stats(self._path)
+
+        yield ""
+        scope = "all threads" if SHARED_PROFILE else "all workers"
+        yield f"Top {self.TOP} functions by own time ({scope}, {self._path}):"
+        yield f"{'own':>9s} {'cumul':>9s} {'calls':>9s}  function"
+        entries = sorted(self._stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)
+        for func, (_, calls, own_time, cumulative_time, _) in entries[: self.TOP]:
+            yield f"{own_time:8.3f}s {cumulative_time:8.3f}s {calls:9d}  {_format_func(*func)}"
+
+    def _report_samples(self) -> t.Iterable[str]:
+        with open(self._path, "wt") as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        own = Counter()
+        for stack, count in self._stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += count
+        total = sum(own.values()) or 1
+
+        yield ""
+        yield f"Top {self.TOP} functions by own samples (all workers, {self._path}):"
+        yield f"{'samples':>9s} {'share':>7s}  function"
+        for func, count in own.most_common(self.TOP):
+            yield f"{count:9d} {100 * count / total:6.1f}%  {func}"
+
+    def _report_memory(self) -> t.Iterable[str]:
+        # exclude the allocations of the profiler itself and of the imports
+        excluded = [tracemalloc.__file__, cProfile.__file__, pstats.__file__, __file__]
+        excluded.append("<frozen *>")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in excluded]
+        )
+        stats = snapshot.compare_to(self._mem_snapshot, "lineno")
+        stats.sort(key=lambda s: s.size_diff, reverse=True)
+        requests = max(1, get_state().requests_printed.value)
+
+        yield ""
+        yield f"Top {self.TOP} allocation sites by memory growth ({requests} requests):"
+        yield f"{'per req':>9s} {'total':>9s} {'blocks':>8s}  location"
+        for stat in stats[: self.TOP]:
+            if stat.size_diff <= 0:
+                break
+            frame = stat.traceback[0]
+            yield (
+                f"{_format_size(stat.size_diff / requests):>9s} {_format_size(stat.size_diff):>9s} "
+                f"{stat.count_diff:8d}  {_shorten_path(frame.filename)}:{frame.lineno}"
+            )
+
+    def _sample(self):
+        while not self._sampler_stop.wait(self.SAMPLING_INTERVAL_SEC):
+            idents = self._thread_idents.copy()
+            for ident, frame in sys._current_frames().items():  # noqa
+                if ident not in idents:
+                    continue
+                stack = []
+                while frame:
+                    code = frame.f_code
+                    stack.append(_format_func(code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(stack))] += 1
+
+
+def _format_func(filename: str, lineno: int, name: str) -> str:
+    if filename == "~":  # built-in
+        return name
+    return f"{name} ({_shorten_path(filename)}:{lineno})"
+
+
+def _shorten_path(filename: str) -> str:
+    parts = filename.split(os.sep)
+    for marker in ("site-packages", "lib"):
+        if marker in parts:
+            return os.path.join(*parts[len(parts) - parts[::-1].index(marker) :])
+    return os.path.basename(filename)
+
+
+def _format_size(size: float) -> str:
+    for unit in ("b", "k", "M"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "b" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}G"
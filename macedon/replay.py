@@ -0,0 +1,178 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Parsers of the captured traffic for the replay mode: access logs in Common
+or Combined Log Format (nginx, Apache) and HAR archives. Both are read
+lazily, record by record, so that the files of any size can be replayed
+without loading them in memory; the records are expected to be ordered by
+time, as they are written.
+"""
+from __future__ import annotations
+
+import json
+import re
+import typing as t
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+from ._common import Task
+from .logger import get_logger
+
+REPLAY_FORMATS = ("auto", "clf", "har")
+
+# language=regexp
+CLF_REGEX = R'\S+ \S+ \S+ \[([^\]]+)\] "([A-Z]+) (\S+)(?: [^"]*)?" .*'
+CLF_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+# set by the client anew, or not applicable to the replay
+SKIPPED_HEADERS = {
+    "host",
+    "content-length",
+    "connection",
+    "keep-alive",
+    "proxy-connection",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def parse_iso_time(value: str) -> float:
+    """
+    ISO 8601 time as written in HAR archives, e.g. '2024-10-10T13:55:36.500Z'.
+    `fromisoformat()` accepts the 'Z' suffix only since Python 3.11.
+    """
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value).timestamp()
+
+
+class ReplayParser:
+    """
+    Yields `(offset, task)` pairs, where `offset` is the time of the request
+    in seconds relative to the first one. `target` ('scheme://host[:port]')
+    replaces the origin of the captured requests; access logs contain only
+    the paths, so for them it is required.
+    """
+
+    HAR_CHUNK_SIZE = 1 << 16
+
+    def __init__(self, target: str = None):
+        self._target = target.rstrip("/") if target else None
+        self._origin_time: float | None = None
+        self.skipped = 0
+
+    def parse(self, file: t.TextIO, fmt: str = "auto") -> t.Iterator[tuple[float, Task]]:
+        if fmt == "auto":
+            fmt = self._detect_format(file)
+        if fmt == "har":
+            yield from self._parse_har(file)
+        else:
+            if not self._target:
+                raise ValueError(
+                    "Access logs contain only the paths, '--replay-target' is required"
+                )
+            yield from self._parse_clf(file)
+        if self.skipped:
+            get_logger().warning(f"Skipped {self.skipped} unrecognized record(s) in {file.name!r}")
+
+    def _detect_format(self, file: t.TextIO) -> str:
+        # peek without consuming, stdin cannot be rewound
+        buffer = getattr(file, "buffer", None)
+        if buffer is not None and hasattr(buffer, "peek"):
+            head = buffer.peek(1024)[:1024].decode(errors="replace")
+        else:
+            position = file.tell()
+            head = file.read(1024)
+            file.seek(position)
+        return "har" if head.lstrip().startswith("{") else "clf"
+
+    def _parse_clf(self, file: t.TextIO) -> t.Iterator[tuple[float, Task]]:
+        regex = re.compile(CLF_REGEX)
+        last_time_str, last_time = None, 0.0
+        for line in file:
+            if not (m := regex.match(line)):
+                if line.strip():
+                    self.skipped += 1
+                continue
+            time_str, method, path = m.groups()
+            if time_str != last_time_str:  # the resolution is one second anyway
+                try:
+                    last_time = datetime.strptime(time_str, CLF_TIME_FORMAT).timestamp()
+                except ValueError:
+                    self.skipped += 1
+                    continue
+                last_time_str = time_str
+            if not path.startswith("/"):
+                path = urlsplit(path)._replace(scheme="", netloc="").geturl() or "/"
+            yield self._get_offset(last_time), Task(self._target + path, method)
+
+    def _parse_har(self, file: t.TextIO) -> t.Iterator[tuple[float, Task]]:
+        for entry in self._iter_har_entries(file):
+            try:
+                request = entry["request"]
+                started = parse_iso_time(entry["startedDateTime"])
+                url = request["url"]
+                method = request["method"]
+            except (KeyError, TypeError, ValueError):
+                self.skipped += 1
+                continue
+            if self._target:
+                url = self._target + (urlsplit(url)._replace(scheme="", netloc="").geturl() or "/")
+            headers = CaseInsensitiveDict()
+            for header in request.get("headers") or ():
+                name = header.get("name", "")
+                if not name.startswith(":") and name.lower() not in SKIPPED_HEADERS:
+                    headers[name] = header.get("value", "")
+            body = (request.get("postData") or {}).get("text") or None
+            yield self._get_offset(started), Task(url, method, headers or None, body)
+
+    def _iter_har_entries(self, file: t.TextIO) -> t.Iterator[dict]:
+        """
+        Decode the items of `log.entries` array one by one, reading the file
+        by chunks; a chunk is extended (twice as large every time) until the
+        entry is complete, so that the large entries are decoded in linear time.
+        """
+        decoder = json.JSONDecoder()
+        buf, pos, eof = "", 0, False
+
+        def read(size: int) -> bool:
+            nonlocal buf, pos
+            chunk = file.read(size)
+            buf = buf[pos:] + chunk
+            pos = 0
+            return not chunk
+
+        while True:
+            if (start := buf.find('"entries"')) >= 0 and (start := buf.find("[", start)) >= 0:
+                pos = start + 1
+                break
+            if read(self.HAR_CHUNK_SIZE):
+                raise ValueError("Invalid HAR file: 'log.entries' not found")
+
+        read_size = self.HAR_CHUNK_SIZE
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos >= len(buf):
+                    raise json.JSONDecodeError("Unexpected end of data", buf, pos)
+                entry, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("Invalid HAR file: unterminated 'log.entries'")
+                eof = read(read_size)
+                read_size = max(read_size, len(buf))
+                continue
+            read_size = self.HAR_CHUNK_SIZE
+            yield entry
+
+    def _get_offset(self, timestamp: float) -> float:
+        if self._origin_time is None:
+            self._origin_time = timestamp
+        return max(0.0, timestamp - self._origin_time)
@@ -0,0 +1,129 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Machine-readable summary of the run (`--report`).
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+
+from . import APP_NAME, APP_VERSION
+from ._common import EndpointSnapshot, State, get_state, sort_endpoints
+from .logger import get_logger
+from .slo import get_slo_guard
+from .stages import get_load_profile
+from .transport import get_transport
+
+PERCENTILES = (50, 95, 99)
+
+
+def write_report(path: str, time_delta_ns: int):
+    report = make_report(get_state(), time_delta_ns)
+    tmp_path = f"{path}.{os.getpid()}"
+    with open(tmp_path, "wt") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    get_logger().info(f"Report written to {path}")
+
+
+def make_report(state: State, time_delta_ns: int) -> dict:
+    snapshot = state.snapshot()
+    latencies = sorted(state.requests_latency)
+    endpoints = sort_endpoints(state.endpoint_stats.snapshot(), state.options.sort)
+
+    report = {
+        "app": APP_NAME,
+        "version": APP_VERSION,
+        "total_time": time_delta_ns / 1e9,
+        "requests": {
+            "total": snapshot.requests_total,
+            "success": snapshot.requests_success,
+            "failed": snapshot.requests_failed,
+            "cancelled": snapshot.requests_cancelled,
+        },
+        "latency": {f"p{p}": _percentile(latencies, p) for p in PERCENTILES},
+        "responses_by_status": dict(sorted(state.responses_by_status.values().items())),
+        "errors_by_type": dict(sorted(state.errors_by_type.values().items())),
+        "endpoints": [
+            {
+                "method": method,
+                "url": url,
+                "requests": endpoint.requests,
+                "failed": endpoint.failed,
+                "error_rate": endpoint.error_rate,
+                **{f"p{p}": endpoint.percentile(p) for p in PERCENTILES},
+                "bytes": endpoint.bytes,
+            }
+            for (method, url), endpoint in endpoints
+        ],
+    }
+    report["transfer"] = {
+        "wire_bytes": state.bytes_wire.value,
+        "decoded_bytes": state.bytes_decoded.value,
+        "decode_time": state.decode_time_ns.value / 1e9,
+    }
+    if drift := state.replay_drift.snapshot():
+        report["replay"] = {
+            "requests": drift.count,
+            "drift": {
+                **{f"p{p}": drift.percentile(p) for p in PERCENTILES},
+                "max": drift.percentile(100),
+            },
+        }
+    if slo_guard := get_slo_guard():
+        report["slo"] = {
+            "conditions": [*map(str, slo_guard.conditions)],
+            "violated": slo_guard.violation,
+        }
+    if breakers := get_transport().breakers:
+        report["circuits"] = [
+            {"host": b.host, "state": b.state, "opened": b.opened, "rejected": b.rejected}
+            for b in breakers.values()
+        ]
+    if state.options.revalidate:
+        report["requests"]["cache_hits"] = state.cache_hits.value
+    if redirects := sort_endpoints(state.redirect_stats.snapshot(), "p95"):
+        report["redirects"] = [
+            {
+                "status": status,
+                "method": method,
+                "url": url,
+                "requests": hop.requests,
+                **{f"p{p}": hop.percentile(p) for p in PERCENTILES},
+            }
+            for (status, method, url), hop in redirects
+        ]
+    if warmup := EndpointSnapshot.merge(state.warmup_stats.snapshot().values()):
+        report["warmup"] = {
+            "requests": warmup.requests,
+            "failed": warmup.failed,
+            **{f"p{p}": warmup.percentile(p) for p in PERCENTILES},
+        }
+    if load_profile := get_load_profile():
+        report["stages"] = [
+            {
+                "workers": result.stage.workers,
+                "rate": result.stage.rate,
+                "duration": result.elapsed,
+                "requests": result.stats.requests if result.stats else 0,
+                "failed": result.stats.failed if result.stats else 0,
+                "throughput": result.throughput,
+                **{
+                    f"p{p}": result.stats.percentile(p) if result.stats else None
+                    for p in PERCENTILES
+                },
+            }
+            for result in load_profile.get_results()
+        ]
+    return report
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float | None:
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(len(sorted_values) * percent / 100))
+    return sorted_values[rank - 1]
@@ -0,0 +1,130 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Multistep scenarios: values extracted from the responses (`# @extract`
+directive) are substituted into the subsequent requests as `{{name}}`.
+Each worker thread acts as a virtual user with its own variables, cookie
+jar and connections, so that nothing is shared between the scenarios
+running concurrently.
+"""
+from __future__ import annotations
+
+import json
+import re
+import typing as t
+from dataclasses import replace
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from ._common import Task
+from .logger import get_logger
+
+if t.TYPE_CHECKING:
+    from .transport import Transport
+
+EXTRACT_SOURCES = ("json", "header", "regex")
+
+# language=regexp
+EXTRACT_REGEX = R"\s*([A-Za-z_][\w-]*)\s*=\s*([a-z]+):\s*(.+?)\s*"
+# language=regexp
+TEMPLATE_REGEX = R"\{\{\s*([A-Za-z_][\w-]*)\s*\}\}"
+# language=regexp
+JSON_PATH_TOKEN_REGEX = R"[^.\[\]]+|\[(\d+)\]"
+
+
+def parse_extract_rule(value: str) -> tuple[str, str, str]:
+    """'token = json:$.data.token' -> ('token', 'json', '$.data.token')"""
+    if not (m := re.fullmatch(EXTRACT_REGEX, value)):
+        raise ValueError(f"Invalid extraction rule, expected 'NAME = SOURCE:EXPR', got: {value!r}")
+    name, source, expression = m.groups()
+    if source not in EXTRACT_SOURCES:
+        raise ValueError(f"Unknown extraction source {source!r}, expected one of {EXTRACT_SOURCES}")
+    return name, source, expression
+
+
+def has_templates(task: Task) -> bool:
+    return any(re.search(TEMPLATE_REGEX, s) for s in _iter_template_fields(task))
+
+
+def extract_value(response: requests.Response, source: str, expression: str) -> str | None:
+    if source == "header":
+        return response.headers.get(expression)
+    if source == "regex":
+        if not (m := re.search(expression, response.text)):
+            return None
+        return m.group(1) if m.re.groups else m.group(0)
+
+    try:
+        value = response.json()
+    except ValueError:
+        return None
+    for m in re.finditer(JSON_PATH_TOKEN_REGEX, expression.removeprefix("$")):
+        key = int(m.group(1)) if m.group(1) else m.group(0)
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+class VirtualUser:
+    """
+    State of one simulated user. Owned by a single worker thread and reset
+    before each run of the scenario, except for the connections, which are
+    kept alive between the runs.
+    """
+
+    def __init__(self, transport: Transport):
+        self.session: requests.Session = transport.make_user_session()
+        self.variables: dict[str, str] = {}
+
+    def reset(self):
+        self.variables.clear()
+        # the only cookie jar of the user, whatever the transport is
+        self.session.cookies.clear()
+
+    def render(self, task: Task) -> Task:
+        """Substitute the variables; return the task itself if there is nothing to substitute."""
+        if not has_templates(task):
+            return task
+        headers = task.headers
+        if headers:
+            headers = CaseInsensitiveDict({k: self._render(v) for k, v in headers.items()})
+        return replace(
+            task,
+            url=self._render(task.url),
+            headers=headers,
+            body=self._render(task.body) if task.body else task.body,
+        )
+
+    def extract(self, task: Task, response: requests.Response):
+        for name, source, expression in task.extract or ():
+            if (value := extract_value(response, source, expression)) is None:
+                get_logger().warning(f"Failed to extract {name!r} ({source}:{expression})")
+                continue
+            self.variables[name] = value
+
+    def close(self):
+        self.session.close()
+
+    def _render(self, string: str) -> str:
+        def replace_var(m: re.Match) -> str:
+            if (value := self.variables.get(m.group(1))) is None:
+                get_logger().warning(f"Undefined variable: {m.group(1)!r}")
+                return m.group(0)
+            return value
+
+        return re.sub(TEMPLATE_REGEX, replace_var, string)
+
+
+def _iter_template_fields(task: Task) -> t.Iterable[str]:
+    yield task.url
+    if task.headers:
+        yield from task.headers.values()
+    if task.body:
+        yield task.body
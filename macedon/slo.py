@@ -0,0 +1,168 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Service level objectives of the run: conditions like 'errors>5%:30s' (error
+rate above 5% for 30 seconds) or 'p99>2s:1m', checked once per second on the
+requests completed during that second. When a condition holds for its whole
+duration, the run is aborted early, as its further results would not change
+the verdict.
+"""
+from __future__ import annotations
+
+import re
+import threading as th
+import time
+from dataclasses import dataclass, replace
+
+from ._common import EndpointSnapshot, Options, get_state, parse_duration
+from .logger import get_logger
+
+SLO_METRICS = ("errors", "p50", "p95", "p99")
+
+# language=regexp
+SLO_REGEX = R"\s*([a-z0-9]+)\s*>\s*([^:\s]+)\s*(?::\s*(\S+))?\s*"
+
+_guard: SloGuard | None = None
+
+
+def get_slo_guard() -> SloGuard | None:
+    return _guard
+
+
+def init_slo_guard(options: Options) -> SloGuard | None:
+    global _guard
+    if options.slo:
+        _guard = SloGuard(parse_slo(options.slo))
+    return _guard
+
+
+def destroy_slo_guard():
+    global _guard
+    if _guard:
+        _guard.stop()
+    _guard = None
+
+
+@dataclass(frozen=True)
+class SloCondition:
+    metric: str
+    threshold: float  # error rate 0..1 or latency in seconds
+    duration: float = 0.0  # seconds; 0 = a single check
+
+    def format_value(self, value: float) -> str:
+        if self.metric == "errors":
+            return f"{100 * value:.1f}%"
+        return f"{1000 * value:.0f}ms"
+
+    def __str__(self) -> str:
+        result = f"{self.metric} > {self.format_value(self.threshold)}"
+        if self.duration:
+            result += f" for {self.duration:g}s"
+        return result
+
+
+def parse_slo(spec: str) -> list[SloCondition]:
+    """'errors>5%:30s,p99>2s:1m' -> [SloCondition('errors', 0.05, 30), ...]"""
+    conditions = []
+    for part in filter(None, (s.strip() for s in spec.split(","))):
+        if not (m := re.fullmatch(SLO_REGEX, part)):
+            raise ValueError(f"Invalid SLO, expected 'METRIC>THRESHOLD[:DURATION]', got: {part!r}")
+        metric, threshold_str, duration_str = m.groups()
+        if metric not in SLO_METRICS:
+            raise ValueError(f"Unknown SLO metric {metric!r}, expected one of {SLO_METRICS}")
+        if metric == "errors":
+            if not threshold_str.endswith("%"):
+                raise ValueError(f"Error rate should be in percents, got: {threshold_str!r}")
+            threshold = float(threshold_str.removesuffix("%")) / 100
+        else:
+            threshold = parse_duration(threshold_str)
+        duration = parse_duration(duration_str) if duration_str else 0.0
+        conditions.append(SloCondition(metric, threshold, duration))
+    if not conditions:
+        raise ValueError(f"No SLO conditions found in {spec!r}")
+    return conditions
+
+
+class SloGuard:
+    INTERVAL_SEC = 1.0
+
+    def __init__(self, conditions: list[SloCondition]):
+        self.conditions = conditions
+        self.violation: str | None = None
+        self._breached_since: dict[SloCondition, float] = {}
+        self._stop = th.Event()
+        self._thread: th.Thread | None = None
+        self._last = (0, 0)  # success, failed
+        self._last_buckets: dict[int, int] = {}  # latency histogram
+
+    def start(self):
+        """Called when the main run starts; warm-up requests are not checked."""
+        self._collect()
+        self._thread = th.Thread(target=self._run, name="slo", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Called when the main run ends."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.INTERVAL_SEC):
+            if get_state().shutdown_flag.is_set():
+                return
+            self.check(time.monotonic())
+
+    def check(self, now: float):
+        values = self._collect()
+        for condition in self.conditions:
+            if (value := values.get(condition.metric)) is None:
+                continue  # nothing completed, the condition keeps its state
+            if value <= condition.threshold:
+                self._breached_since.pop(condition, None)
+                continue
+            since = self._breached_since.setdefault(condition, now - self.INTERVAL_SEC)
+            if now - since >= condition.duration:
+                self._abort(condition, value)
+                return
+
+    def _collect(self) -> dict[str, float]:
+        """
+        Values of the metrics over the requests completed since the last call.
+        The latencies are taken from the endpoint stats histograms, which keep
+        counting in the endless runs, unlike the bounded list of latencies.
+        """
+        state = get_state()
+        success, failed = state.requests_success.value, state.requests_failed.value
+        stats = EndpointSnapshot.merge(state.endpoint_stats.snapshot().values())
+        buckets = stats.latency_buckets if stats else {}
+        new_buckets = {
+            bucket: count - prev
+            for bucket, count in buckets.items()
+            if count > (prev := self._last_buckets.get(bucket, 0))
+        }
+        new_success, new_failed = success - self._last[0], failed - self._last[1]
+        self._last, self._last_buckets = (success, failed), buckets
+
+        values = {}
+        if completed := new_success + new_failed:
+            values["errors"] = new_failed / completed
+        if new_buckets:
+            latencies = replace(stats, latency_buckets=new_buckets)
+            for metric in SLO_METRICS[1:]:
+                values[metric] = latencies.percentile(int(metric[1:]))
+        return values
+
+    def _abort(self, condition: SloCondition, value: float):
+        from .printer import get_printer
+
+        state = get_state()
+        if state.shutdown_flag.is_set():
+            return
+        self.violation = f"{condition} (was {condition.format_value(value)})"
+        get_logger().warning(f"SLO violated: {self.violation}")
+        get_printer().print_shutdown(f"SLO violated: {condition}, shutting threads down")
+        state.shutdown_flag.set()
@@ -0,0 +1,159 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Load profiles: the run is divided into stages, each with its own number of
+workers or request rate, and the results are aggregated per stage.
+
+Spec is a comma-separated list of stages, each one in the format
+``[+|-]VALUE[rps]:DURATION[..LIMIT]``:
+
+    10:30s              10 workers for 30 seconds;
+    +10:30s             10 workers more than in the previous stage, for 30s;
+    +10:30s..200        the same, repeated until the number of workers reaches 200;
+    50rps:1m            50 requests per second for a minute (using --threads workers);
+    +50rps:1m..500      increase the rate by 50 every minute up to 500 rps.
+"""
+from __future__ import annotations
+
+import re
+import time
+import typing as t
+from dataclasses import dataclass
+
+from ._common import EndpointSnapshot, Options, ShardedEndpointStats, parse_duration
+
+MAX_STAGES = 1000
+
+_load_profile: LoadProfile | None = None
+
+
+def get_load_profile() -> LoadProfile | None:
+    return _load_profile
+
+
+def init_load_profile(options: Options) -> LoadProfile | None:
+    global _load_profile
+    if options.stages:
+        _load_profile = LoadProfile(parse_stages(options.stages, options.threads))
+    return _load_profile
+
+
+def destroy_load_profile():
+    global _load_profile
+    _load_profile = None
+
+
+@dataclass(frozen=True)
+class Stage:
+    workers: int
+    rate: float | None  # requests per second, None for unlimited
+    duration: float
+
+    def __str__(self):
+        if self.rate:
+            return f"{self.rate:g}rps"
+        return f"{self.workers}T"
+
+
+# language=regexp
+STAGE_REGEX = (
+    R"\s*([+-])?(\d+(?:\.\d+)?)(rps)?"  # value
+    R"\s*:\s*(\d+(?:\.\d+)?[a-z]*)"  # duration
+    R"\s*(?:\.\.\s*(\d+(?:\.\d+)?)(?:rps)?)?\s*"  # limit
+)
+
+
+def parse_stages(spec: str, rate_workers: int) -> list[Stage]:
+    """`rate_workers` is the number of workers for the rate-limited stages."""
+    stages: list[Stage] = []
+    for stage_spec in spec.split(","):
+        if not (m := re.fullmatch(STAGE_REGEX, stage_spec)):
+            raise ValueError(
+                f"Invalid stage, expected '[+|-]VALUE[rps]:DURATION[..LIMIT]', got: {stage_spec!r}"
+            )
+        sign, value, rps, duration, limit = m.groups()
+        value, duration = float(value), parse_duration(duration)
+        if duration <= 0:
+            raise ValueError(f"Stage duration should be positive: {stage_spec!r}")
+        prev = stages[-1] if stages else None
+        prev_value = (prev.rate if rps else prev.workers) if prev else 0
+        if rps and prev and not prev.rate and sign:
+            raise ValueError(f"Relative rate stage after a concurrency stage: {stage_spec!r}")
+
+        values = [_apply_sign(sign, prev_value or 0, value)]
+        if limit is not None:
+            if not sign:
+                raise ValueError(f"Limit is allowed only for relative stages: {stage_spec!r}")
+            limit = float(limit)
+            while (values[-1] < limit) if sign == "+" else (values[-1] > limit):
+                values.append(_apply_sign(sign, values[-1], value))
+                if len(values) > MAX_STAGES:
+                    raise ValueError(f"Too many stages: {stage_spec!r}")
+            values[-1] = min(values[-1], limit) if sign == "+" else max(values[-1], limit)
+
+        for stage_value in values:
+            if stage_value <= 0:
+                raise ValueError(f"Stage value should be positive: {stage_spec!r}")
+            if rps:
+                stages.append(Stage(rate_workers, stage_value, duration))
+            else:
+                stages.append(Stage(int(stage_value), None, duration))
+    return stages
+
+
+def _apply_sign(sign: str | None, prev: float, value: float) -> float:
+    if sign == "+":
+        return prev + value
+    if sign == "-":
+        return prev - value
+    return value
+
+
+@dataclass(frozen=True)
+class StageResult:
+    stage: Stage
+    elapsed: float
+    stats: EndpointSnapshot | None
+
+    @property
+    def throughput(self) -> float:
+        if not self.stats or not self.elapsed:
+            return 0.0
+        return self.stats.requests / self.elapsed
+
+
+class LoadProfile:
+    """
+    Sequence of the stages and the results of each of them. Requests are
+    attributed to the stage which was active when they completed.
+    """
+
+    def __init__(self, stages: list[Stage]):
+        self.stages: list[Stage] = stages
+        self.current: int = -1
+        self._stats = ShardedEndpointStats()
+        self._started: list[float] = []
+        self._finished: float | None = None
+
+    @property
+    def max_workers(self) -> int:
+        return max(stage.workers for stage in self.stages)
+
+    def start_stage(self, idx: int):
+        self._started.append(time.monotonic())
+        self.current = idx
+
+    def finish(self):
+        self._finished = time.monotonic()
+
+    def record(self, ok: bool, size: int, latency: float | None):
+        if self.current >= 0:
+            self._stats.record(self.current, ok, size, latency)
+
+    def get_results(self) -> t.Iterable[StageResult]:
+        stats = self._stats.snapshot()
+        ends = [*self._started[1:], self._finished or time.monotonic()]
+        for idx, (start, end) in enumerate(zip(self._started, ends)):
+            yield StageResult(self.stages[idx], end - start, stats.get(idx))
@@ -2,23 +2,40 @@
 #  macedon [CLI web service availability verifier]
 #  (c) 2022-2023 A. Shavykin <0.delameter@gmail.com>
 # -----------------------------------------------------------------------------
+import threading as th
 import time
-from queue import Queue
 
-from ._common import Options, Task, get_state
+from ._common import Options, Scenario, Task, get_state
 from .fileparser import get_parser
 from .logger import get_logger
+from .pool import (
+    CyclicTaskPool,
+    FiniteTaskPool,
+    ReplayTaskPool,
+    ScheduledTaskPool,
+    TaskPool,
+    WeightedTaskPool,
+)
 from .printer import get_printer
+from .slo import get_slo_guard
+from .stages import LoadProfile, get_load_profile
+from .transport import get_transport
 from .worker import Worker
 
 
 class Synchronizer:
-    def __init__(self, options: Options):
-        self._task_pool: Queue[Task] = Queue[Task]()
+    JOIN_POLL_SEC = 0.2
+    SHUTDOWN_GRACE_SEC = 2.0
+
+    def __init__(self, options: Options, tasks: list[Task] = None):
+        self._task_pool: TaskPool | None = None
+        self._tasks: list[Task | Scenario] = []  # unique
+        self.time_delta_ns: int = 0
         self._workers: list[Worker] = []
 
         try:
-            self._init_task_queue(options)
+            self._task_pool = self._make_task_pool(options)
+            self._init_task_queue(options, tasks)
             self._init_workers()
         except Exception as e:
             get_logger().exception(e)
@@ -27,52 +44,215 @@ class Synchronizer:
     def run(self):
         printer = get_printer()
         printer.print_prolog()
+        options = get_state().options
+        deadline_timer = self._start_deadline_timer(options)
+        if options.preconnect:
+            self._preconnect()
+        if options.warmup or options.warmup_seconds:
+            self._warm_up(options)
         time_before = time.time_ns()
+        if slo_guard := get_slo_guard():
+            slo_guard.start()
 
-        for worker in self._workers:
-            get_logger().debug(f"Starting worker {worker}")
-            worker.start()
-        for worker in self._workers:
-            worker.join()
+        if load_profile := get_load_profile():
+            self._run_stages(load_profile)
+        else:
+            for worker in self._workers:
+                get_logger().debug(f"Starting worker {worker}")
+                worker.start()
+        if stuck := self._join(self._workers):
+            get_state().requests_cancelled.add(stuck)  # cannot complete before the epilog
+        if deadline_timer:
+            deadline_timer.cancel()
+        if slo_guard:
+            slo_guard.stop()
 
+        if skipped := getattr(self._task_pool, "skipped", 0):
+            get_logger().warning(f"Skipped {skipped} probe(s) due to falling behind the schedule")
         self._workers.clear()
-        time_after = time.time_ns()
+        self.time_delta_ns = time.time_ns() - time_before
         get_state().requests_latency.sort()
-        printer.print_epilog(time_after - time_before)
+        printer.print_epilog(self.time_delta_ns)
+
+    def _preconnect(self):
+        connections = get_state().options.threads
+        if load_profile := get_load_profile():
+            connections = load_profile.max_workers
+        # virtual users of the scenarios have their own connections
+        tasks = [task for task in self._tasks if isinstance(task, Task)]
+        opened = get_transport().preconnect(tasks, connections)
+        get_logger().info(f"Preconnected {opened} connection(s)")
+
+    def _warm_up(self, options: Options):
+        """
+        Perform the requests round-robin until `options.warmup` requests are
+        done or `options.warmup_seconds` have passed (whichever comes first);
+        the results are recorded separately and are not printed.
+        """
+        state = get_state()
+        pool = CyclicTaskPool(limit=options.warmup or None, count_total=False)
+        for task in self._tasks:
+            pool.put(task)
+        workers = []
+        for _ in range(options.threads):
+            state.worker_states.append("initial")
+            workers.append(Worker(pool, len(state.worker_states) - 1, warmup=True))
+
+        get_logger().info("Warming up")
+        timer = None
+        if options.warmup_seconds:
+            timer = th.Timer(options.warmup_seconds, pool.close)
+            timer.start()
+        for worker in workers:
+            worker.start()
+        self._join(workers)
+        if timer:
+            timer.cancel()
+
+    def _join(self, workers: list[Worker]) -> int:
+        """
+        Wait for the workers to finish. On shutdown, abort the requests in
+        progress and leave behind the workers which did not stop in time, so
+        that the (partial) results are printed without waiting for timeouts.
+        Return the number of workers left behind.
+        """
+        shutdown_flag = get_state().shutdown_flag
+        for worker in workers:
+            while worker.is_alive() and not shutdown_flag.is_set():
+                worker.join(self.JOIN_POLL_SEC)
+        if not shutdown_flag.is_set():
+            return 0
+
+        get_transport().cancel()
+        grace_deadline = time.monotonic() + self.SHUTDOWN_GRACE_SEC
+        for worker in workers:
+            worker.join(max(0.0, grace_deadline - time.monotonic()))
+        if stuck := sum(worker.is_alive() for worker in workers):
+            get_logger().warning(f"{stuck} worker(s) did not stop in time and were left behind")
+        return stuck
+
+    def _start_deadline_timer(self, options: Options) -> th.Timer | None:
+        if not options.deadline:
+            return None
+        timer = th.Timer(options.deadline, self._on_deadline)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _on_deadline(self):
+        if get_state().shutdown_flag.is_set():
+            return
+        get_logger().info("Deadline reached")
+        get_printer().print_shutdown("Deadline reached, shutting threads down")
+        get_state().shutdown_flag.set()
+
+    def _run_stages(self, load_profile: LoadProfile):
+        logger = get_logger()
+        shutdown_flag = get_state().shutdown_flag
+        active: list[Worker] = []
 
-    def _init_task_queue(self, options: Options):
+        for idx, stage in enumerate(load_profile.stages):
+            stages_num = len(load_profile.stages)
+            logger.info(f"Stage {idx + 1}/{stages_num}: {stage} for {stage.duration}s")
+            load_profile.start_stage(idx)
+            self._task_pool.set_rate(stage.rate)
+            while len(active) < stage.workers:
+                worker = self._add_worker()
+                logger.debug(f"Starting worker {worker}")
+                worker.start()
+                active.append(worker)
+            while len(active) > stage.workers:
+                active.pop().retire()
+            if shutdown_flag.wait(stage.duration):
+                break
+
+        load_profile.finish()
+        self._task_pool.close()
+
+    def _init_task_queue(self, options: Options, tasks: list[Task] = None):
+        if options.replay:
+            if not self._get_tasks_num():
+                raise RuntimeError(f"No requests found in '{options.replay.name}'")
+            return
+        self._append_tasks("<job>", tasks or [])
         for file in options.file:
+            file_tasks = []
             try:
                 for task in get_parser().parse(file):
-                    self._append_task(task)
+                    file_tasks.append(task)
             except Exception as e:
                 get_logger().exception(e)
-                continue
-        if get_state().requests_total.value > 0:
+            self._append_tasks(file.name, file_tasks)
+        if self._get_tasks_num() > 0:
             return
         elif len(options.file):
             raise RuntimeError("No valid tasks found in provided files")
 
+        url_tasks = []
         for url in options.endpoint_url:
             if not url.startswith("http"):
                 url = f"http://{url}"
-            self._append_task(Task(url))
+            url_tasks.append(Task(url))
+        self._append_tasks("<args>", url_tasks)
 
-        if get_state().requests_total.value == 0:
+        if self._get_tasks_num() == 0:
             raise ValueError("No urls provided")
 
-    def _append_task(self, task: Task):
+    def _append_tasks(self, source: str, tasks: list[Task]):
+        """In scenario mode, all tasks from one source make up one scenario."""
+        if not tasks:
+            return
+        if get_state().options.scenario:
+            self._append_task(Scenario(source, tuple(tasks)))
+            return
+        for task in tasks:
+            self._append_task(task)
+
+    def _make_task_pool(self, options: Options) -> TaskPool:
+        if options.replay:
+            from .replay import ReplayParser
+
+            items = ReplayParser(options.replay_target).parse(options.replay, options.replay_format)
+            return ReplayTaskPool(items, options.replay_speed)
+        if options.watch:
+            return ScheduledTaskPool(options.interval)
+        if options.stages:
+            return CyclicTaskPool(weighted=options.weighted)
+        if options.weighted:
+            return WeightedTaskPool(options.amount)
+        return FiniteTaskPool()
+
+    def _get_tasks_num(self) -> int:
+        return len(self._task_pool)
+
+    def _append_task(self, task: Task | Scenario):
         state = get_state()
 
-        state.used_methods.add(task.method)
+        steps = task.tasks if isinstance(task, Scenario) else (task,)
+        state.used_methods.update(step.method for step in steps)
+        self._tasks.append(task)
+        if state.options.watch or state.options.stages:
+            self._task_pool.put(task)  # repeated endlessly, counted when dispatched
+            return
+        if state.options.weighted:
+            self._task_pool.put(task)  # `amount` more draws from the whole mix
+            state.requests_total.add(state.options.amount)
+            return
         for _ in range(state.options.amount):
-            self._task_pool.put_nowait(task)
-            state.requests_total.next()
+            self._task_pool.put(task)
+            state.requests_total.add(len(steps))
 
     def _init_workers(self):
         state = get_state()
-        threads = state.options.threads
+        if state.options.stages:
+            return  # started and stopped stage by stage
+
+        for _ in range(state.options.threads):
+            self._add_worker()
 
-        state.worker_states.extend(["initial"] * threads)
-        for idx in range(threads):
-            self._workers.append(Worker(self._task_pool, idx))
+    def _add_worker(self) -> Worker:
+        state = get_state()
+        state.worker_states.append("initial")
+        worker = Worker(self._task_pool, len(state.worker_states) - 1)
+        self._workers.append(worker)
+        return worker
@@ -0,0 +1,97 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Dumps of the request/response contents. Under load, tracing every request
+would flood the output and slow the run down, so the requests can be
+sampled, and the dumps can be written to a file by a separate thread
+through a bounded buffer, which drops the traces instead of blocking the
+workers when the file cannot keep up.
+"""
+from __future__ import annotations
+
+import itertools
+import queue
+import threading as th
+
+from ._common import Options, ShardedCounter
+from .logger import get_logger
+
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+def init_tracer(options: Options) -> Tracer | None:
+    global _tracer
+    if options.trace_file or options.verbose >= 2:
+        _tracer = Tracer(options)
+        _tracer.start()
+    return _tracer
+
+
+def destroy_tracer():
+    global _tracer
+    if _tracer:
+        _tracer.stop()
+    _tracer = None
+
+
+class Tracer:
+    BUFFER_SIZE = 1000  # traces
+
+    def __init__(self, options: Options):
+        self._path: str | None = options.trace_file
+        self._sample: int | None = options.trace_sample
+        self._failures: bool = options.trace_failures
+        self._slow: float | None = options.trace_slow
+        self._filtered = bool(self._sample or self._failures or self._slow)
+
+        self._counter = itertools.count()
+        self._buffer: queue.Queue[str | None] = queue.Queue(self.BUFFER_SIZE)
+        self._writer: th.Thread | None = None
+        self.dropped = ShardedCounter()
+
+    def start(self):
+        if self._path:
+            # open in the main thread, so that an invalid path fails the run at once
+            file = open(self._path, "wt")
+            self._writer = th.Thread(target=self._write, args=(file,), name="tracer", daemon=True)
+            self._writer.start()
+
+    def stop(self):
+        if not self._writer:
+            return
+        self._buffer.put(None)
+        self._writer.join()
+        self._writer = None
+        if dropped := self.dropped.value:
+            get_logger().warning(f"Dropped {dropped} trace(s), as the trace file could not keep up")
+
+    def should_trace(self, ok: bool, elapsed: float | None) -> bool:
+        """`elapsed` is in seconds; the criteria are combined with OR."""
+        if not self._filtered:
+            return True
+        if self._failures and not ok:
+            return True
+        if self._slow and elapsed is not None and elapsed >= self._slow:
+            return True
+        return bool(self._sample) and next(self._counter) % self._sample == 0
+
+    def trace(self, dump: str):
+        if not self._writer:
+            get_logger().trace(dump)
+            return
+        try:
+            self._buffer.put_nowait(dump)
+        except queue.Full:
+            self.dropped.next()
+
+    def _write(self, file):
+        with file:
+            while (dump := self._buffer.get()) is not None:
+                file.write(dump)
+                file.write("\n")
@@ -0,0 +1,857 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+from __future__ import annotations
+
+import socket
+import ssl
+import threading as th
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import timedelta
+from http.client import HTTPMessage
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+import urllib3.exceptions
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+from ._common import Options, Task
+from .breaker import CircuitBreakers
+from .encoding import DecodeError, decode_content, parse_accept_encoding
+from .logger import get_logger
+from .stages import get_load_profile
+
+_transport: Transport | None = None
+
+
+def get_transport() -> Transport:
+    if _transport is None:
+        raise Exception("Transport should be initialized")
+    return _transport
+
+
+def init_transport(options: Options) -> Transport:
+    global _transport
+    _transport = TRANSPORTS[options.transport](options)
+    return _transport
+
+
+def destroy_transport():
+    global _transport
+    if _transport:
+        _transport.close()
+    _transport = None
+
+
+class RequestCancelled(requests.exceptions.RequestException):
+    pass
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """The host failed too many times in a row, the request was not sent."""
+
+
+class TotalTimeout(requests.exceptions.Timeout):
+    """The response (including the redirects and the body) was not received within `--timeout`."""
+
+
+@dataclass
+class PreparedTask:
+    task: Task
+    request: requests.PreparedRequest
+    settings: dict[str, t.Any]  # keyword arguments for `Session.send()`
+    origin: str
+    raw: bytes | None = None
+    cached: bool = False  # reused for the repetitions of the task
+
+
+class RequestWatch:
+    """
+    Deadline and connections of the request being performed by one worker
+    thread (reused for all its requests). The socket timeouts apply to each
+    read separately, therefore a response dripping slowly enough can take
+    any time; instead, the connections are aborted when the deadline passes.
+    """
+
+    def __init__(self):
+        self.deadline: float | None = None
+        self.expired = False
+        self._connections: list = []  # urllib3 connections or sockets
+        self._lock = th.Lock()
+
+    def start(self, deadline: float):
+        with self._lock:
+            self.deadline = deadline
+            self.expired = False
+
+    def finish(self):
+        with self._lock:
+            self.deadline = None
+            self._connections.clear()
+
+    def add(self, connection):
+        with self._lock:
+            if self.deadline is not None:
+                self._connections.append(connection)
+
+    def discard(self, connection):
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+
+    def expire(self, now: float):
+        with self._lock:
+            if self.deadline is None or self.expired or now < self.deadline:
+                return
+            self.expired = True
+            self._abort()
+
+    def abort(self):
+        with self._lock:
+            self._abort()
+
+    def _abort(self):
+        for connection in self._connections:
+            # urllib3 connections have the socket opened lazily
+            sock = getattr(connection, "sock", connection)
+            if sock is None:
+                continue
+            try:
+                # unlike close(), wakes up the thread blocked on reading from it
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class Transport:
+    """
+    Shared between all the workers, therefore implementations must be
+    thread-safe. Each unique task is prepared once, on first use, and the
+    result is reused for every repetition of the task in every worker.
+
+    `--timeout` is the limit for the whole request, including redirects and
+    the body download, enforced by the watchdog thread; `--connect-timeout`
+    and `--read-timeout` limit the connection setup and each read from the
+    socket, and are capped by the time left until the deadline.
+
+    The implementations return the body as received, and it is decompressed
+    by `send()`, which sets `wire_size` (body size before decoding) and
+    `decode_time_ns` attributes of the response.
+    """
+
+    WATCHDOG_INTERVAL_SEC = 0.1
+
+    def __init__(self, options: Options):
+        self._options = options
+        self._connect_timeout = options.connect_timeout or options.timeout / 2
+        self._read_timeout = options.read_timeout or options.timeout
+        self._accept_encoding: str | None = None
+        if options.accept_encoding:
+            self._accept_encoding = parse_accept_encoding(
+                options.accept_encoding, not options.no_decompress
+            )
+        self._cancelled = th.Event()
+        self._closed = th.Event()
+        self._local = th.local()
+        self._watches: list[RequestWatch] = []
+        self._watches_lock = th.Lock()
+        self._watchdog: th.Thread | None = None
+        self._session = self._make_session()
+        self._prepared: dict[int, PreparedTask] = {}
+        self._redirects: dict[int, PreparedTask] = {}  # task id -> permanent redirect target
+        self._validators: dict[int, dict[str, str]] = {}  # prepared task id -> headers
+        self.breakers: CircuitBreakers | None = None
+        if options.circuit_breaker:
+            self.breakers = CircuitBreakers(options.circuit_breaker, options.circuit_cooldown)
+
+    def prepare(self, task: Task, cache: bool = True) -> PreparedTask:
+        """
+        Tasks existing only for one request (e.g. with substituted variables)
+        should be prepared with `cache` disabled.
+        """
+        if not cache:
+            return self._prepare(task)
+        if self._redirects and (prepared := self._redirects.get(id(task))) is not None:
+            return prepared
+        # the task is referenced by the value, thus its id() cannot be reused
+        if (prepared := self._prepared.get(id(task))) is None:
+            prepared = self._prepared.setdefault(id(task), self._prepare(task, cached=True))
+        return prepared
+
+    def send(self, prepared: PreparedTask, session: requests.Session = None) -> requests.Response:
+        """
+        `session` is the one from `make_user_session()`, if any. Connection
+        errors, timeouts and 5xx responses count as failures of the host for
+        its circuit breaker.
+        """
+        if self._cancelled.is_set():
+            raise RequestCancelled(request=prepared.request)
+        if not self.breakers:
+            return self._send_watched(prepared, session)
+
+        breaker = self.breakers.get(prepared.origin)
+        if not breaker.allow():
+            msg = f"Circuit breaker is open for {prepared.origin}"
+            raise CircuitOpen(msg, request=prepared.request)
+        try:
+            response = self._send_watched(prepared, session)
+        except (requests.exceptions.RequestException, Urllib3HTTPError):
+            if not self._cancelled.is_set():
+                breaker.record(False)
+            raise
+        breaker.record(response.status_code < 500)
+        return response
+
+    def make_user_session(self) -> requests.Session:
+        """Separate session with its own cookie jar and connection pool."""
+        session = self._make_session()
+        session.cookies.set_policy(DefaultCookiePolicy())
+        return session
+
+    def preconnect(self, tasks: t.Iterable[Task], connections: int) -> int:
+        """
+        Open up to `connections` connections to the origin of each task in
+        advance, so that the first requests do not pay for TCP and TLS setup.
+        Return the number of connections opened.
+        """
+        origins: dict[tuple, PreparedTask] = {}
+        for task in tasks:
+            prepared = self.prepare(task)
+            scheme = urlsplit(prepared.request.url).scheme
+            origins.setdefault((scheme, prepared.origin, prepared.settings["verify"]), prepared)
+
+        opened = 0
+        for prepared in origins.values():
+            try:
+                opened += self._preconnect(prepared, connections)
+            except (OSError, Urllib3HTTPError, requests.exceptions.RequestException) as e:
+                get_logger().warning(f"Failed to preconnect to {prepared.origin}: {e}")
+        return opened
+
+    def cancel(self):
+        """
+        Abort the requests in progress (they fail with a connection error or
+        `RequestCancelled`) and reject the new ones. Called from another thread.
+        """
+        self._cancelled.set()
+        self._cancel()
+
+    def close(self):
+        self._closed.set()
+        self._session.close()
+
+    def _send_watched(
+        self,
+        prepared: PreparedTask,
+        session: requests.Session | None,
+    ) -> requests.Response:
+        watch = self._get_watch()
+        watch.start(time.monotonic() + self._options.timeout)
+        try:
+            response = self._send(prepared, session, watch)
+        except requests.exceptions.RequestException as e:
+            if isinstance(e, TotalTimeout):
+                raise
+            if watch.expired or time.monotonic() >= watch.deadline:
+                msg = f"No response within {self._options.timeout}s"
+                raise TotalTimeout(msg, request=prepared.request) from e
+            raise
+        finally:
+            watch.finish()
+        if watch.expired:  # the body might be cut short without an error
+            msg = f"No response within {self._options.timeout}s"
+            raise TotalTimeout(msg, request=prepared.request)
+        self._decode(response)
+        if response.history and self._options.cache_redirects:
+            self._cache_redirect(prepared, response)
+        if self._options.revalidate and prepared.cached:
+            self._update_validators(prepared, response)
+        return response
+
+    def _send(
+        self,
+        prepared: PreparedTask,
+        session: requests.Session | None,
+        watch: RequestWatch,
+    ) -> requests.Response:
+        request = prepared.request
+        if session is None:
+            session = self._session
+        elif session.cookies:
+            request = request.copy()
+            request.prepare_cookies(session.cookies)
+        if self._validators and (validators := self._validators.get(id(prepared))):
+            request = request.copy() if request is prepared.request else request
+            request.headers.update(validators)
+        settings = {**prepared.settings, "timeout": self._get_timeouts(watch)}
+        return session.send(request, **settings)
+
+    def _cache_redirect(self, prepared: PreparedTask, response: requests.Response):
+        """
+        Remember where the permanent redirects the task starts with lead to,
+        so that the next repetitions are sent there directly. 301 is followed
+        with GET for the other methods, therefore is cached for GET and HEAD only.
+        """
+        if not prepared.cached:
+            return  # one-off task, e.g. with substituted variables
+        task = prepared.task
+        target = None
+        hops = [*response.history, response]
+        for hop, next_hop in zip(hops, hops[1:]):
+            if hop.status_code == 301 and task.method in ("GET", "HEAD"):
+                target = next_hop.url
+            elif hop.status_code == 308:
+                target = next_hop.url
+            else:
+                break
+        if target:
+            get_logger().debug(f"Caching redirect target: {task.url} -> {target}")
+            self._redirects.setdefault(id(task), self._prepare(replace(task, url=target), True))
+
+    def _update_validators(self, prepared: PreparedTask, response: requests.Response):
+        """
+        Remember `ETag` and `Last-Modified` of the response, so that the next
+        repetition is a conditional request (answered with 304 if unchanged).
+        """
+        if prepared.task.method not in ("GET", "HEAD") or response.status_code == 304:
+            return
+        validators = {}
+        if etag := response.headers.get("ETag"):
+            validators["If-None-Match"] = etag
+        if last_modified := response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = last_modified
+        if validators:
+            self._validators[id(prepared)] = validators
+        else:
+            self._validators.pop(id(prepared), None)
+
+    def _decode(self, response: requests.Response):
+        body = response._content or b""
+        response.wire_size = len(body)
+        response.decode_time_ns = 0
+        if self._options.no_decompress or not body:
+            return
+        if not (content_encoding := response.headers.get("Content-Encoding")):
+            return
+        time_before = time.perf_counter_ns()
+        try:
+            response._content = decode_content(body, content_encoding)
+        except DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e, response=response) from e
+        response.decode_time_ns = time.perf_counter_ns() - time_before
+
+    def _get_timeouts(self, watch: RequestWatch) -> tuple[float, float]:
+        """Connect and read timeouts, limited by the time left until the deadline."""
+        if (remaining := watch.deadline - time.monotonic()) <= 0:
+            raise TotalTimeout(f"No response within {self._options.timeout}s")
+        return min(self._connect_timeout, remaining), min(self._read_timeout, remaining)
+
+    def _get_watch(self) -> RequestWatch:
+        if (watch := getattr(self._local, "watch", None)) is None:
+            watch = self._local.watch = RequestWatch()
+            with self._watches_lock:
+                self._watches.append(watch)
+                if not self._watchdog:
+                    self._watchdog = th.Thread(target=self._watch, name="watchdog", daemon=True)
+                    self._watchdog.start()
+        return watch
+
+    def _watch(self):
+        while not self._closed.wait(self.WATCHDOG_INTERVAL_SEC):
+            now = time.monotonic()
+            for watch in [*self._watches]:
+                watch.expire(now)
+
+    def _preconnect(self, prepared: PreparedTask, connections: int) -> int:
+        return 0  # not supported by default
+
+    def _cancel(self):
+        for watch in [*self._watches]:
+            watch.abort()
+
+    def _make_session(self) -> requests.Session:
+        session = requests.Session()
+        # requests should not affect each other
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if self._accept_encoding:
+            session.headers["Accept-Encoding"] = self._accept_encoding
+        return session
+
+    def _prepare(self, task: Task, cached: bool = False) -> PreparedTask:
+        request = self._session.prepare_request(
+            requests.Request(task.method, task.url, headers=task.headers, data=task.body)
+        )
+        verify = not self._options.insecure and task.url.startswith("https")
+        settings = self._session.merge_environment_settings(request.url, {}, None, verify, None)
+        settings.update(
+            allow_redirects=True,
+            timeout=(self._connect_timeout, self._read_timeout),
+        )
+        return PreparedTask(task, request, settings, urlsplit(request.url).netloc, cached=cached)
+
+
+class Http1Transport(Transport):
+    """
+    HTTP/1.1 via `requests`, keep-alive connections are pooled and reused
+    by the workers; pool size for each origin equals the (maximum) number
+    of threads.
+    """
+
+    def _make_session(self) -> requests.Session:
+        session = super()._make_session()
+        pool_size = self._options.threads
+        if load_profile := get_load_profile():
+            pool_size = load_profile.max_workers
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self._track_connections(adapter)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _track_connections(self, adapter: HTTPAdapter):
+        """Register the connections in use with the watch of the current request."""
+        local = self._local
+
+        def make_pool_cls(base: type) -> type:
+            class TrackingConnectionPool(base):
+                def _get_conn(self, timeout=None):
+                    conn = super()._get_conn(timeout)
+                    if watch := getattr(local, "watch", None):
+                        watch.add(conn)
+                    return conn
+
+                def _put_conn(self, conn):
+                    if conn and (watch := getattr(local, "watch", None)):
+                        watch.discard(conn)
+                    super()._put_conn(conn)
+
+            # appears in the error messages
+            TrackingConnectionPool.__name__ = TrackingConnectionPool.__qualname__ = base.__name__
+            return TrackingConnectionPool
+
+        poolmanager = adapter.poolmanager
+        poolmanager.pool_classes_by_scheme = {
+            scheme: make_pool_cls(pool_cls)
+            for scheme, pool_cls in poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def _prepare(self, task: Task, cached: bool = False) -> PreparedTask:
+        prepared = super()._prepare(task, cached)
+        # the body is read by `_send()` without decoding
+        prepared.settings["stream"] = True
+        return prepared
+
+    def _send(
+        self,
+        prepared: PreparedTask,
+        session: requests.Session | None,
+        watch: RequestWatch,
+    ) -> requests.Response:
+        response = super()._send(prepared, session, watch)
+        try:
+            response._content = response.raw.read(decode_content=False) or b""
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e, response=response) from e
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e, response=response) from e
+        except urllib3.exceptions.SSLError as e:
+            raise requests.exceptions.SSLError(e, response=response) from e
+        except OSError as e:
+            raise requests.exceptions.ConnectionError(e, response=response) from e
+        finally:
+            response.raw.release_conn()
+        response._content_consumed = True
+        return response
+
+    def _preconnect(self, prepared: PreparedTask, connections: int) -> int:
+        url, settings = prepared.request.url, prepared.settings
+        if select_proxy(url, settings["proxies"]):
+            return 0
+        adapter = self._session.get_adapter(url)
+        if hasattr(adapter, "get_connection_with_tls_context"):  # requests>=2.32
+            pool = adapter.get_connection_with_tls_context(
+                prepared.request, settings["verify"], settings["proxies"], settings["cert"]
+            )
+        else:
+            pool = adapter.get_connection(url, settings["proxies"])
+        adapter.cert_verify(pool, url, settings["verify"], settings["cert"])
+
+        # connections are taken from the pool all at once, as otherwise
+        # the same idle connection would be returned every time
+        conns = [pool._get_conn() for _ in range(min(connections, pool.pool.maxsize))]  # noqa
+        try:
+            for conn in conns:
+                conn.timeout = settings["timeout"][0]
+            with ThreadPoolExecutor(len(conns)) as executor:
+                [*executor.map(lambda c: c.sock or c.connect(), conns)]
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)  # noqa
+        return len(conns)
+
+
+class Http2Transport(Transport):
+    """
+    HTTP/2 via `httpx`, all workers share one connection per origin and
+    multiplex the requests as separate streams. Plain HTTP origins are
+    queried over HTTP/1.1, as HTTP/2 is negotiated through TLS ALPN.
+    """
+
+    def __init__(self, options: Options):
+        super().__init__(options)
+        self._streams: dict[str, th.BoundedSemaphore] = {}
+        self._streams_lock = th.Lock()
+
+    def send(self, prepared: PreparedTask, session: requests.Session = None) -> requests.Response:
+        # waiting for a free stream should not count as request latency,
+        # therefore the limit is enforced outside of `Session.send()`
+        with self._get_stream_semaphore(prepared.origin):
+            return super().send(prepared, session)
+
+    def _make_session(self) -> requests.Session:
+        session = super()._make_session()
+        adapter = Http2Adapter(self._options, self._get_watch)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get_stream_semaphore(self, origin: str) -> th.BoundedSemaphore:
+        if (semaphore := self._streams.get(origin)) is None:
+            with self._streams_lock:
+                semaphore = self._streams.setdefault(
+                    origin, th.BoundedSemaphore(self._options.streams)
+                )
+        return semaphore
+
+
+class Http2Adapter(BaseAdapter):
+    # hop-by-hop headers are forbidden in HTTP/2
+    CONNECTION_HEADERS = {"connection", "keep-alive", "proxy-connection", "upgrade"}
+
+    def __init__(self, options: Options, get_watch: t.Callable[[], RequestWatch]):
+        super().__init__()
+        self._get_watch = get_watch
+        self._timeout = options.timeout
+        try:
+            import httpx
+        except ImportError as e:
+            raise RuntimeError(
+                "HTTP/2 transport requires 'httpx[http2]' package to be installed"
+            ) from e
+
+        self._httpx = httpx
+        self._client = httpx.Client(
+            http2=True,
+            verify=not options.insecure,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+            # the client is shared by all workers; cookies are kept by the
+            # sessions instead, as with HTTP/1 (see `_build_response()`)
+            cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+        )
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream=False,
+        timeout=None,
+        verify=True,
+        cert=None,
+        proxies=None,
+    ) -> requests.Response:
+        httpx = self._httpx
+        headers = [
+            (k, v) for k, v in request.headers.items() if k.lower() not in self.CONNECTION_HEADERS
+        ]
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+
+        try:
+            with self._client.stream(
+                request.method,
+                request.url,
+                headers=headers,
+                content=request.body,
+                timeout=httpx.Timeout(
+                    connect=connect_timeout,
+                    read=read_timeout,
+                    write=read_timeout,
+                    pool=connect_timeout,
+                ),
+            ) as r:
+                content = b"".join(self._iter_content(r))  # not decoded
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request) from e
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(e, request=request) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request) from e
+
+        get_logger().debug(f"{r.http_version} {r.status_code} {request.url}")
+        return self._build_response(request, r, content)
+
+    def close(self):
+        self._client.close()
+
+    def _iter_content(self, r: t.Any) -> t.Iterable[bytes]:
+        # the sockets are managed by httpx, so instead of being aborted by
+        # the watchdog, the deadline is checked on every part of the body
+        deadline = self._get_watch().deadline
+        for chunk in r.iter_raw():
+            yield chunk
+            if deadline and time.monotonic() >= deadline:
+                raise TotalTimeout(f"No response within {self._timeout}s")
+
+    def _build_response(
+        self,
+        request: requests.PreparedRequest,
+        r: t.Any,
+        content: bytes,
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = r.status_code
+        response.reason = r.reason_phrase
+        response.headers = CaseInsensitiveDict(r.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = content
+        response._content_consumed = True
+        if set_cookies := r.headers.get_list("set-cookie"):
+            # the session extracts the cookies from the original response headers
+            msg = HTTPMessage()
+            for value in set_cookies:
+                msg["Set-Cookie"] = value
+            response.raw = SimpleNamespace(_original_response=SimpleNamespace(msg=msg))
+        return response
+
+
+class RawTransport(Http1Transport):
+    """
+    Minimal HTTP/1.1 client for availability and throughput probing. Request
+    bytes are serialized once per task and written onto keep-alive sockets
+    (one set per worker thread); only the status line, headers and body
+    framing are parsed. Uncompressed responses are requested, unless
+    `--accept-encoding` is specified.
+
+    Only GET and HEAD requests without a body are handled this way; anything
+    else, as well as requests going through a proxy, requests of the virtual
+    users (which need cookies) and responses with redirects, fall back to
+    `Http1Transport`.
+    """
+
+    METHODS = ("GET", "HEAD")
+    MAX_LINE = 65536
+
+    def __init__(self, options: Options):
+        super().__init__(options)
+        self._connections: list[dict[tuple, tuple]] = []
+        self._preconnected: dict[tuple, list[tuple]] = {}
+        self._ssl_contexts: dict[bool, ssl.SSLContext] = {}
+
+    def _send(
+        self,
+        prepared: PreparedTask,
+        session: requests.Session | None,
+        watch: RequestWatch,
+    ) -> requests.Response:
+        if not prepared.raw or session is not None:
+            return super()._send(prepared, session, watch)
+
+        response = self._send_raw(prepared, watch)
+        if response.is_redirect and prepared.settings["allow_redirects"]:
+            prepared.raw = None
+            return super()._send(prepared, None, watch)
+        return response
+
+    def close(self):
+        super().close()
+        conns = [conn for connections in self._connections for conn in connections.values()]
+        conns += [conn for connections in self._preconnected.values() for conn in connections]
+        for sock, fp in conns:
+            fp.close()
+            sock.close()
+
+    def _preconnect(self, prepared: PreparedTask, connections: int) -> int:
+        if not prepared.raw:
+            return super()._preconnect(prepared, connections)
+        origin = self._get_origin(prepared)
+        connect_timeout = prepared.settings["timeout"][0]
+        with ThreadPoolExecutor(connections) as executor:
+            connect = lambda _: self._connect(origin, connect_timeout)
+            conns = [*executor.map(connect, range(connections))]
+        self._preconnected.setdefault(origin, []).extend(conns)
+        return len(conns)
+
+    def _prepare(self, task: Task, cached: bool = False) -> PreparedTask:
+        prepared = super()._prepare(task, cached)
+        if task.method in self.METHODS and not task.body and not prepared.settings["proxies"]:
+            prepared.raw = self._serialize(prepared.request, task.headers)
+        return prepared
+
+    def _send_raw(self, prepared: PreparedTask, watch: RequestWatch) -> requests.Response:
+        method, url, payload = prepared.request.method, prepared.request.url, prepared.raw
+        origin = self._get_origin(prepared)
+        if self._validators and (validators := self._validators.get(id(prepared))):
+            # insert the headers before the empty line ending the request
+            lines = "".join(f"{k}: {v}\r\n" for k, v in validators.items())
+            payload = payload[:-2] + lines.encode("latin-1") + b"\r\n"
+
+        for attempt in range(2):
+            if self._cancelled.is_set():
+                raise RequestCancelled(request=prepared.request)
+            connect_timeout, read_timeout = self._get_timeouts(watch)
+            reused, conn = self._get_connection(origin, connect_timeout)
+            watch.add(conn[0])
+            time_before = time.perf_counter()
+            try:
+                conn[0].settimeout(read_timeout)
+                conn[0].sendall(payload)
+                status, reason, resp_headers = self._read_head(conn[1])
+                elapsed = time.perf_counter() - time_before
+                body, keep_alive = self._read_body(conn[1], method, status, resp_headers)
+            except (socket.timeout, ssl.SSLError, OSError, ValueError) as e:
+                self._drop_connection(origin)
+                if reused and attempt == 0 and not isinstance(e, socket.timeout):
+                    if not (watch.expired or self._cancelled.is_set()):
+                        continue  # stale keep-alive connection, retry on a fresh one
+                if isinstance(e, socket.timeout):
+                    raise requests.exceptions.ReadTimeout(e) from e
+                raise requests.exceptions.ConnectionError(e) from e
+            if not keep_alive:
+                self._drop_connection(origin)
+            break
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = resp_headers
+        response.encoding = get_encoding_from_headers(resp_headers)
+        response.url = url
+        response.elapsed = timedelta(seconds=elapsed)
+        response._content = body
+        return response
+
+    def _serialize(
+        self,
+        request: requests.PreparedRequest,
+        task_headers: CaseInsensitiveDict | None,
+    ) -> bytes:
+        headers = CaseInsensitiveDict({"Host": urlsplit(request.url).netloc.rpartition("@")[2]})
+        headers.update(request.headers)
+        headers["Connection"] = "keep-alive"
+        if not self._accept_encoding:
+            headers["Accept-Encoding"] = "identity"
+        headers.update(task_headers or {})
+
+        lines = [f"{request.method} {request.path_url} HTTP/1.1"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    def _get_connection(self, origin: tuple, connect_timeout: float) -> tuple[bool, tuple]:
+        if (connections := getattr(self._local, "connections", None)) is None:
+            connections = self._local.connections = {}
+            self._connections.append(connections)
+        if (conn := connections.get(origin)) is not None:
+            return True, conn
+        try:
+            # might have been closed by the server while idle, thus counts as reused
+            conn = connections[origin] = self._preconnected.get(origin, []).pop()
+            return True, conn
+        except IndexError:
+            pass
+        conn = connections[origin] = self._connect(origin, connect_timeout)
+        return False, conn
+
+    def _get_origin(self, prepared: PreparedTask) -> tuple:
+        parts = urlsplit(prepared.request.url)
+        return parts.scheme, parts.hostname, parts.port, prepared.settings["verify"]
+
+    def _connect(self, origin: tuple, connect_timeout: float) -> tuple:
+        scheme, host, port, verify = origin
+        port = port or (443 if scheme == "https" else 80)
+        try:
+            sock = socket.create_connection((host, port), timeout=connect_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if scheme == "https":
+                sock = self._get_ssl_context(verify).wrap_socket(sock, server_hostname=host)
+        except socket.timeout as e:
+            raise requests.exceptions.ConnectTimeout(e) from e
+        except ssl.SSLError as e:
+            raise requests.exceptions.SSLError(e) from e
+        except OSError as e:
+            raise requests.exceptions.ConnectionError(e) from e
+        return sock, sock.makefile("rb")
+
+    def _drop_connection(self, origin: tuple):
+        if conn := self._local.connections.pop(origin, None):
+            conn[1].close()
+            conn[0].close()
+
+    def _get_ssl_context(self, verify: bool) -> ssl.SSLContext:
+        if (context := self._ssl_contexts.get(verify)) is None:
+            if verify:
+                import certifi
+
+                context = ssl.create_default_context(cafile=certifi.where())
+            else:
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            context = self._ssl_contexts.setdefault(verify, context)
+        return context
+
+    def _read_head(self, fp: t.BinaryIO) -> tuple[int, str, CaseInsensitiveDict]:
+        status_line = fp.readline(self.MAX_LINE)
+        if not status_line:
+            raise ConnectionResetError("Connection closed by remote host")
+        _, status, *reason = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        headers = CaseInsensitiveDict()
+        while (line := fp.readline(self.MAX_LINE)) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip()] = value.strip()
+        return int(status), "".join(reason), headers
+
+    def _read_body(
+        self,
+        fp: t.BinaryIO,
+        method: str,
+        status: int,
+        headers: CaseInsensitiveDict,
+    ) -> tuple[bytes, bool]:
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status < 200 or status in (204, 304):
+            return b"", keep_alive
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = []
+            while size := int(fp.readline(self.MAX_LINE).split(b";", 1)[0], 16):
+                chunks.append(fp.read(size))
+                fp.readline(self.MAX_LINE)
+            while fp.readline(self.MAX_LINE) not in (b"\r\n", b"\n", b""):
+                pass  # trailers
+            return b"".join(chunks), keep_alive
+        if (length := headers.get("content-length")) is not None:
+            body = fp.read(int(length))
+            if len(body) < int(length):
+                raise ConnectionResetError("Incomplete response body")
+            return body, keep_alive
+        return fp.read(), False
+
+
+TRANSPORTS: dict[str, t.Type[Transport]] = {
+    "http1": Http1Transport,
+    "http2": Http2Transport,
+    "raw": RawTransport,
+}
@@ -6,88 +6,207 @@ import json
 import threading as t
 import time
 from collections.abc import Iterable
-from queue import Queue, Empty
+from queue import Empty
 import pytermor as pt
 import requests
 import urllib3.exceptions
 from requests import Response, JSONDecodeError
 from requests.structures import CaseInsensitiveDict
 
-from ._common import get_state, State, Task, FixedWidthStringWrapper
+from ._common import get_state, Scenario, State, Task
 from .logger import get_logger
+from .pool import PoolClosed, TaskPool
 from .printer import get_printer
+from .profiler import get_profiler
+from .scenario import VirtualUser
+from .stages import get_load_profile
+from .tracer import get_tracer
+from .transport import Transport, get_transport
+
+
+class FixedWidthStringWrapper(pt.StringReplacerChain):
+    def __init__(self, width: int = 80):
+        super().__init__(
+            "(?s).+",
+            pt.StringReplacer(R"\s+", " "),
+            pt.StringReplacer(Rf"(.{{{width}}})", r"\1\n"),
+        )
 
 
 class Worker(t.Thread):
-    def __init__(self, task_pool: Queue[Task], idx: int):
+    POOL_TIMEOUT_SEC = 0.5
+
+    def __init__(self, task_pool: TaskPool, idx: int, warmup: bool = False):
         self._state: State = get_state()
-        self._task_pool: Queue[Task] = task_pool
+        self._task_pool: TaskPool = task_pool
+        self._transport: Transport = get_transport()
         self._idx: int = idx
-        super().__init__(target=self.run, name=f"#{idx}")
+        self._warmup: bool = warmup
+        self._retired: t.Event = t.Event()
+        # might be left behind on shutdown, if stuck in a request which cannot be cancelled
+        super().__init__(name=f"#{idx}", daemon=True)
+
+    def retire(self):
+        """Stop taking new tasks; the current request (if any) will be completed."""
+        self._retired.set()
 
     def run(self):
+        if profiler := get_profiler():
+            profiler.run(self._run)
+        else:
+            self._run()
+
+    def _run(self):
         logger = get_logger()
-        printer = get_printer()
         options = self._state.options
+        virtual_user: VirtualUser | None = None
 
-        while True:
-            if self._shutdown_on_flag():
-                return
-            try:
-                task = self._task_pool.get_nowait()
-            except Empty:
-                logger.debug(f"Empty queue, terminating")
-                self._update_state("dead")
-                return
-            if not task:
-                continue
-
-            delay = options.delay
-            self._update_state("waiting")
-            while delay > 0:
+        try:
+            while True:
                 if self._shutdown_on_flag():
                     return
-                time.sleep(1)
-                delay -= 1
-
-            request_id = self._state.last_request_id.next()
-            logger.info(f"Request #{request_id}: {task.method} {task.url}")
-
-            response = None
-            request_params = dict(
-                headers=task.headers,
-                data=task.body,
-                allow_redirects=True,
-                timeout=(options.timeout / 2, options.timeout / 2),
-                verify=(not options.insecure and task.url.startswith("https")),
-            )
-            exception = None
-
-            self._update_state("requesting")
-            time_before = time_after = time.time_ns()
-            try:
-                response = requests.request(task.method, task.url, **request_params)
-            except urllib3.exceptions.HTTPWarning as e:
-                logger.warning(e)
-            except (urllib3.exceptions.HTTPError, requests.exceptions.RequestException) as e:
-                time_after = time.time_ns()
-                logger.exception(e, exc_info=False)
-                exception = e
+                try:
+                    task = self._task_pool.get(self.POOL_TIMEOUT_SEC)
+                except Empty:
+                    continue  # nothing is due yet
+                except PoolClosed:
+                    logger.debug(f"Empty queue, terminating")
+                    self._update_state("dead")
+                    return
+                if not task:
+                    continue
 
-            if response is not None:
-                if response.ok:
-                    self._state.requests_success.next()
+                delay = 0 if options.watch or options.replay or self._warmup else options.delay
+                self._update_state("waiting")
+                while delay > 0:
+                    if self._shutdown_on_flag():
+                        return
+                    time.sleep(1)
+                    delay -= 1
+
+                if isinstance(task, Scenario):
+                    virtual_user = virtual_user or VirtualUser(self._transport)
+                    self._run_scenario(task, virtual_user)
+                elif self._warmup:
+                    self._warm_up(task, (task.method, task.url))
+                elif self._task_pool.unique_tasks:
+                    # aggregated by the path, as the captured traffic rarely repeats exactly
+                    key = (task.method, task.url.partition("?")[0])
+                    self._perform(task, key, cache=False)
                 else:
-                    self._state.requests_failed.next()
+                    self._perform(task, (task.method, task.url))
+        finally:
+            if virtual_user:
+                virtual_user.close()
+
+    def _run_scenario(self, scenario: Scenario, virtual_user: VirtualUser):
+        virtual_user.reset()
+        for step in scenario.tasks:
+            if self._state.shutdown_flag.is_set():
+                return
+            task = virtual_user.render(step)
+            key = (step.method, step.url)  # endpoint stats are aggregated by the template
+            perform = self._warm_up if self._warmup else self._perform
+            response = perform(task, key, virtual_user.session, cache=task is step)
+            if response is not None:
+                virtual_user.extract(step, response)
+
+    def _perform(
+        self,
+        task: Task,
+        key: tuple[str, str],
+        session: requests.Session = None,
+        cache: bool = True,
+    ) -> Response | None:
+        logger = get_logger()
+        printer = get_printer()
+        load_profile = get_load_profile()
+
+        request_id = self._state.last_request_id.next()
+        logger.info(f"Request #{request_id}: {task.method} {task.url}")
 
-                self._state.requests_latency.append(response.elapsed.total_seconds())
-                printer.print_completed_request(task, response, request_id)
-                logger.info(f"Response #{request_id}: {self._get_status_code(response)}")
+        response = None
+        exception = None
+
+        self._update_state("requesting")
+        time_before = time_after = time.time_ns()
+        try:
+            prepared = self._transport.prepare(task, cache)
+            response = self._transport.send(prepared, session)
+        except urllib3.exceptions.HTTPWarning as e:
+            logger.warning(e)
+        except (urllib3.exceptions.HTTPError, requests.exceptions.RequestException) as e:
+            if self._state.shutdown_flag.is_set():
+                # aborted by the shutdown rather than failed on its own
+                self._state.requests_cancelled.next()
+                logger.info(f"Request #{request_id} cancelled")
+                return None
+            time_after = time.time_ns()
+            logger.exception(e, exc_info=False)
+            exception = e
+
+        if response is not None:
+            if response.ok:
+                self._state.requests_success.next()
             else:
                 self._state.requests_failed.next()
-                printer.print_failed_request(task, time_after - time_before, request_id, exception)
-                logger.info(f"No response for #{request_id}")
-            self._trace_result(task, response, request_id)
+            if response.status_code == 304:
+                self._state.cache_hits.next()
+
+            elapsed = response.elapsed.total_seconds()
+            size = self._get_size(response)
+            self._state.bytes_wire.add(getattr(response, "wire_size", size))
+            self._state.bytes_decoded.add(size)
+            self._state.decode_time_ns.add(getattr(response, "decode_time_ns", 0))
+            self._state.requests_latency.append(elapsed)
+            self._state.responses_by_status.next(str(response.status_code))
+            if self._state.latency_by_endpoint:
+                self._state.latency_by_endpoint.observe(key, elapsed)
+            self._state.endpoint_stats.record(key, response.ok, size, elapsed)
+            for hop in response.history:
+                hop_key = (hop.status_code, hop.request.method, hop.url)
+                self._state.redirect_stats.record(hop_key, True, 0, hop.elapsed.total_seconds())
+            if load_profile:
+                load_profile.record(response.ok, size, elapsed)
+            printer.print_completed_request(task, response, request_id)
+            logger.info(f"Response #{request_id}: {self._get_status_code(response)}")
+        else:
+            self._state.requests_failed.next()
+            self._state.errors_by_type.next(type(exception).__name__)
+            self._state.endpoint_stats.record(key, False, 0, None)
+            if load_profile:
+                load_profile.record(False, 0, None)
+            printer.print_failed_request(task, time_after - time_before, request_id, exception)
+            logger.info(f"No response for #{request_id}")
+            elapsed = (time_after - time_before) / 1e9
+        self._trace_result(task, response, request_id, elapsed)
+        return response
+
+    def _warm_up(
+        self,
+        task: Task,
+        key: tuple[str, str],
+        session: requests.Session = None,
+        cache: bool = True,
+    ) -> Response | None:
+        """Perform the request without printing it or counting in the results."""
+        self._update_state("requesting")
+        try:
+            prepared = self._transport.prepare(task, cache)
+            response = self._transport.send(prepared, session)
+        except (
+            urllib3.exceptions.HTTPWarning,
+            urllib3.exceptions.HTTPError,
+            requests.exceptions.RequestException,
+        ) as e:
+            get_logger().info(f"Warm-up request failed: {task.method} {task.url}: {e}")
+            if not self._state.shutdown_flag.is_set():
+                self._state.warmup_stats.record(key, False, 0, None)
+            return None
+        elapsed = response.elapsed.total_seconds()
+        self._state.warmup_stats.record(key, response.ok, self._get_size(response), elapsed)
+        get_logger().debug(f"Warm-up request: {task.method} {task.url}: {response.status_code}")
+        return response
 
     def _update_state(self, state: str):
         prev_state = self._state.worker_states[self._idx]
@@ -95,24 +214,34 @@ class Worker(t.Thread):
         self._state.worker_states[self._idx] = state
 
     def _shutdown_on_flag(self) -> bool:
-        if get_state().shutdown_flag.is_set():
+        if get_state().shutdown_flag.is_set() or self._retired.is_set():
             self._update_state("dead")
             return True
         return False
 
+    def _get_size(self, response: Response) -> int:
+        try:
+            return len(response.content)
+        except Exception:
+            return 0
+
     def _get_status_code(self, response: Response) -> str:
         result = f"HTTP {response.status_code}"
         result += " " + response.reason
         return result
 
-    def _trace_result(self, task: Task, response: Response, request_id: int):
+    def _trace_result(self, task: Task, response: Response, request_id: int, elapsed: float):
+        tracer = get_tracer()
+        ok = response is not None and response.ok
+        if not tracer or not tracer.should_trace(ok, elapsed):
+            return  # do not spend time on formatting the dump
         dump_parts = [
             "",
             f"# [R/R {request_id}]",
             *self._trace_request(task),
             *self._trace_response(response),
         ]
-        get_logger().trace("\n".join(dump_parts))
+        tracer.trace("\n".join(dump_parts))
 
     def _trace_request(self, task: Task):
         try:
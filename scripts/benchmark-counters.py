@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Measure how increment cost of the statistics counters scales with threads.
+
+Each of THREADS threads performs INCREMENTS/THREADS increments of the same
+counter at once; the report contains the wall time per increment for every
+counter implementation and number of threads.
+
+    $ ./scripts/benchmark-counters.py [-n INCREMENTS] [-t THREADS ...]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from macedon._common import SequenceCounter, ShardedCounter
+
+
+class LockedCounter:
+    """Reference implementation: lock on every increment (as before)."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+COUNTERS = {
+    "locked": LockedCounter,
+    "sharded": ShardedCounter,
+    "sequence": SequenceCounter,
+}
+
+
+def measure(counter_cls: type, threads_num: int, increments: int) -> float:
+    counter = counter_cls()
+    per_thread = increments // threads_num
+    barrier = threading.Barrier(threads_num + 1)
+
+    def run():
+        inc = counter.next
+        barrier.wait()
+        for _ in range(per_thread):
+            inc()
+
+    threads = [threading.Thread(target=run) for _ in range(threads_num)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    time_before = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - time_before
+
+    assert counter.value == per_thread * threads_num, (counter_cls, counter.value)
+    return elapsed / (per_thread * threads_num)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--increments", type=int, default=1_000_000)
+    parser.add_argument("-t", "--threads", type=int, action="append", default=[])
+    opts = parser.parse_args()
+
+    threads_nums = opts.threads or [1, 2, 4, 8, 16, 32, 64, 128, 256]
+    print("threads" + "".join(f"{name:>12s}" for name in COUNTERS) + "   (ns/increment)")
+    for threads_num in threads_nums:
+        results = [measure(cls, threads_num, opts.increments) for cls in COUNTERS.values()]
+        print(f"{threads_num:7d}" + "".join(f"{r * 1e9:12.1f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
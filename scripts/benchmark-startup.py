@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Measure cold start of the most common invocations using ``python -X importtime``.
+
+For each invocation the application is launched REPEATS times in a fresh
+interpreter; the report contains median wall time, median total import time
+and the heaviest top-level imports of the last run. The one-URL check is
+performed against a throwaway local HTTP server.
+
+    $ ./scripts/benchmark-startup.py [-n REPEATS] [--top N] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_REGEX = re.compile(R"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(args: list[str], repeats: int) -> dict:
+    walls, totals, top = [], [], []
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT, PYTHONDONTWRITEBYTECODE="")
+    for _ in range(repeats):
+        time_before = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "macedon", *args],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        walls.append(time.perf_counter() - time_before)
+
+        total, top = 0, []
+        for line in proc.stderr.splitlines():
+            if not (m := IMPORTTIME_REGEX.match(line)):
+                continue
+            self_us, cumulative_us, indent, name = m.groups()
+            total += int(self_us)
+            if len(indent) == 1:
+                top.append((int(cumulative_us), name))
+        totals.append(total)
+
+    return dict(
+        args=args,
+        wall_ms=statistics.median(walls) * 1e3,
+        import_ms=statistics.median(totals) / 1e3,
+        top=[(name, us / 1e3) for us, name in sorted(top, reverse=True)],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports to list")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    opts = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://%s:%d/" % server.server_address
+
+    invocations = [
+        ["--version"],
+        ["--help"],
+        ["-T1", "-C", url],
+    ]
+    results = [measure(args, opts.repeats) for args in invocations]
+    server.shutdown()
+
+    if opts.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print(f"macedon {' '.join(result['args'])}")
+        print(f"  wall:    {result['wall_ms']:8.1f} ms")
+        print(f"  imports: {result['import_ms']:8.1f} ms")
+        for name, ms in result["top"][: opts.top]:
+            print(f"    {ms:8.1f} ms  {name}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+"""
+Measure client CPU time per request for each transport.
+
+A keep-alive HTTP/1.1 server is started in a separate process, so that its
+CPU usage does not affect the measurements; then REQUESTS sequential GET
+requests are performed through each transport in the current process.
+"requests" is a baseline: plain `requests.request()` call for each request.
+
+    $ ./scripts/benchmark-transport.py [-n REQUESTS] [-t TRANSPORT ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+SERVER_CODE = """
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"OK")
+    def log_message(self, *args):
+        pass
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+print(server.server_address[1], flush=True)
+server.serve_forever()
+"""
+
+
+def measure(transport_name: str, url: str, requests_num: int) -> tuple[float, float]:
+    import requests
+
+    from macedon._common import Options, Task
+    from macedon.transport import TRANSPORTS
+
+    if transport_name == "requests":
+        # non-prepared, non-pooled request: what `Worker` used to do
+        kwargs = dict(allow_redirects=True, timeout=(5, 5), verify=False)
+        send = lambda: requests.request("GET", url, **kwargs)
+        close = lambda: None
+    else:
+        options = Options(endpoint_url=(url,), file=(), transport=transport_name, threads=1)
+        transport = TRANSPORTS[transport_name](options)
+        task = Task(url)
+        send = lambda: transport.send(transport.prepare(task))
+        close = transport.close
+    send()  # warm up
+
+    cpu_before, wall_before = time.process_time(), time.perf_counter()
+    for _ in range(requests_num):
+        send().raise_for_status()
+    cpu, wall = time.process_time() - cpu_before, time.perf_counter() - wall_before
+
+    close()
+    return cpu / requests_num, wall / requests_num
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-t", "--transport", action="append", default=[])
+    opts = parser.parse_args()
+
+    from macedon._common import Options
+    from macedon.io import init_io
+    from macedon.logger import init_logger
+
+    init_io(options := Options(endpoint_url=(), file=()))
+    init_logger(options)
+
+    server = subprocess.Popen([sys.executable, "-c", SERVER_CODE], stdout=subprocess.PIPE)
+    url = f"http://127.0.0.1:{int(server.stdout.readline())}/"
+    try:
+        results = {}
+        for transport_name in opts.transport or ["requests", "http1", "http2", "raw"]:
+            try:
+                results[transport_name] = measure(transport_name, url, opts.requests)
+            except RuntimeError as e:
+                print(f"{transport_name:>8s}  skipped: {e}")
+    finally:
+        server.terminate()
+
+    baseline = results.get("requests", (None,))[0]
+    for transport_name, (cpu, wall) in results.items():
+        ratio = f"  x{baseline / cpu:.1f}" if baseline else ""
+        print(
+            f"{transport_name:>8s}  cpu {cpu * 1e6:8.1f} µs/req  wall {wall * 1e6:8.1f} µs/req{ratio}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,12 @@
 #  macedon [CLI web service availability verifier]
 #  (c) 2022-2024 A. Shavykin <0.delameter@gmail.com>
 # -----------------------------------------------------------------------------
+import gzip
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
 from re import Pattern
+from threading import Thread
 from typing import cast
 
 import pytest
@@ -47,10 +52,119 @@ class CliRunner(ClickCliRunner):
 
 
 @pytest.fixture(scope="function")
-def runner():
+def runner(cache_dir):
+    # parsed request files should not be cached outside of the test
     yield CliRunner(mix_stderr=False)
 
 
 @pytest.fixture(scope="session")
 def ep():
     yield cast(ClickCommand, entrypoint.callback)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._respond(200, b"OK")
+
+    def do_HEAD(self):
+        self._respond(200, b"")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._respond(200, self.rfile.read(length))
+
+    def _respond(self, status: int, body: bytes):
+        if self.path.startswith("/404"):
+            status = 404
+        if self.path.startswith("/login"):
+            self.send_response(200)
+            self.send_header("Set-Cookie", "session=s3cr3t; Path=/")
+            self.send_header("X-Request-Id", "42")
+            body = b'{"data": {"token": "t0k3n", "items": [{"id": 7}]}}'
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path.startswith("/cookie"):
+            body = self.headers.get("Cookie", "").encode()
+        if self.path.startswith("/private"):
+            # requires the cookie and the token from /login
+            authorized = "session=s3cr3t" in self.headers.get("Cookie", "")
+            authorized &= self.headers.get("Authorization") == "Bearer t0k3n"
+            status = 200 if authorized else 401
+        if self.path.startswith("/drip"):
+            # every read completes quickly, but the whole body takes 3s
+            self.send_response(200)
+            self.send_header("Content-Length", "10")
+            self.end_headers()
+            try:
+                for _ in range(10):
+                    self.wfile.write(b".")
+                    self.wfile.flush()
+                    time.sleep(0.3)
+            except OSError:
+                pass  # aborted by the client
+            return
+        if self.path.startswith("/slow"):
+            time.sleep(5)
+        if self.path.startswith(("/redirect", "/moved")):
+            # /moved -> /redirect -> /
+            moved = self.path.startswith("/moved")
+            self.send_response(308 if moved else 301)
+            self.send_header("Location", "/redirect" if moved else "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/gzip"):
+            # compressed only if the client accepts it
+            body = b"OK" * 500
+            self.send_response(200)
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path.startswith("/etag"):
+            # the content never changes
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+            return
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def http_server() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+    server.daemon_threads = True
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://%s:%d" % server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="function")
+def cache_dir(tmp_path, monkeypatch) -> Path:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    yield tmp_path / "macedon"
@@ -0,0 +1,143 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+import socket
+import time
+from unittest import mock
+
+from macedon._common import LatencyReservoir, Options, destroy_state, init_state
+from macedon.breaker import CircuitBreaker
+from macedon.logger import destroy_logger, init_logger
+from macedon.slo import SloCondition, SloGuard, parse_slo
+from .fixtures import *
+
+
+@pytest.fixture
+def state():
+    options = Options(endpoint_url=(), file=())
+    init_logger(options)
+    yield init_state(options)
+    destroy_state()
+    destroy_logger()
+
+
+@pytest.fixture
+def closed_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()  # nothing listens there anymore
+    return port
+
+
+class TestCircuitBreaker:
+    def test_transitions(self, state):
+        breaker = CircuitBreaker("host", threshold=2, cooldown=0.1)
+        breaker.record(False)
+        assert breaker.allow()
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        time.sleep(0.1)
+        assert breaker.allow()  # the probe
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        time.sleep(0.1)
+        assert breaker.allow()
+        breaker.record(True)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+        assert (breaker.opened, breaker.rejected) == (2, 2)
+
+    def test_success_resets_failures(self, state):
+        breaker = CircuitBreaker("host", threshold=2, cooldown=10)
+        for ok in (False, True, False):
+            breaker.record(ok)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_fast_fail(self, closed_port: int, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--circuit-breaker", "3", "-T", "1", "-n", "10", "--report", path]
+        runner.invoke(ep, args=[*args, f"http://127.0.0.1:{closed_port}/"], no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Circuits:\s+7\s+fast-failed, opened 1x, now open"))
+        report = json.loads(path.read_text())
+        assert report["errors_by_type"] == {"CircuitOpen": 7, "ConnectionError": 3}
+
+
+class TestSlo:
+    @pytest.mark.parametrize(
+        "spec, expected",
+        [
+            ("errors>5%:30s", [SloCondition("errors", 0.05, 30)]),
+            (
+                "errors > 0.5% , p99>2s:1m,p50>250ms",
+                [
+                    SloCondition("errors", 0.005),
+                    SloCondition("p99", 2, 60),
+                    SloCondition("p50", 0.25),
+                ],
+            ),
+        ],
+    )
+    def test_parse(self, spec: str, expected: list):
+        assert parse_slo(spec) == expected
+
+    @pytest.mark.parametrize("spec", ["errors>5", "p90>1s", "p99<1s", "p99>1x", ""])
+    def test_parse_invalid(self, spec: str):
+        with pytest.raises(ValueError):
+            parse_slo(spec)
+
+    def test_duration(self, state, monkeypatch):
+        monkeypatch.setattr("macedon.printer.get_printer", mock.Mock)
+        guard = SloGuard([SloCondition("p99", 0.5, 2)])
+        for now, latency in [(1, 0.6), (2, 0.1), (3, 0.6), (4, None), (5, 0.1), (6, 0.6)]:
+            if latency:
+                state.endpoint_stats.record(("GET", "/"), True, 0, latency)
+                state.requests_success.next()
+            guard.check(now)
+            assert not guard.violation
+        state.endpoint_stats.record(("GET", "/"), True, 0, 0.8)
+        guard.check(7)
+        assert re.fullmatch(R"p99 > 500ms for 2s \(was 8\d\dms\)", guard.violation)
+        assert state.shutdown_flag.is_set()
+
+    def test_latency_beyond_reservoir(self, monkeypatch):
+        # the list of latencies stops growing in the endless runs
+        monkeypatch.setattr(LatencyReservoir.__init__, "__defaults__", (10,))
+        monkeypatch.setattr("macedon.printer.get_printer", mock.Mock)
+        options = Options(endpoint_url=(), file=(), stages="1:1s")
+        init_logger(options)
+        state = init_state(options)
+        guard = SloGuard([SloCondition("p50", 0.5)])
+        guard.start()
+        guard.stop()
+
+        for now, latency in enumerate([0.1] * 20 + [0.9] * 5):
+            state.requests_latency.append(latency)  # as the workers do
+            state.endpoint_stats.record(("GET", "/"), True, 0, latency)
+            if now >= 10:
+                guard.check(now)
+        assert len(state.requests_latency) == 10
+        assert guard.violation and guard.violation.startswith("p50 > 500ms (was 9")
+        destroy_state()
+        destroy_logger()
+
+    def test_abort(self, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--slo", "errors>50%", "--stages", "2:10s", "-x", "--report", path]
+        time_before = time.monotonic()
+        result = runner.invoke(ep, args=[*args, f"{http_server}/404"])
+
+        assert time.monotonic() - time_before < 5
+        assert result.exit_code == 2
+        runner.assert_stdout(re.compile(R"Aborted:\s+SLO violated: errors > 50.0% \(was 100.0%\)"))
+        report = json.loads(path.read_text())
+        assert report["slo"]["violated"] == "errors > 50.0% (was 100.0%)"
@@ -0,0 +1,71 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import re
+
+from requests.structures import CaseInsensitiveDict
+
+from macedon._common import Task
+from macedon.cache import TaskCache
+from .fixtures import *
+
+
+class TestTaskCache:
+    def test_roundtrip(self, cache_dir):
+        cache = TaskCache()
+        tasks = [
+            Task("http://localhost/a"),
+            Task("http://localhost/b", "POST", CaseInsensitiveDict({"Accept": "*/*"}), "{}"),
+            Task("http://localhost/c", weight=2.5),
+        ]
+        digest = cache.digest("data")
+        cache.store("req.http", 1, digest, tasks)
+
+        loaded = cache.load("req.http", 1, digest)
+        assert [t.url for t in loaded] == [t.url for t in tasks]
+        assert loaded[1].headers["accept"] == "*/*"
+        assert loaded[1].body == "{}"
+        assert loaded[2].weight == 2.5
+
+    @pytest.mark.parametrize("mtime_ns, data", [(2, "data"), (1, "changed")])
+    def test_invalidation(self, mtime_ns: int, data: str, cache_dir):
+        cache = TaskCache()
+        cache.store("req.http", 1, cache.digest("data"), [Task("http://localhost")])
+        assert cache.load("req.http", mtime_ns, cache.digest(data)) is None
+
+    def test_clear(self, cache_dir):
+        cache = TaskCache()
+        cache.store("req.http", 1, cache.digest("data"), [Task("http://localhost")])
+        assert cache.clear() == 1
+        assert cache.load("req.http", 1, cache.digest("data")) is None
+
+
+class TestFileParserCache:
+    def test_cache_hit(self, tmp_path, cache_dir, http_server, runner, ep):
+        req_file = tmp_path / "req.http"
+        req_file.write_text(f"GET {http_server}/\n")
+
+        runner.invoke(ep, args=["-f", str(req_file)], no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+1/1"))
+        assert len([*cache_dir.iterdir()]) == 1
+
+        runner.invoke(ep, args=["-f", str(req_file), "-vvv"], no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+1/1"))
+        runner.assert_stderr("from cache")
+
+    def test_no_cache(self, tmp_path, cache_dir, http_server, runner, ep):
+        req_file = tmp_path / "req.http"
+        req_file.write_text(f"GET {http_server}/\n")
+
+        runner.invoke(ep, args=["--no-cache", "-f", str(req_file)], no_errors=True)
+        assert not cache_dir.exists()
+
+    def test_clear_cache(self, tmp_path, cache_dir, http_server, runner, ep):
+        req_file = tmp_path / "req.http"
+        req_file.write_text(f"GET {http_server}/\n")
+
+        runner.invoke(ep, args=["-f", str(req_file)], no_errors=True)
+        runner.invoke(ep, args=["--clear-cache"], no_errors=True)
+        runner.assert_stdout("Removed 1 cache entry")
+        assert not [*cache_dir.iterdir()]
@@ -0,0 +1,120 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+from threading import Thread
+
+import pytest
+
+from macedon._common import (
+    SequenceCounter,
+    ShardedCounter,
+    ShardedCounterMap,
+    ShardedEndpointStats,
+    ShardedHistogram,
+    ShardedLogHistogram,
+    sort_endpoints,
+)
+
+
+def _run_threads(fn, threads_num: int):
+    threads = [Thread(target=fn) for _ in range(threads_num)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestCounters:
+    @pytest.mark.parametrize("threads_num", [1, 8, 64])
+    def test_sharded_counter(self, threads_num: int):
+        counter = ShardedCounter()
+
+        def run():
+            for _ in range(1000):
+                counter.next()
+
+        _run_threads(run, threads_num)
+        assert counter.value == 1000 * threads_num
+
+    def test_sequence_counter_unique(self):
+        counter = SequenceCounter()
+        results = []
+
+        def run():
+            results.extend(counter.next() for _ in range(1000))
+
+        _run_threads(run, 16)
+        assert sorted(results) == [*range(1, 16001)]
+        assert counter.value == 16000
+
+    def test_sharded_counter_map(self):
+        counter = ShardedCounterMap()
+
+        def run():
+            for idx in range(1000):
+                counter.next(str(idx % 2))
+
+        _run_threads(run, 8)
+        assert counter.values() == {"0": 4000, "1": 4000}
+
+
+class TestHistogram:
+    def test_sharded_histogram(self):
+        histogram = ShardedHistogram(buckets=(0.1, 1.0))
+
+        def run():
+            for value in (0.05, 0.1, 0.5, 2.0):
+                histogram.observe("a", value)
+            histogram.observe("b", 0.05)
+
+        _run_threads(run, 4)
+        snapshot = histogram.snapshot()
+        assert snapshot["a"].cumulative_counts == [8, 12, 16]
+        assert snapshot["a"].sum == pytest.approx(4 * 2.65)
+        assert snapshot["b"].count == 4
+
+    def test_sharded_log_histogram(self):
+        histogram = ShardedLogHistogram()
+        assert histogram.snapshot() is None
+
+        def run():
+            for ms in range(1, 101):
+                histogram.observe(ms / 1000)
+
+        _run_threads(run, 4)
+        snapshot = histogram.snapshot()
+        assert snapshot.count == 400
+        assert snapshot.percentile(50) == pytest.approx(0.05, rel=0.03)
+        assert snapshot.percentile(100) == pytest.approx(0.1, rel=0.03)
+
+
+class TestEndpointStats:
+    def test_percentiles(self):
+        stats = ShardedEndpointStats()
+
+        def run():
+            for ms in range(1, 1001):
+                stats.record(("GET", "http://a"), ms % 10 != 0, 100, ms / 1000)
+
+        _run_threads(run, 4)
+        endpoint = stats.snapshot()[("GET", "http://a")]
+        assert (endpoint.requests, endpoint.failed, endpoint.bytes) == (4000, 400, 400000)
+        assert endpoint.error_rate == 0.1
+        for percent, expected in [(50, 0.5), (95, 0.95), (99, 0.99)]:
+            assert endpoint.percentile(percent) == pytest.approx(expected, rel=0.03)
+
+    def test_no_responses(self):
+        stats = ShardedEndpointStats()
+        stats.record(("GET", "http://a"), False, 0, None)
+        assert stats.snapshot()[("GET", "http://a")].percentile(50) is None
+
+    def test_sort(self):
+        stats = ShardedEndpointStats()
+        stats.record(("GET", "http://slow"), True, 0, 1.0)
+        stats.record(("GET", "http://fast"), True, 0, 0.1)
+        stats.record(("GET", "http://failed"), False, 0, None)
+        sorted_urls = lambda key: [k[1] for k, _ in sort_endpoints(stats.snapshot(), key)]
+        assert sorted_urls("p95") == ["http://slow", "http://fast", "http://failed"]
+        assert sorted_urls("errors")[0] == "http://failed"
+        assert sorted_urls("url") == ["http://failed", "http://fast", "http://slow"]
@@ -0,0 +1,99 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+import signal
+import subprocess
+import sys
+import time
+import typing as t
+from contextlib import contextmanager
+
+from macedon._common import parse_address
+from .fixtures import *
+
+
+@contextmanager
+def start_agents(num: int, *args: str) -> t.Iterator[list[str]]:
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "macedon", "--listen", "127.0.0.1:0", *args],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(num)
+    ]
+    try:
+        yield [proc.stdout.readline().split()[-1] for proc in procs]
+    finally:
+        for proc in procs:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(5)
+
+
+@pytest.fixture(scope="module")
+def agents() -> list[str]:
+    with start_agents(2) as agents:
+        yield agents
+
+
+class TestDistributed:
+    @pytest.mark.parametrize(
+        "address, expected",
+        [
+            ("8080", ("127.0.0.1", 8080)),
+            ("10.0.0.1:8080", ("10.0.0.1", 8080)),
+            ("[::1]:8080", ("::1", 8080)),
+        ],
+    )
+    def test_parse_address(self, address: str, expected: tuple):
+        assert parse_address(address) == expected
+
+    @pytest.mark.parametrize("amount, expected_total", [(1, 3), (5, 15)])
+    def test_coordinator(self, amount, expected_total, agents, http_server, runner, ep):
+        args = ["-n", amount, "--show-id", *(f"--agent={a}" for a in agents)]
+        args += [f"{http_server}/", f"{http_server}/404", "http://127.0.0.1:9"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout(re.compile(R"Agents:\s+2"))
+        runner.assert_stdout(re.compile(Rf"Successful:\s+{amount}/{expected_total}"))
+        runner.assert_stdout(re.compile(R"404.+/404"))
+        runner.assert_stdout("ConnectionE")
+        runner.assert_stdout(f"#{expected_total} ")
+
+    def test_relayed_stats(self, agents, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["-n", "4", "--warmup", "1", "--accept-encoding", "gzip", "--report", path]
+        args += [
+            *(f"--agent={a}" for a in agents),
+            f"{http_server}/gzip",
+            f"{http_server}/redirect",
+        ]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+8/8"))
+        runner.assert_stdout(re.compile(R"Transfer:.+wire"))
+
+        report = json.loads(path.read_text())
+        assert report["warmup"]["requests"] == 2  # per agent
+        assert report["transfer"]["wire_bytes"] < report["transfer"]["decoded_bytes"]
+        assert [hop["requests"] for hop in report["redirects"]] == [4]
+
+    def test_relayed_circuits(self, agents, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--circuit-breaker", "3", "-T", "1", "-n", "10", "--report", path]
+        args += [*(f"--agent={a}" for a in agents), "http://127.0.0.1:9/"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout(re.compile(R"Circuits:\s+4\s+fast-failed, opened 2x, now open"))
+
+        report = json.loads(path.read_text())
+        assert report["errors_by_type"] == {"CircuitOpen": 4, "ConnectionError": 6}
+        assert report["circuits"][0]["rejected"] == 4
+
+    def test_agent_deadline(self, http_server, runner, ep):
+        with start_agents(1, "--deadline", "1") as agents:
+            args = ["-T", "2", "-n", "4", f"--agent={agents[0]}", f"{http_server}/slow"]
+            time_before = time.monotonic()
+            runner.invoke(ep, args=args, no_errors=True)
+            assert time.monotonic() - time_before < 4  # each request takes 5s
+            runner.assert_stdout(re.compile(R"Successful:\s+0/4"))
@@ -0,0 +1,94 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import gzip
+import importlib.util
+import json
+import re
+import zlib
+
+from macedon.encoding import DecodeError, decode_content, parse_accept_encoding
+from .fixtures import *
+
+BODY = b"OK" * 500
+
+
+class TestDecoding:
+    @pytest.mark.parametrize(
+        "body, content_encoding",
+        [
+            (gzip.compress(BODY), "gzip"),
+            (zlib.compress(BODY), "deflate"),
+            (zlib.compress(BODY)[2:-4], "deflate"),  # raw deflate stream
+            (gzip.compress(zlib.compress(BODY)), "deflate, GZIP"),
+            (BODY, "identity"),
+        ],
+    )
+    def test_decode(self, body: bytes, content_encoding: str):
+        assert decode_content(body, content_encoding) == BODY
+
+    def test_unsupported_coding_is_left_as_is(self):
+        body = gzip.compress(BODY)
+        assert decode_content(body, "gzip, compress") == body
+
+    def test_invalid_content(self):
+        with pytest.raises(DecodeError):
+            decode_content(BODY, "gzip")
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ("gzip", "gzip"),
+            ("GZIP,deflate,gzip", "gzip, deflate"),
+            ("none", "identity"),
+        ],
+    )
+    def test_parse_accept_encoding(self, value: str, expected: str):
+        assert parse_accept_encoding(value) == expected
+
+    @pytest.mark.parametrize("value", ["compress", " , "])
+    def test_parse_invalid_accept_encoding(self, value: str):
+        with pytest.raises(ValueError):
+            parse_accept_encoding(value)
+
+    @pytest.mark.skipif(importlib.util.find_spec("zstandard"), reason="zstandard is installed")
+    def test_missing_decoder(self):
+        with pytest.raises(ValueError, match="zstandard"):
+            parse_accept_encoding("zstd")
+        assert parse_accept_encoding("zstd", decompress=False) == "zstd"
+
+
+class TestTransfer:
+    @pytest.mark.parametrize("transport", ["http1", "http2", "raw"])
+    def test_compressed(self, transport: str, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--transport", transport, "--accept-encoding", "gzip", "--report", path]
+        runner.invoke(ep, args=[*args, f"{http_server}/gzip"], no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Transfer:.+wire.+decoded\s+\(\d+\.\dx, decoding"))
+        report = json.loads(path.read_text())
+        assert report["transfer"]["decoded_bytes"] == len(BODY)
+        assert report["transfer"]["wire_bytes"] == len(gzip.compress(BODY))
+
+    @pytest.mark.parametrize(
+        "args, expected_size",
+        [
+            (["--no-decompress"], len(gzip.compress(BODY))),
+            (["--accept-encoding", "none"], len(BODY)),
+        ],
+    )
+    def test_uncompressed(self, args: list, expected_size: int, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = [*args, "--report", path, f"{http_server}/gzip"]
+        runner.invoke(ep, args=args, no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Transfer:.+\(1\.0x"))
+        report = json.loads(path.read_text())
+        assert report["transfer"]["decoded_bytes"] == expected_size
+        assert report["transfer"]["wire_bytes"] == expected_size
+
+    def test_invalid_accept_encoding(self, http_server, runner, ep):
+        args = ["--accept-encoding", "compress", f"{http_server}/gzip"]
+        runner.invoke(ep, args=args, no_errors=False)
+        runner.assert_stderr("'--accept-encoding'")
@@ -0,0 +1,31 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import logging
+import queue
+import re
+
+from macedon.logger import BufferedHandler
+from .fixtures import *
+
+
+class TestLogger:
+    def test_buffer_overflow(self):
+        handler = BufferedHandler(queue.Queue(2))
+        for level in [logging.WARNING, logging.INFO, logging.DEBUG, logging.INFO]:
+            handler.handle(logging.makeLogRecord(dict(levelno=level, msg="x", args=())))
+        assert handler.dropped.value == 2
+        assert handler.queue.qsize() == 2
+
+    def test_record_is_not_formatted_on_put(self):
+        handler = BufferedHandler(queue.Queue())
+        handler.handle(logging.makeLogRecord(dict(levelno=logging.INFO, msg="%d", args=(1,))))
+        record = handler.queue.get_nowait()
+        assert not hasattr(record, "rel_created_str")
+        assert record.args == (1,)
+
+    def test_output_is_flushed(self, http_server, runner, ep):
+        runner.invoke(ep, args=["-vv", "-n", "50", f"{http_server}/"], no_errors=True)
+        assert len(re.findall(R"Response #\d+: HTTP 200", runner._last_result.stderr)) == 50
+        runner.assert_stderr(re.compile(R"\[INFO ]\[macedon:#0]\(\+[\d.]+\w*\)"))
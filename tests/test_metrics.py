@@ -0,0 +1,66 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import urllib.request
+
+from macedon._common import Options, State, destroy_state, init_state
+from macedon.logger import destroy_logger, init_logger
+from macedon.metrics import MetricsServer, render_metrics
+from .fixtures import *
+
+
+@pytest.fixture
+def state() -> State:
+    options = Options(endpoint_url=(), file=(), metrics_listen="127.0.0.1:0")
+    state = init_state(options)
+    init_logger(options)
+    state.requests_total.add(3)
+    state.requests_success.next()
+    state.requests_failed.next()
+    state.responses_by_status.next("200")
+    state.errors_by_type.next("ConnectionError")
+    state.latency_by_endpoint.observe(("GET", 'http://localhost/"q"'), 0.3)
+    state.worker_states.extend(["requesting", "dead"])
+    yield state
+    destroy_logger()
+    destroy_state()
+
+
+class TestMetrics:
+    def test_render(self, state: State):
+        text = render_metrics(state)
+        assert "# TYPE macedon_requests_scheduled_total counter\n" in text
+        assert "macedon_requests_scheduled_total 3\n" in text
+        assert 'macedon_requests_total{result="failure"} 1\n' in text
+        assert 'macedon_responses_total{code="200"} 1\n' in text
+        assert 'macedon_errors_total{error="ConnectionError"} 1\n' in text
+        labels = R'method="GET",url="http://localhost/\"q\""'
+        assert f'macedon_request_duration_seconds_bucket{{{labels},le="0.25"}} 0\n' in text
+        assert f'macedon_request_duration_seconds_bucket{{{labels},le="0.5"}} 1\n' in text
+        assert f"macedon_request_duration_seconds_count{{{labels}}} 1\n" in text
+        assert 'macedon_workers{state="requesting"} 1\n' in text
+        assert 'macedon_workers{state="waiting"} 0\n' in text
+
+    def test_server(self, state: State):
+        server = MetricsServer(("127.0.0.1", 0))
+        server.start()
+        try:
+            url = "http://%s:%d/metrics" % server.address
+            with urllib.request.urlopen(url, timeout=5) as response:
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                assert b'macedon_requests_total{result="success"} 1' in response.read()
+        finally:
+            server.stop()
+
+    def test_option(self, http_server, runner, ep):
+        args = ["--metrics-listen", "127.0.0.1:0", f"{http_server}/"]
+        runner.invoke(ep, args=args, no_errors=True)
+
+    def test_no_latency_histogram_without_endpoint(self):
+        state = init_state(Options(endpoint_url=(), file=()))
+        try:
+            assert state.latency_by_endpoint is None
+            assert "# TYPE macedon_request_duration_seconds histogram\n" in render_metrics(state)
+        finally:
+            destroy_state()
@@ -0,0 +1,69 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+from macedon._common import Options
+from macedon.logger import destroy_logger, init_logger
+from macedon.monitor import MonitorSample, MonitorSummary, SelfMonitor
+from .fixtures import *
+
+
+def _sample(cpu=10.0, system_cpu=20.0, fds=10, lag=0.0, ports=None) -> MonitorSample:
+    return MonitorSample(cpu, system_cpu, 1 << 20, fds, 4, lag, ports)
+
+
+def _summarize(monitor: SelfMonitor, samples: list[MonitorSample]) -> MonitorSummary:
+    for sample in samples:
+        monitor._add_sample(sample)
+    return monitor.summary
+
+
+@pytest.fixture
+def monitor() -> SelfMonitor:
+    init_logger(Options(endpoint_url=(), file=()))
+    monitor = SelfMonitor()
+    monitor.fd_limit = 1024
+    monitor.port_range = (32768, 33767)
+    yield monitor
+    destroy_logger()
+
+
+class TestSelfMonitor:
+    def test_no_warnings(self, monitor: SelfMonitor):
+        summary = _summarize(monitor, [_sample(), _sample(ports=100)])
+        assert not [*monitor._make_warnings(summary)]
+
+    @pytest.mark.parametrize(
+        "samples, expected",
+        [
+            ([_sample(cpu=95.0)] * 3, "CPU was saturated 100%"),
+            ([_sample(system_cpu=99.0)] * 2 + [_sample()], "CPU was saturated 67%"),
+            ([_sample(), _sample(fds=900)], "descriptors reached 900 of 1024"),
+            ([_sample(ports=950)], "ports in use reached 950 of 1000"),
+            ([_sample(), _sample(lag=0.25)], "starved for up to 250ms"),
+        ],
+    )
+    def test_warnings(self, monitor: SelfMonitor, samples: list, expected: str):
+        warnings = [*monitor._make_warnings(_summarize(monitor, samples))]
+        assert len(warnings) == 1 and expected in warnings[0]
+
+    def test_sampling(self, monitor: SelfMonitor):
+        monitor.start()
+        monitor.stop()
+        summary = monitor.summary
+        assert summary.count >= 1 and summary.peak_fds > 0
+        assert summary.last.threads >= 1
+        assert summary.last.rss > 0
+
+    def test_summary(self, monitor: SelfMonitor):
+        samples = [_sample(cpu=95.0, ports=5), _sample(fds=20, lag=0.3), _sample(ports=3)]
+        summary = _summarize(monitor, samples)
+        assert (summary.count, summary.pegged) == (3, 1)
+        assert summary.peak_cpu_percent == 95.0
+        assert (summary.peak_fds, summary.peak_ephemeral_ports) == (20, 5)
+        assert summary.peak_lag == 0.3
+        assert summary.last is samples[-1]
+
+    def test_disabled(self, http_server, runner, ep):
+        runner.invoke(ep, args=["--no-self-monitor", f"{http_server}/"], no_errors=True)
+        runner.assert_stdout("Successful:")
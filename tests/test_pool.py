@@ -0,0 +1,150 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import random
+import re
+import time
+from collections import Counter
+from queue import Empty
+from threading import Timer
+
+from macedon._common import Options, Scenario, Task, destroy_state, get_state, init_state
+from macedon.fileparser import FileParser
+from macedon.logger import destroy_logger, init_logger
+from macedon.pool import (
+    AliasTable,
+    FiniteTaskPool,
+    PoolClosed,
+    ScheduledTaskPool,
+    WeightedTaskPool,
+)
+from .fixtures import *
+
+
+@pytest.fixture
+def state():
+    options = Options(endpoint_url=(), file=(), watch=True)
+    init_logger(options)
+    yield init_state(options)
+    destroy_state()
+    destroy_logger()
+
+
+class TestTaskPool:
+    def test_finite(self):
+        pool = FiniteTaskPool()
+        tasks = [Task("http://a"), Task("http://b")]
+        for task in tasks:
+            pool.put(task)
+        assert [pool.get(0), pool.get(0)] == tasks
+        with pytest.raises(PoolClosed):
+            pool.get(0)
+
+    def test_scheduled(self, state):
+        pool = ScheduledTaskPool(default_interval=0.2)
+        fast, slow = Task("http://fast", interval=0.05), Task("http://slow")
+        pool.put(fast)
+        pool.put(slow)
+
+        counts = Counter()
+        deadline = time.monotonic() + 0.5
+        while (now := time.monotonic()) < deadline:
+            try:
+                counts[pool.get(deadline - now).url] += 1
+            except Empty:
+                pass
+        assert 9 <= counts["http://fast"] <= 11
+        assert 2 <= counts["http://slow"] <= 3
+        assert state.requests_total.value == counts.total()
+        assert pool.skipped == 0
+
+    def test_scheduled_skips_missed(self, state):
+        pool = ScheduledTaskPool(default_interval=0.05)
+        pool.put(Task("http://a"))
+        pool.get(1)
+        time.sleep(0.22)
+        pool.get(0)
+        assert pool.skipped == 3
+        with pytest.raises(Empty):
+            pool.get(0)
+
+    def test_scheduled_scenario(self, state):
+        pool = ScheduledTaskPool(default_interval=0.05)
+        scenario = Scenario("s", (Task("http://a", interval=10), Task("http://b")))
+        pool.put(scenario)
+        assert [pool.get(1), pool.get(1)] == [scenario, scenario]
+        assert state.requests_total.value == 4
+
+    def test_scheduled_close(self, state):
+        pool = ScheduledTaskPool(default_interval=10)
+        pool.put(Task("http://a"))
+        pool.get(1)
+        Timer(0.1, pool.close).start()
+        with pytest.raises(PoolClosed):
+            pool.get(5)
+
+
+class TestWeighted:
+    @pytest.mark.parametrize("weights", [[8, 1, 1], [1, 1], [0.5, 3, 10, 1, 0.01]])
+    def test_alias_table(self, weights: list[float]):
+        items = [*range(len(weights))]
+        table = AliasTable(items, weights, random.Random(42))
+        draws = 50000
+        counts = Counter(table.draw() for _ in range(draws))
+        for item, weight in zip(items, weights):
+            assert counts[item] / draws == pytest.approx(weight / sum(weights), abs=0.01)
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            "http://a weight=3\nPOST http://b\n",
+            "# @weight 3\nGET http://a\n\n###\nPOST http://b\n",
+        ],
+    )
+    def test_parse_weights(self, data: str, state):
+        tasks = [*FileParser()._parse(data, "<test>")]
+        assert [(t.method, t.url, t.weight) for t in tasks] == [
+            ("GET", "http://a", 3),
+            ("POST", "http://b", None),
+        ]
+
+    def test_weighted_pool(self):
+        pool = WeightedTaskPool(amount=500)
+        heavy, light = Task("http://heavy", weight=9), Task("http://light")
+        pool.put(heavy)
+        pool.put(light)
+        assert len(pool) == 1000
+
+        counts = Counter(pool.get(0).url for _ in range(1000))
+        assert 850 <= counts["http://heavy"] <= 950
+        with pytest.raises(PoolClosed):
+            pool.get(0)
+
+    def test_weighted_run(self, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        input = f"GET {http_server}/ weight=4\n{http_server}/404"
+        args = ["--weighted", "-n", "100", "--report", path, "-f", "-"]
+        runner.invoke(ep, args=args, input=input, no_errors=True)
+
+        report = json.loads(path.read_text())
+        assert report["requests"]["total"] == 200
+        assert 130 <= report["responses_by_status"]["200"] <= 190
+
+
+class TestWatch:
+    def test_watch(self, http_server, runner, ep):
+        input = f"GET {http_server}/\n\n###\n# @interval 100ms\nGET {http_server}/404"
+        Timer(1, lambda: get_state().shutdown_flag.set()).start()
+        args = ["--watch", "--interval", "10m", "-f", "-"]
+        runner.invoke(ep, args=args, input=input, no_errors=True)
+
+        stdout = runner._last_result.stdout
+        assert len(re.findall(R"(?m)^\s+200\s", stdout)) == 1
+        assert 5 <= len(re.findall(R"(?m)^\s+404\s", stdout)) <= 11
+        runner.assert_stdout(re.compile(R"Requests:\s+∞"))
+
+    def test_invalid_interval(self, runner, ep):
+        runner.invoke(ep, args=["--watch", "--interval", "5x", "http://localhost"], no_errors=False)
+        runner.assert_stderr("Invalid duration")
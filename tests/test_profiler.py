@@ -0,0 +1,35 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import pstats
+
+from .fixtures import *
+
+
+class TestProfiler:
+    @pytest.mark.filterwarnings("error::pytest.PytestUnhandledThreadExceptionWarning")
+    def test_profile(self, tmp_path, http_server, runner, ep):
+        path = tmp_path / "out.prof"
+        args = ["-T", "4", "-n", "10", "--profile", path, f"{http_server}/"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout("functions by own time")
+        assert any(name == "_run" for _, _, name in pstats.Stats(str(path)).stats)
+
+    def test_profile_sampling(self, tmp_path, http_server, runner, ep):
+        path = tmp_path / "out.folded"
+        args = ["-n", "20", "--profile", path, "--profile-sampling", f"{http_server}/"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout("functions by own samples")
+        for line in path.read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert ";_run (worker.py:" in stack and int(count) > 0
+
+    def test_profile_mem(self, http_server, runner, ep):
+        args = ["-n", "10", "--profile-mem", f"{http_server}/"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout("allocation sites by memory growth (10 requests)")
+
+    def test_profile_sampling_without_path(self, http_server, runner, ep):
+        runner.invoke(ep, args=["--profile-sampling", f"{http_server}/"], no_errors=False)
+        runner.assert_stderr("'--profile-sampling' requires '--profile'")
@@ -0,0 +1,39 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+
+from .fixtures import *
+
+
+class TestRedirects:
+    @pytest.mark.parametrize("transport", ["http1", "raw"])
+    def test_hops(self, transport: str, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--transport", transport, "-n", "3", "--report", path, f"{http_server}/moved"]
+        runner.invoke(ep, args=args, no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Successful:\s+3/3"))
+        runner.assert_stdout(re.compile(R"(?s)Redirects by p95:.+\s3\s.+308\s+GET\s+\S+/moved"))
+        runner.assert_stdout(re.compile(R"\s3\s.+301\s+GET\s+\S+/redirect"))
+        report = json.loads(path.read_text())
+        assert [(r["status"], r["requests"]) for r in report["redirects"]] in (
+            [(308, 3), (301, 3)],
+            [(301, 3), (308, 3)],
+        )
+
+    @pytest.mark.parametrize(
+        "method, expected_hops",
+        [
+            ("GET", 1),
+            ("POST", 3),  # 301 turns POST into GET, thus is not cached
+        ],
+    )
+    def test_cache_redirects(self, method: str, expected_hops: int, http_server, runner, ep):
+        args = ["--cache-redirects", "-T", "1", "-n", "3", "-f", "-"]
+        runner.invoke(ep, args=args, input=f"{method} {http_server}/redirect", no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Successful:\s+3/3"))
+        runner.assert_stdout(re.compile(Rf"\s{expected_hops}\s.+301\s+{method}\s+\S+/redirect"))
@@ -0,0 +1,160 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import io
+import json
+import re
+import time
+
+from macedon._common import LatencyReservoir, Options, Task, destroy_state, init_state
+from macedon.logger import destroy_logger, init_logger
+from macedon.pool import PoolClosed, ReplayTaskPool
+from macedon.replay import ReplayParser, parse_iso_time
+from macedon.synchronizer import Synchronizer
+from .fixtures import *
+
+ACCESS_LOG = """\
+10.0.0.1 - - [10/Oct/2024:13:55:36 +0000] "GET /?a=1 HTTP/1.1" 200 2 "-" "curl/8.0"
+10.0.0.1 - - [10/Oct/2024:13:55:36 +0000] "GET /404 HTTP/1.1" 404 0
+not an access log record
+10.0.0.2 - bob [10/Oct/2024:13:55:38 +0000] "HEAD http://example.org/?a=2 HTTP/1.1" 200 0
+"""
+
+
+def make_file(data: str) -> io.StringIO:
+    file = io.StringIO(data)
+    file.name = "<test>"
+    return file
+
+
+def make_har(server: str = "http://example.org") -> str:
+    entries = [
+        {
+            "startedDateTime": "2024-10-10T13:55:36.500Z",
+            "request": {
+                "method": "POST",
+                "url": f"{server}/login?x=1",
+                "headers": [
+                    {"name": ":authority", "value": "example.org"},
+                    {"name": "Host", "value": "example.org"},
+                    {"name": "Accept", "value": "*/*"},
+                ],
+                "postData": {"mimeType": "application/json", "text": '{"a": "]},"}'},
+            },
+            "response": {"status": 200, "content": {"text": "x" * 1000}},
+        },
+        {"startedDateTime": "2024-10-10T13:55:37.000Z", "request": {"method": "GET"}},
+        {
+            "startedDateTime": "2024-10-10T13:55:37.250+00:00",
+            "request": {"method": "GET", "url": f"{server}/404"},
+        },
+    ]
+    return json.dumps({"log": {"version": "1.2", "pages": [], "entries": entries}}, indent=1)
+
+
+@pytest.fixture
+def state():
+    options = Options(endpoint_url=(), file=())
+    init_logger(options)
+    yield init_state(options)
+    destroy_state()
+    destroy_logger()
+
+
+class TestReplayParser:
+    def test_access_log(self, state):
+        parser = ReplayParser("http://target:8080/")
+        items = [*parser.parse(make_file(ACCESS_LOG))]
+        assert [(offset, task.method, task.url) for offset, task in items] == [
+            (0, "GET", "http://target:8080/?a=1"),
+            (0, "GET", "http://target:8080/404"),
+            (2, "HEAD", "http://target:8080/?a=2"),
+        ]
+        assert parser.skipped == 1
+
+    def test_access_log_requires_target(self, state):
+        with pytest.raises(ValueError, match="replay-target"):
+            next(ReplayParser().parse(make_file(ACCESS_LOG)))
+
+    @pytest.mark.parametrize("target", [None, "http://target"])
+    def test_har(self, target: str, state, monkeypatch):
+        monkeypatch.setattr(ReplayParser, "HAR_CHUNK_SIZE", 64)  # entries span many chunks
+        parser = ReplayParser(target)
+        items = [*parser.parse(make_file(make_har()))]
+
+        origin = target or "http://example.org"
+        assert [(offset, task.method, task.url) for offset, task in items] == [
+            (0, "POST", f"{origin}/login?x=1"),
+            (0.75, "GET", f"{origin}/404"),
+        ]
+        assert dict(items[0][1].headers) == {"Accept": "*/*"}
+        assert items[0][1].body == '{"a": "]},"}'
+        assert parser.skipped == 1
+
+    @pytest.mark.parametrize(
+        "value",
+        ["2024-10-10T13:55:36.500Z", "2024-10-10T13:55:36.500z", "2024-10-10T15:55:36.500+02:00"],
+    )
+    def test_iso_time(self, value: str):
+        assert parse_iso_time(value) == 1728568536.5
+
+    @pytest.mark.parametrize("data", ['{"log": {}}', '{"log": {"entries": [{"a": 1}'])
+    def test_invalid_har(self, data: str, state):
+        with pytest.raises(ValueError, match="Invalid HAR"):
+            [*ReplayParser().parse(make_file(data), "har")]
+
+
+class TestReplayTaskPool:
+    def test_schedule(self, state):
+        items = iter([(0, Task("http://a")), (0.1, Task("http://b")), (0.1, Task("http://c"))])
+        pool = ReplayTaskPool(items, speed=2)
+        assert len(pool) == 1
+
+        time_before = time.monotonic()
+        assert [pool.get(1).url for _ in range(3)] == ["http://a", "http://b", "http://c"]
+        assert 0.05 <= time.monotonic() - time_before < 0.1
+        with pytest.raises(PoolClosed):
+            pool.get(1)
+        drift = state.replay_drift.snapshot()
+        assert drift.count == 3
+        assert drift.percentile(100) < 0.05
+        assert state.requests_total.value == 3
+
+    def test_bounded_latencies(self):
+        options = Options(endpoint_url=(), file=(), replay=make_file(""))
+        assert isinstance(init_state(options).requests_latency, LatencyReservoir)
+        destroy_state()
+
+
+class TestReplay:
+    def test_access_log(self, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--replay", "-", "--replay-target", http_server, "--replay-speed", "10"]
+        runner.invoke(ep, args=[*args, "--report", path], input=ACCESS_LOG, no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Successful:\s+2/3"))
+        runner.assert_stdout(re.compile(R"Drift:\s+p50"))
+        report = json.loads(path.read_text())
+        assert report["replay"]["requests"] == 3
+        # aggregated by the path
+        assert sorted((e["method"], e["url"]) for e in report["endpoints"]) == [
+            ("GET", f"{http_server}/"),
+            ("GET", f"{http_server}/404"),
+            ("HEAD", f"{http_server}/"),
+        ]
+
+    def test_har(self, http_server, runner, ep):
+        runner.invoke(ep, args=["--replay", "-"], input=make_har(http_server), no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+1/2"))
+
+    @pytest.mark.parametrize("option", [["--watch"], ["--warmup", "2"], ["--warmup-seconds", "1"]])
+    def test_incompatible(self, option: list, runner, ep):
+        args = ["--replay", "-", *option]
+        runner.invoke(ep, args=args, input=ACCESS_LOG, no_errors=False)
+        runner.assert_stderr("cannot be combined")
+
+    def test_invalid_file(self, state):
+        options = Options(endpoint_url=(), file=(), replay=make_file('{"log": {"entries": [{"a"'))
+        with pytest.raises(RuntimeError, match="Failed to initialize workers: Invalid HAR"):
+            Synchronizer(options)
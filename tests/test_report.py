@@ -0,0 +1,39 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+
+from .fixtures import *
+
+
+class TestBreakdown:
+    def test_breakdown(self, http_server, runner, ep):
+        args = ["-n", "4", f"{http_server}/", f"{http_server}/404", "http://127.0.0.1:9"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout("Endpoints by p95:")
+        runner.assert_stdout(re.compile(R"4\s+100%(\s+---){3}\s+0b\s+GET http://127.0.0.1:9"))
+
+    def test_breakdown_top(self, http_server, runner, ep):
+        args = ["--sort", "errors", "--top", "1", f"{http_server}/", f"{http_server}/404"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout("Top 1 of 2 endpoints by errors:")
+        runner.assert_stdout(re.compile(R"1\s+100%.+/404"))
+
+    def test_no_breakdown_for_single_endpoint(self, http_server, runner, ep):
+        runner.invoke(ep, args=[f"{http_server}/"], no_errors=True)
+        assert "Endpoints by" not in runner._last_result.stdout
+
+    def test_report(self, tmp_path, http_server, runner, ep):
+        path = tmp_path / "report.json"
+        args = ["-n", "3", "--top", "1", "--report", path, f"{http_server}/", f"{http_server}/404"]
+        runner.invoke(ep, args=args, no_errors=True)
+
+        report = json.loads(path.read_text())
+        assert report["requests"] == {"total": 6, "success": 3, "failed": 3, "cancelled": 0}
+        assert report["responses_by_status"] == {"200": 3, "404": 3}
+        assert len(report["endpoints"]) == 2
+        endpoint = next(e for e in report["endpoints"] if e["url"].endswith("/404"))
+        assert endpoint["requests"] == 3 and endpoint["error_rate"] == 1.0
+        assert endpoint["p50"] > 0 and endpoint["bytes"] == 6
@@ -0,0 +1,35 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+
+from .fixtures import *
+
+
+class TestRevalidate:
+    @pytest.mark.parametrize("transport", ["http1", "raw"])
+    def test_cache_hits(self, transport: str, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--revalidate", "--transport", transport, "-T", "1", "-n", "4", "--report", path]
+        runner.invoke(ep, args=[*args, f"{http_server}/etag"], no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Successful:\s+4/4"))
+        runner.assert_stdout(re.compile(R"Cache hits:\s+3/4\s+\(75.0%\)"))
+        report = json.loads(path.read_text())
+        assert report["requests"]["cache_hits"] == 3
+        assert report["responses_by_status"] == {"200": 1, "304": 3}
+
+    def test_without_revalidate(self, http_server, runner, ep):
+        args = ["-T", "1", "-n", "2", f"{http_server}/etag"]
+        result = runner.invoke(ep, args=args, no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Successful:\s+2/2"))
+        assert "Cache hits:" not in result.stdout
+
+    def test_post_is_not_conditional(self, http_server, runner, ep):
+        args = ["--revalidate", "-T", "1", "-n", "2", "-f", "-"]
+        runner.invoke(ep, args=args, input=f"POST {http_server}/etag", no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Cache hits:\s+0/2"))
@@ -0,0 +1,125 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import re
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from macedon._common import Options, Task
+from macedon.logger import destroy_logger, init_logger
+from macedon.scenario import VirtualUser, extract_value, parse_extract_rule
+from macedon.transport import TRANSPORTS
+from .fixtures import *
+
+SCENARIO = """
+# @extract token = json:$.data.token
+# @extract item = json:data.items[0].id
+# @extract request_id = header:X-Request-Id
+POST {server}/login
+
+###
+GET {server}/private/{{{{item}}}}?rid={{{{request_id}}}}
+Authorization: Bearer {{{{token}}}}
+"""
+
+
+@pytest.fixture
+def logger():
+    yield init_logger(Options(endpoint_url=(), file=()))
+    destroy_logger()
+
+
+def make_response(body: str, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response._content = body.encode()
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.encoding = "utf-8"
+    return response
+
+
+class TestExtraction:
+    @pytest.mark.parametrize(
+        "rule, expected",
+        [
+            ("token = json:$.data.token", "abc"),
+            ("id=json:data.items[1].id", "8"),
+            ("obj = json:data.items[0]", '{"id":7}'),
+            ("missing = json:data.nope", None),
+            ("etag = header:ETag", '"v1"'),
+            ('token = regex:"token": "(\\w+)"', "abc"),
+            ("whole = regex:ab+c", "abc"),
+        ],
+    )
+    def test_extract_value(self, rule: str, expected: str):
+        response = make_response(
+            '{"data": {"token": "abc", "items": [{"id": 7}, {"id": 8}]}}', {"ETag": '"v1"'}
+        )
+        _, source, expression = parse_extract_rule(rule)
+        assert extract_value(response, source, expression) == expected
+
+    @pytest.mark.parametrize("rule", ["token json:x", "token = xpath://a", "1x = json:a"])
+    def test_invalid_rule(self, rule: str):
+        with pytest.raises(ValueError):
+            parse_extract_rule(rule)
+
+    def test_render(self, logger):
+        transport = TRANSPORTS["http1"](Options(endpoint_url=(), file=()))
+        user = VirtualUser(transport)
+        user.variables.update(id="7", token="abc")
+
+        task = Task(
+            "http://localhost/items/{{id}}",
+            "POST",
+            CaseInsensitiveDict({"Authorization": "Bearer {{ token }}"}),
+            '{"id": {{id}}, "other": "{{undefined}}"}',
+        )
+        rendered = user.render(task)
+        assert rendered.url == "http://localhost/items/7"
+        assert rendered.headers["authorization"] == "Bearer abc"
+        assert rendered.body == '{"id": 7, "other": "{{undefined}}"}'
+        static_task = Task("http://localhost/")
+        assert user.render(static_task) is static_task
+
+        user.reset()
+        assert not user.variables
+        user.close()
+        transport.close()
+
+
+class TestScenario:
+    @pytest.mark.parametrize("transport", ["http1", "http2", "raw"])
+    def test_scenario(self, transport: str, http_server, runner, ep):
+        if transport == "http2":
+            pytest.importorskip("httpx")
+        input = SCENARIO.format(server=http_server)
+        args = ["--scenario", "--transport", transport, "-T", "3", "-n", "5", "-f", "-"]
+        runner.invoke(ep, args=args, input=input, no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Successful:\s+10/10"))
+        runner.assert_stdout(re.compile(R"/private/7\?rid=42"))
+
+    @pytest.mark.parametrize("transport", ["http1", "http2", "raw"])
+    def test_reset_cookies(self, transport: str, http_server, logger):
+        if transport == "http2":
+            pytest.importorskip("httpx")
+        transport = TRANSPORTS[transport](Options(endpoint_url=(), file=(), transport=transport))
+        login = transport.prepare(Task(f"{http_server}/login"))
+        cookie = transport.prepare(Task(f"{http_server}/cookie"))
+        user, other_user = VirtualUser(transport), VirtualUser(transport)
+
+        transport.send(login, user.session)
+        assert transport.send(cookie, user.session).content == b"session=s3cr3t"
+        assert transport.send(cookie, other_user.session).content == b""
+        user.reset()
+        assert transport.send(cookie, user.session).content == b""
+
+        user.close()
+        other_user.close()
+        transport.close()
+
+    def test_without_scenario(self, http_server, runner, ep):
+        input = SCENARIO.format(server=http_server)
+        runner.invoke(ep, args=["-n", "2", "-f", "-"], input=input, no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+2/4"))
@@ -0,0 +1,31 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+import time
+
+from .fixtures import *
+
+
+class TestDeadline:
+    @pytest.mark.parametrize("transport", ["http1", "raw"])
+    def test_deadline(self, transport: str, http_server, runner, ep, tmp_path):
+        path = tmp_path / "report.json"
+        args = ["--transport", transport, "--deadline", "500ms", "-T", "2", "-n", "3", "-t", "30"]
+        args += ["--report", path, f"{http_server}/slow"]
+
+        time_before = time.monotonic()
+        runner.invoke(ep, args=args, no_errors=True)
+        assert time.monotonic() - time_before < 3  # the requests take 5s each
+
+        runner.assert_stdout("Deadline reached")
+        runner.assert_stdout(re.compile(R"Cancelled:\s+3\s+\(2 in progress, 1 not started\)"))
+        report = json.loads(path.read_text())
+        assert report["requests"] == {"total": 3, "success": 0, "failed": 0, "cancelled": 2}
+
+    def test_no_deadline_hit(self, http_server, runner, ep):
+        runner.invoke(ep, args=["--deadline", "1m", "-n", "2", f"{http_server}/"], no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+2/2"))
+        assert "Cancelled" not in runner._last_result.stdout
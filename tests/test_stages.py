@@ -0,0 +1,100 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+import time
+from collections import Counter
+from queue import Empty
+
+from macedon._common import Options, Task, destroy_state, init_state
+from macedon.logger import destroy_logger, init_logger
+from macedon.pool import CyclicTaskPool, PoolClosed
+from macedon.stages import Stage, parse_stages
+from .fixtures import *
+
+
+@pytest.fixture
+def state():
+    options = Options(endpoint_url=(), file=(), stages="1:1s")
+    init_logger(options)
+    yield init_state(options)
+    destroy_state()
+    destroy_logger()
+
+
+class TestParseStages:
+    @pytest.mark.parametrize(
+        "spec, expected",
+        [
+            ("10:30s", [Stage(10, None, 30)]),
+            ("5:1m,+5:500ms", [Stage(5, None, 60), Stage(10, None, 0.5)]),
+            (
+                "10:30s,+10:30s..35",
+                [Stage(w, None, 30) for w in (10, 20, 30, 35)],
+            ),
+            ("8:1s,-3:1s..2", [Stage(8, None, 1), Stage(5, None, 1), Stage(2, None, 1)]),
+            ("50rps:1m,+25rps:1m..100", [Stage(4, r, 60) for r in (50, 75, 100)]),
+            ("2:1s, 0.5rps:2", [Stage(2, None, 1), Stage(4, 0.5, 2)]),
+        ],
+    )
+    def test_valid(self, spec: str, expected: list[Stage]):
+        assert parse_stages(spec, rate_workers=4) == expected
+
+    @pytest.mark.parametrize(
+        "spec",
+        ["", "10", "10:", "x:30s", "10:30x", "10:0s", "10:1s..20", "5:1s,-5:1s", "5:1s,+5rps:1s"],
+    )
+    def test_invalid(self, spec: str):
+        with pytest.raises(ValueError):
+            parse_stages(spec, rate_workers=4)
+
+
+class TestCyclicTaskPool:
+    def test_round_robin(self, state):
+        pool = CyclicTaskPool()
+        tasks = [Task("http://a"), Task("http://b")]
+        for task in tasks:
+            pool.put(task)
+        assert [pool.get(0).url for _ in range(5)] == ["http://a", "http://b"] * 2 + ["http://a"]
+        assert state.requests_total.value == 5
+        pool.close()
+        with pytest.raises(PoolClosed):
+            pool.get(0)
+
+    def test_rate(self, state):
+        pool = CyclicTaskPool()
+        pool.put(Task("http://a"))
+        pool.set_rate(20)
+
+        counts = Counter()
+        deadline = time.monotonic() + 0.5
+        while (now := time.monotonic()) < deadline:
+            try:
+                counts[pool.get(deadline - now).url] += 1
+            except Empty:
+                pass
+        assert 9 <= counts["http://a"] <= 12
+
+
+class TestStagesRun:
+    def test_stages(self, http_server, runner, ep, tmp_path):
+        report_path = tmp_path / "report.json"
+        args = ["-T", "2", "--stages", "1:300ms,+1:300ms,20rps:500ms", "--report", report_path]
+        runner.invoke(ep, args=[*args, f"{http_server}/"], no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Requests:\s+∞"))
+        runner.assert_stdout(re.compile(R"(?m)^\s+2T\s"))
+        stages = json.loads(report_path.read_text())["stages"]
+        assert [(s["workers"], s["rate"]) for s in stages] == [(1, None), (2, None), (2, 20)]
+        assert all(s["requests"] > 0 and s["failed"] == 0 for s in stages)
+        assert 8 <= stages[2]["requests"] <= 13
+
+    def test_invalid_spec(self, runner, ep):
+        runner.invoke(ep, args=["--stages", "10:1s..20", "http://localhost"], no_errors=False)
+        runner.assert_stderr("Limit is allowed only")
+
+    def test_watch_conflict(self, runner, ep):
+        runner.invoke(ep, args=["--stages", "1:1s", "--watch", "http://localhost"], no_errors=False)
+        runner.assert_stderr("cannot be combined")
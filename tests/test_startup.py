@@ -0,0 +1,35 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["requests", "urllib3", "pytermor", "es7s_commons", "psutil"]
+
+
+class TestStartup:
+    def test_entrypoint_import_is_lightweight(self):
+        code = "; ".join(
+            [
+                "import sys",
+                "import macedon.entrypoint",
+                f"print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])",
+            ]
+        )
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr
+        assert proc.stdout.strip() == ""
+
+    @pytest.mark.parametrize("args", [["--version"], ["-V"]])
+    def test_version_without_tty(self, args: list[str]):
+        proc = subprocess.run(
+            [sys.executable, "-m", "macedon", *args],
+            capture_output=True,
+            text=True,
+        )
+        from macedon import APP_VERSION
+
+        assert proc.stdout.strip() == APP_VERSION
@@ -0,0 +1,43 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import re
+
+from macedon._common import Options
+from macedon.tracer import Tracer
+from .fixtures import *
+
+
+class TestTracer:
+    @pytest.mark.parametrize(
+        "options, expected",
+        [
+            (dict(), 6),
+            (dict(trace_sample=3), 2),
+            (dict(trace_failures=True), 2),
+            (dict(trace_slow=0.5), 3),
+            (dict(trace_failures=True, trace_slow=0.5), 4),
+        ],
+    )
+    def test_should_trace(self, options: dict, expected: int):
+        tracer = Tracer(Options(endpoint_url=(), file=(), **options))
+        results = [(True, 0.1), (False, None), (True, 0.6), (True, 0.2), (False, 0.9), (True, 1)]
+        assert sum(tracer.should_trace(ok, elapsed) for ok, elapsed in results) == expected
+
+    def test_trace_file(self, http_server, runner, ep, tmp_path):
+        trace_path = tmp_path / "trace.txt"
+        args = ["-n", "20", "--trace-file", trace_path, "--trace-failures", "--trace-sample", "10"]
+        runner.invoke(ep, args=[*args, f"{http_server}/", f"{http_server}/404"], no_errors=True)
+
+        traces = trace_path.read_text()
+        assert len(re.findall(R"(?m)^< HTTP 404", traces)) == 20
+        assert len(re.findall(R"(?m)^< HTTP 200", traces)) == 2
+        assert "R/R" not in runner._last_result.stderr
+
+    @pytest.mark.parametrize(
+        "args", [["--trace-sample", "2"], ["--trace-failures"], ["--trace-slow", "1s"]]
+    )
+    def test_filters_without_tracing(self, args: list, http_server, runner, ep):
+        runner.invoke(ep, args=[*args, f"{http_server}/"], no_errors=False)
+        runner.assert_stderr("require '--trace-file' or '-vv'")
@@ -0,0 +1,107 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import re
+import time
+
+import requests
+
+from macedon._common import Options, Task
+from macedon.logger import destroy_logger, init_logger
+from macedon.transport import TRANSPORTS, TotalTimeout
+from .fixtures import *
+
+
+class TestTransport:
+    @pytest.mark.parametrize("transport", ["http1", "http2", "raw"])
+    def test_transport(self, transport: str, http_server, runner, ep):
+        if transport == "http2":
+            pytest.importorskip("httpx")
+        args = ["--transport", transport, "-n", "4", f"{http_server}/", f"{http_server}/404"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+4/8"))
+        runner.assert_stdout(re.compile(R"404.+/404"))
+
+    def test_http2_connection_error(self, runner, ep):
+        pytest.importorskip("httpx")
+        runner.invoke(ep, args=["--transport", "http2", "http://127.0.0.1:9"], no_errors=True)
+        runner.assert_stdout("ConnectionE")
+
+    @pytest.mark.parametrize("method", ["GET", "HEAD", "POST"])
+    def test_raw(self, method: str, http_server, runner, ep):
+        input = f"{method} {http_server}/\n{method} {http_server}/redirect"
+        args = ["--transport", "raw", "-T", "2", "-n", "5", "-f", "-"]
+        runner.invoke(ep, args=args, input=input, no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+10/10"))
+
+    @pytest.mark.parametrize("transport", ["http1", "raw"])
+    def test_prepared_once(self, transport: str, http_server):
+        options = Options(endpoint_url=(), file=(), transport=transport)
+        transport = TRANSPORTS[transport](options)
+        task = Task(f"{http_server}/")
+
+        prepared = transport.prepare(task)
+        assert transport.prepare(task) is prepared
+        assert transport.prepare(Task(task.url)) is not prepared
+        for _ in range(3):
+            assert transport.send(prepared).ok
+        transport.close()
+
+    @pytest.mark.parametrize("transport", ["http1", "http2", "raw"])
+    def test_cookies_isolated(self, transport: str, http_server):
+        if transport == "http2":
+            pytest.importorskip("httpx")
+        options = Options(endpoint_url=(), file=(), transport=transport)
+        init_logger(options)
+        transport = TRANSPORTS[transport](options)
+        login = transport.prepare(Task(f"{http_server}/login"))
+        cookie = transport.prepare(Task(f"{http_server}/cookie"))
+
+        transport.send(login)
+        assert transport.send(cookie).content == b""
+
+        session = transport.make_user_session()
+        transport.send(login, session)
+        assert transport.send(cookie, session).content == b"session=s3cr3t"
+        assert transport.send(cookie).content == b""
+        assert transport.send(cookie, transport.make_user_session()).content == b""
+        transport.close()
+        destroy_logger()
+
+    @pytest.mark.parametrize("transport", ["http1", "raw"])
+    def test_preconnect(self, transport: str, http_server):
+        options = Options(endpoint_url=(), file=(), transport=transport, threads=3)
+        init_logger(options)
+        transport = TRANSPORTS[transport](options)
+        tasks = [Task(f"{http_server}/"), Task(f"{http_server}/404"), Task("http://127.0.0.1:9")]
+
+        assert transport.preconnect(tasks, 3) == 3
+        assert transport.send(transport.prepare(tasks[0])).ok
+        transport.close()
+        destroy_logger()
+
+    @pytest.mark.parametrize("transport", ["http1", "http2", "raw"])
+    def test_total_timeout(self, transport: str, http_server):
+        if transport == "http2":
+            pytest.importorskip("httpx")
+        options = Options(endpoint_url=(), file=(), transport=transport, timeout=0.5)
+        init_logger(options)
+        transport = TRANSPORTS[transport](options)
+
+        time_before = time.monotonic()
+        with pytest.raises(TotalTimeout):
+            transport.send(transport.prepare(Task(f"{http_server}/drip")))
+        assert time.monotonic() - time_before < 1.5  # the body takes 3s, each read 0.3s
+        assert transport.send(transport.prepare(Task(f"{http_server}/"))).ok
+        transport.close()
+        destroy_logger()
+
+    @pytest.mark.parametrize("transport", ["http1", "raw"])
+    def test_read_timeout(self, transport: str, http_server):
+        options = Options(endpoint_url=(), file=(), transport=transport, read_timeout=0.2)
+        transport = TRANSPORTS[transport](options)
+        with pytest.raises(requests.exceptions.Timeout) as e:
+            transport.send(transport.prepare(Task(f"{http_server}/slow")))
+        assert not isinstance(e.value, TotalTimeout)
+        transport.close()
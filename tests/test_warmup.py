@@ -0,0 +1,33 @@
+# -----------------------------------------------------------------------------
+#  macedon [CLI web service availability verifier]
+#  (c) 2024 A. Shavykin <0.delameter@gmail.com>
+# -----------------------------------------------------------------------------
+import json
+import re
+
+from .fixtures import *
+
+
+class TestWarmup:
+    def test_warmup(self, http_server, runner, ep, tmp_path):
+        report_path = tmp_path / "report.json"
+        args = ["-T", "2", "-n", "3", "--warmup", "7", "--preconnect", "--report", report_path]
+        runner.invoke(ep, args=[*args, f"{http_server}/", f"{http_server}/404"], no_errors=True)
+
+        runner.assert_stdout(re.compile(R"Successful:\s+3/6"))
+        runner.assert_stdout(re.compile(R"Warm-up:\s+7\s"))
+        assert len(re.findall(R"(?m)^\s+(200|404)\s", runner._last_result.stdout)) == 6
+        report = json.loads(report_path.read_text())
+        assert report["requests"]["total"] == 6
+        assert report["warmup"]["requests"] == 7
+        assert report["warmup"]["failed"] == 3
+
+    def test_warmup_seconds(self, http_server, runner, ep):
+        args = ["-T", "2", "--warmup-seconds", "200ms", f"{http_server}/"]
+        runner.invoke(ep, args=args, no_errors=True)
+        runner.assert_stdout(re.compile(R"Successful:\s+1/1"))
+        runner.assert_stdout(re.compile(R"Warm-up:\s+\d+\s"))
+
+    def test_no_warmup(self, http_server, runner, ep):
+        runner.invoke(ep, args=[f"{http_server}/"], no_errors=True)
+        assert "Warm-up" not in runner._last_result.stdout